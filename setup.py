@@ -5,4 +5,10 @@ setup(
     version='1.0',
     packages=find_packages(where='src'),
     package_dir={'': 'src'},
+    install_requires=['numpy'],
+    entry_points={
+        'console_scripts': [
+            'cpv-analysis=cpv.analysis:main',
+        ],
+    },
 )
@@ -1,3 +1,4 @@
+import importlib
 import os
 import sys
 import logging
@@ -6,17 +7,44 @@ logging_str = "[%(asctime)s: %(levelname)s: %(module)s: %(message)s]"
 
 log_dir = "logs"
 log_filepath = os.path.join(log_dir,"running_logs.log")
-os.makedirs(log_dir, exist_ok=True)
 
+logger = logging.getLogger("cpv_logger")
 
-logging.basicConfig(
-    level= logging.INFO,
-    format= logging_str,
+# Submodules are imported on first attribute access (cpv.analysis, ...), so that
+# importing the package does not pull in numpy and the rest eagerly
+_submodules = {
+    "aggregator", "analysis", "calibration", "checkpoint", "client_architecture", "cpv", "cpv_utils",
+    "loadgen", "measurement_table", "monitor", "network_architecture_twisted", "ntp", "pacing",
+    "replay", "result_ring", "result_store", "scheduler", "segmented_log", "send_queue",
+    "server_architecture", "simulator", "stats", "supervisor", "topology", "tracing", "verdict_cache",
+}
 
-    handlers=[
-        logging.FileHandler(log_filepath),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
 
-logger = logging.getLogger("cpv_logger")
\ No newline at end of file
+def __getattr__(name):
+    if name in _submodules:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def configure_logging(level=logging.INFO, log_file=log_filepath, stdout=True):
+    """
+    Sends log records to a rotating file (10 MB x 5) and stdout.
+
+    Importing cpv no longer configures logging; entry points call this once.
+
+    Args:
+        level (int): Root logger level.
+        log_file (str, optional): Rotating log file, created with its directory; None to skip.
+        stdout (bool): Also log to stdout.
+    """
+    from logging.handlers import RotatingFileHandler
+
+    handlers = []
+    if log_file:
+        directory = os.path.dirname(log_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        handlers.append(RotatingFileHandler(log_file, maxBytes=10 * 1024 * 1024, backupCount=5))
+    if stdout:
+        handlers.append(logging.StreamHandler(sys.stdout))
+    logging.basicConfig(level=level, format=logging_str, handlers=handlers)
@@ -0,0 +1,203 @@
+# aggregator.py
+
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class VerdictAggregator:
+    def __init__(self, verifier_ids, max_sessions=1024, topology=None, calibration=None, max_pending_rounds=256):
+        """
+        Assembles the per-iteration results streamed by each verifier into the eij
+        matrix and computes a verdict as soon as every verifier has reported.
+
+        The verifiers are mapped, in the given order, to the indices 1..3 expected by
+        cpv.calculate_owds_mp and cpv.is_client_within_triangle.
+
+        Args:
+            verifier_ids (list): The three verifier identifiers forming the triangle.
+            max_sessions (int): Number of sessions whose state is retained.
+            topology (TopologyRegistry, optional): Registry the measured verifier delays
+                of each completed round are recorded in. Once every side of the triple
+                has been measured, its precomputed triangle constants are used.
+            calibration (CalibrationRegistry, optional): Calibrated delay -> distance
+                models used instead of the fixed scaling factor. Each client OWD uses the
+                model of its verifier and each verifier side the model of its pair (see
+                CalibrationRegistry.model_for). With a topology, the measured verifier
+                delays of each completed round are added to the registry at the
+                verifiers' distance, so the models refit as rounds complete.
+            max_pending_rounds (int): Incomplete rounds kept waiting for late verifiers;
+                the oldest is dropped beyond this bound.
+
+        Raises:
+            ValueError: If verifier_ids does not hold exactly three verifiers.
+        """
+        self.verifier_ids = list(verifier_ids)
+        if len(self.verifier_ids) != 3:
+            raise ValueError(f"The triangle test needs exactly three verifiers, got {self.verifier_ids}")
+        self.position = {verifier_id: i + 1 for i, verifier_id in enumerate(self.verifier_ids)}
+        self.max_sessions = max_sessions
+        self.max_pending_rounds = max_pending_rounds
+        self.topology = topology
+        self.calibration = calibration
+        self.lock = threading.Lock()
+        self.pending = {}  # (session_id, iteration) -> {"e": {}, "dv": {}, "reported": set(), "client_id": ...}
+        self.sessions = {}  # session_id -> list of per-iteration (inside, xi)
+        self.listeners = []  # Callables invoked with each completed round
+
+    def add_listener(self, callback):
+        """
+        Registers a callable invoked with (session_id, client_id, iteration, e, dv, xi)
+        after each completed iteration, where e and dv are keyed by triangle position
+        and client_id is None for sessions no client requested.
+        """
+        self.listeners.append(callback)
+
+    def add_result(self, session_id, iteration, sender_id, eij, delays, client_id=None, iterations=None):
+        """
+        Adds one verifier's results for an iteration.
+
+        Args:
+            session_id (str): The measurement session.
+            iteration (int): The iteration number.
+            sender_id (str): The reporting verifier (j in eij).
+            eij (dict): Mapping of sending verifier i to dic + dcj as received by sender_id.
+            delays (dict): Mapping of peer verifier to the av protocol delay measured by sender_id.
+            client_id (str, optional): The client that requested the session, as carried
+                by the verifiers' results; the verdict is addressed to it.
+            iterations (int, optional): Iterations of the session. The verdict of the last
+                one is marked "final"; without it every verdict is.
+
+        Returns:
+            dict or None: The session verdict so far once the iteration is complete, else None.
+        """
+        if sender_id not in self.position:
+            logger.warning(f"Ignoring iteration result from unknown verifier {sender_id}")
+            return None
+        key = (session_id, iteration)
+        with self.lock:
+            state = self.pending.get(key)
+            if state is None:
+                state = self.pending[key] = self.new_round()
+                while len(self.pending) > self.max_pending_rounds:
+                    dropped = next(iter(self.pending))
+                    del self.pending[dropped]
+                    logger.warning(f"Dropped incomplete round {dropped}: not every verifier reported")
+            if client_id is not None:
+                state["client_id"] = client_id
+            if iterations is not None:
+                state["iterations"] = iterations
+            if not self.merge(state, sender_id, eij, delays):
+                return None
+            del self.pending[key]
+            return self._complete(session_id, iteration, state)
+
+    @staticmethod
+    def new_round():
+        return {"e": {}, "dv": {}, "reported": set(), "client_id": None, "iterations": None}
+
+    def merge(self, state, sender_id, eij, delays):
+        """
+        Adds one verifier's results to a round's state, keyed by triangle position.
+
+        Returns:
+            bool: True once every verifier has reported the round.
+        """
+        for i, value in eij.items():
+            if i in self.position:
+                state["e"][(self.position[i], self.position[sender_id])] = value
+        for peer, delay in delays.items():
+            if peer in self.position:
+                state["dv"][(self.position[sender_id], self.position[peer])] = delay
+        state["reported"].add(sender_id)
+        return len(state["reported"]) >= len(self.verifier_ids)
+
+    def decide(self, e, dv):
+        """
+        Applies the triangle test to position-keyed eij sums and verifier delays.
+
+        Returns:
+            tuple: (inside, xi) where xi maps positions 1..3 to estimated client OWDs.
+        """
+        # Imported on first use: NumPy is not needed until a round completes
+        from . import cpv
+
+        xi = cpv.calculate_owds_mp(e)
+        dv_min = self._min_delays(dv)
+        triangle = self.topology.triangle(self.verifier_ids) if self.topology is not None else None
+        if self.calibration is not None:
+            yi = cpv.calculate_verifier_owds(dv_min)
+            inside = cpv.is_client_within_triangle(xi, yi, delay_to_km=self._delay_to_km())
+        elif triangle is not None and triangle.measured and list(triangle.ids) == self.verifier_ids:
+            # Precomputed from measured delays only, never from the verifiers' distance
+            inside = triangle.is_client_within(xi, self.topology.scaling_factor)
+        else:
+            yi = cpv.calculate_verifier_owds(dv_min)
+            inside = cpv.is_client_within_triangle(xi, yi)
+        return inside, xi
+
+    def _delay_to_km(self):
+        # is_client_within_triangle passes x1..x3 then y1..y3, where yk is the side
+        # between verifiers k and k + 1
+        from .calibration import pair_key
+
+        ids = self.verifier_ids
+        models = [self.calibration.model_for(verifier_id) for verifier_id in ids]
+        for k in range(3):
+            i, j = ids[k], ids[(k + 1) % 3]
+            models.append(self.calibration.model_for(pair_key(i, j), i, j))
+        return lambda delays: [float(model.distance_km(delay)) for model, delay in zip(models, delays)]
+
+    @staticmethod
+    def _min_delays(dv):
+        # Use the smaller of the two directions measured between each verifier pair
+        dv_min = {}
+        for (i, j), delay in dv.items():
+            reverse = dv.get((j, i), delay)
+            dv_min[(i, j)] = min(delay, reverse)
+        return dv_min
+
+    def _calibrate(self, a, b, delay):
+        # A verifier delay is a sample of the pair's model and of both verifiers' models
+        if self.calibration is None or not 0 < delay < float('inf'):
+            return
+        distance = self.topology.distance(a, b)
+        if distance is None:
+            return
+        from .calibration import pair_key
+
+        for key in (pair_key(a, b), a, b):
+            self.calibration.add_samples(key, distance, delay)
+
+    def _complete(self, session_id, iteration, state):
+        if self.topology is not None:
+            for (i, j), delay in self._min_delays(state["dv"]).items():
+                if i < j:
+                    a, b = self.verifier_ids[i - 1], self.verifier_ids[j - 1]
+                    self.topology.set_delay(a, b, delay)
+                    self._calibrate(a, b, delay)
+        inside, xi = self.decide(state["e"], state["dv"])
+        for callback in self.listeners:
+            callback(session_id, state["client_id"], iteration, state["e"], state["dv"], xi)
+
+        results = self.sessions.setdefault(session_id, [])
+        results.append((inside, xi))
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.pop(next(iter(self.sessions)))
+        # Majority verdict over the iterations seen so far, with its agreement ratio
+        votes = sum(1 for result in results if result[0])
+        session_inside = votes * 2 >= len(results)
+        agreeing = votes if session_inside else len(results) - votes
+        owds = {self.verifier_ids[i - 1]: x for i, x in xi.items()}
+        logger.info(f"Session {session_id} iteration {iteration}: inside={inside}, owds={owds}")
+        return {
+            "session_id": session_id,
+            "client_id": state["client_id"],
+            "iteration": iteration,
+            "iterations": state["iterations"],
+            "final": state["iterations"] is None or iteration >= state["iterations"],
+            "inside": session_inside,
+            "confidence": agreeing / len(results),
+            "owds": owds,
+        }
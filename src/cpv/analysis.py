@@ -0,0 +1,240 @@
+# analysis.py
+
+import argparse
+import json
+import os
+import re
+from array import array
+import concurrent.futures
+import numpy as np
+from .stats import QuantileSketch, RunningStats
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Slow path for lines the tokenizer does not recognize (extra spaces, tabs, ...)
+RTT_LINE = re.compile(rb"Iteration\s+(\d+),\s+Verifier\s+([A-Za-z0-9]+):\s+RTT=([0-9.]+)")
+DEFAULT_PERCENTILES = (50, 90, 95, 99)
+
+
+def parse_line(line):
+    """
+    Parses one "Iteration N, Verifier X: RTT=S" line of an RTT log.
+
+    The common, exactly formatted case is split with bytes operations; anything
+    else falls back to a regular expression.
+
+    Args:
+        line (bytes): The raw line.
+
+    Returns:
+        tuple or None: (iteration, verifier, rtt), or None for other lines.
+    """
+    parts = line.split(b" ", 3)
+    if len(parts) == 4 and parts[0] == b"Iteration" and parts[2] == b"Verifier":
+        verifier, sep, rtt = parts[3].partition(b": RTT=")
+        if sep:
+            try:
+                return int(parts[1].rstrip(b",")), verifier.decode(), float(rtt)
+            except ValueError:
+                pass
+    match = RTT_LINE.match(line.strip())
+    if match:
+        return int(match.group(1)), match.group(2).decode(), float(match.group(3))
+    return None
+
+
+def iter_rtt_log(filename):
+    """
+    Streams (iteration, verifier, rtt) tuples from an RTT log.
+    """
+    with open(filename, "rb") as file:
+        for line in file:
+            parsed = parse_line(line)
+            if parsed is not None:
+                yield parsed
+
+
+def _chunk_ranges(filename, chunk_bytes):
+    """
+    Splits a file into byte ranges that start at line boundaries.
+    """
+    size = os.path.getsize(filename)
+    ranges = []
+    start = 0
+    with open(filename, "rb") as file:
+        while start < size:
+            end = min(start + chunk_bytes, size)
+            if end < size:
+                file.seek(end)
+                file.readline()
+                end = file.tell()
+            ranges.append((filename, start, end))
+            start = end
+    return ranges
+
+
+def _parse_range(task):
+    """
+    Parses one byte range of a log into compact per-verifier arrays.
+    """
+    filename, start, end = task
+    rtts = {}
+    with open(filename, "rb") as file:
+        file.seek(start)
+        data = file.read(end - start)
+    for line in data.splitlines():
+        parsed = parse_line(line)
+        if parsed is not None:
+            values = rtts.get(parsed[1])
+            if values is None:
+                values = rtts[parsed[1]] = array("d")
+            values.append(parsed[2])
+    return filename, rtts
+
+
+def source_name(filename):
+    """
+    Names the measurement source of a log after its file, e.g. rtt_bangalore.txt -> bangalore.
+    """
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    return stem[len("rtt_"):] if stem.startswith("rtt_") else stem
+
+
+def _map_ranges(function, tasks, processes):
+    if len(tasks) == 1:
+        return [function(tasks[0])]
+    # Attribute access imports concurrent.futures.process (and multiprocessing) only when needed
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(function, tasks))
+
+
+def load_rtt_logs(filenames, chunk_bytes=16 << 20, processes=None, verifier_map=None):
+    """
+    Parses RTT logs in parallel chunks across processes.
+
+    Each worker reads only its own byte range, but every parsed RTT (8 bytes per
+    sample) is returned; use summarize_rtt_logs when only the summaries are needed.
+
+    Args:
+        filenames (list): RTT log paths.
+        chunk_bytes (int): Approximate size of the byte range given to each worker.
+        processes (int, optional): Worker processes (defaults to the CPU count).
+        verifier_map (dict, optional): Renames verifiers, e.g. {"server2": "Delhi"}.
+
+    Returns:
+        dict: (source, verifier) -> ndarray of RTTs in seconds.
+    """
+    verifier_map = verifier_map or {}
+    tasks = [task for filename in filenames for task in _chunk_ranges(filename, chunk_bytes)]
+    merged = {}
+    for filename, rtts in _map_ranges(_parse_range, tasks, processes):
+        for verifier, values in rtts.items():
+            key = (source_name(filename), verifier_map.get(verifier, verifier))
+            merged.setdefault(key, []).append(np.frombuffer(values, dtype=np.float64))
+    return {key: np.concatenate(parts) for key, parts in merged.items()}
+
+
+def _summarize_range(task, relative_accuracy=0.01):
+    """
+    Parses one byte range and reduces each verifier's RTTs to running statistics and a sketch.
+    """
+    filename, rtts = _parse_range(task)
+    summaries = {}
+    for verifier, values in rtts.items():
+        values = np.frombuffer(values, dtype=np.float64)
+        stats = RunningStats()
+        stats.count = len(values)
+        stats.mean = float(values.mean())
+        stats.m2 = float(np.square(values - stats.mean).sum())
+        stats.min, stats.max, stats.last = float(values.min()), float(values.max()), float(values[-1])
+        sketch = QuantileSketch(relative_accuracy)
+        sketch.add_many(values)
+        summaries[verifier] = (stats, sketch)
+    return filename, summaries
+
+
+def summarize_rtt_logs(filenames, percentiles=DEFAULT_PERCENTILES, cdf_points=20, chunk_bytes=16 << 20,
+                       processes=None, verifier_map=None):
+    """
+    Summarizes RTT logs per (source, verifier) pair without keeping the parsed RTTs.
+
+    Each chunk is reduced to running statistics and a quantile sketch in its worker,
+    and the per-chunk results are merged, so memory is bounded by the chunk size and
+    the number of pairs, not by the size of the logs. Count, min, mean and max are
+    exact; percentiles, the median and the CDF are within 1% of the true values.
+
+    Args:
+        filenames (list): RTT log paths.
+        percentiles (sequence): Percentiles to report.
+        cdf_points (int): Number of points sampled from each empirical CDF.
+        chunk_bytes, processes, verifier_map: As for load_rtt_logs.
+
+    Returns:
+        dict: "source/verifier" -> summary dictionary.
+    """
+    verifier_map = verifier_map or {}
+    tasks = [task for filename in filenames for task in _chunk_ranges(filename, chunk_bytes)]
+    merged = {}
+    for filename, summaries in _map_ranges(_summarize_range, tasks, processes):
+        for verifier, (stats, sketch) in summaries.items():
+            key = (source_name(filename), verifier_map.get(verifier, verifier))
+            if key in merged:
+                merged[key][0].merge(stats)
+                merged[key][1].merge(sketch)
+            else:
+                merged[key] = (stats, sketch)
+    levels = np.linspace(0, 100, cdf_points + 1)
+    report = {}
+    for (source, verifier), (stats, sketch) in sorted(merged.items()):
+        def quantile(level):
+            # The extremes are known exactly; the sketch only approximates them
+            if level <= 0:
+                return stats.min
+            if level >= 100:
+                return stats.max
+            return min(max(sketch.quantile(level / 100), stats.min), stats.max)
+
+        summary = {
+            "count": stats.count,
+            "min": stats.min,
+            "mean": stats.mean,
+            "median": quantile(50),
+            "max": stats.max,
+        }
+        for p in percentiles:
+            summary[f"p{p:g}"] = quantile(p)
+        summary["cdf"] = [[quantile(level), float(level) / 100] for level in levels]
+        report[f"{source}/{verifier}"] = summary
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize CPV RTT logs per source and verifier.")
+    parser.add_argument("logs", nargs="+", help="RTT logs, e.g. tests/rtt_bangalore.txt")
+    parser.add_argument("--percentiles", default=",".join(map(str, DEFAULT_PERCENTILES)))
+    parser.add_argument("--cdf-points", type=int, default=20)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--chunk-mb", type=float, default=16)
+    parser.add_argument("--map", default="", help="Verifier renames, e.g. server2=Delhi,server3=Assam")
+    parser.add_argument("--json", action="store_true", help="Print the full summaries as JSON")
+    args = parser.parse_args(argv)
+
+    verifier_map = dict(item.split("=", 1) for item in args.map.split(",") if item)
+    percentiles = [float(p) for p in args.percentiles.split(",")]
+    summaries = summarize_rtt_logs(
+        args.logs, percentiles, args.cdf_points, int(args.chunk_mb * (1 << 20)), args.processes, verifier_map
+    )
+    if args.json:
+        print(json.dumps(summaries, indent=2))
+        return
+    columns = ["count", "min"] + [f"p{p:g}" for p in percentiles] + ["max"]
+    print(f"{'pair':<32}" + "".join(f"{c:>10}" for c in columns))
+    for pair, summary in summaries.items():
+        print(f"{pair:<32}" + "".join(
+            f"{summary[c]:>10}" if c == "count" else f"{summary[c] * 1000:>9.2f}m" for c in columns
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+# calibration.py
+
+import threading
+import numpy as np
+from .analysis import iter_rtt_log
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KEY = "*"  # Model used for keys without a fit of their own
+
+
+def pair_key(i, j):
+    """
+    Returns the model key of a verifier pair, independent of its order.
+    """
+    return "|".join(sorted((i, j)))
+
+
+class DelayDistanceModel:
+    def __init__(self, intercept=0.0, km_per_ms=200.0, max_delay=0.5, resolution=1e-5):
+        """
+        A delay -> distance model compiled into a lookup table.
+
+        The model is the lower envelope of observed one-way delays versus distance,
+        delay_min(d) = intercept + d / speed, inverted to give the largest distance
+        consistent with a delay. The inverse is tabulated on a uniform delay grid and
+        evaluated with np.interp.
+
+        Args:
+            intercept (float): Fixed delay (seconds) not explained by distance.
+            km_per_ms (float): Slope of the envelope, in km per ms of delay.
+            max_delay (float): Largest tabulated delay in seconds; larger delays are
+                extrapolated linearly.
+            resolution (float): Spacing of the delay grid in seconds.
+        """
+        self.intercept = intercept
+        self.km_per_ms = km_per_ms
+        self.max_delay = max_delay
+        self.resolution = resolution
+        self.delays = np.arange(0.0, max_delay + resolution, resolution)
+        self.table = np.maximum(self.delays - intercept, 0.0) * 1000 * km_per_ms
+
+    def distance_km(self, delays):
+        """
+        Converts delays (seconds, scalar or array) to distances in km.
+        """
+        delays = np.asarray(delays, dtype=float)
+        km = np.interp(delays, self.delays, self.table)
+        beyond = delays > self.max_delay
+        if np.any(beyond):
+            km = np.where(beyond, (delays - self.intercept) * 1000 * self.km_per_ms, km)
+        return km
+
+    def to_dict(self):
+        """
+        Returns the model parameters, e.g. for a checkpoint; the inverse of from_dict.
+        """
+        return {
+            "intercept": self.intercept, "km_per_ms": self.km_per_ms,
+            "max_delay": self.max_delay, "resolution": self.resolution,
+        }
+
+    @classmethod
+    def from_dict(cls, params):
+        return cls(**params)
+
+    @classmethod
+    def fit(cls, distances, delays, bin_km=50.0, **kwargs):
+        """
+        Fits the lower envelope of (distance, delay) samples.
+
+        Samples are grouped into distance bins and the minimum delay of each bin is
+        kept; a least-squares line through the minima is then shifted down so it lies
+        under all of them.
+
+        Args:
+            distances (array): Great-circle distances in km.
+            delays (array): One-way delays in seconds.
+            bin_km (float): Width of the distance bins.
+        """
+        distances = np.asarray(distances, dtype=float)
+        delays = np.asarray(delays, dtype=float)
+        bins = np.floor(distances / bin_km).astype(np.int64)
+        order = np.lexsort((delays, bins))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = bins[order][1:] != bins[order][:-1]
+        return cls.fit_minima(distances[order][first], delays[order][first], **kwargs)
+
+    @classmethod
+    def fit_minima(cls, distances, min_delays, **kwargs):
+        """
+        Fits the envelope from per-bin (distance, minimum delay) points.
+        """
+        distances = np.asarray(distances, dtype=float)
+        min_delays = np.asarray(min_delays, dtype=float)
+        if len(distances) < 2 or np.ptp(distances) == 0:
+            raise ValueError("Need minima at two or more distinct distances to fit a delay model")
+        slope, intercept = np.polyfit(distances, min_delays, 1)
+        if slope <= 0:
+            raise ValueError("Fitted delay does not increase with distance")
+        intercept -= max(float(np.max(intercept + slope * distances - min_delays)), 0.0)
+        return cls(intercept=max(intercept, 0.0), km_per_ms=1 / (slope * 1000), **kwargs)
+
+
+class CalibrationRegistry:
+    def __init__(self, bin_km=50.0, refit_every=100, default_km_per_ms=200.0, default_model=None):
+        """
+        Per-verifier or per-region delay -> distance models, refit as data arrives.
+
+        Keys are verifier identifiers, verifier pairs (see pair_key) or regions.
+
+        Only the running minimum delay of each distance bin is retained per key, so a
+        refit costs O(bins) regardless of how many samples have been added.
+
+        Args:
+            bin_km (float): Width of the distance bins.
+            refit_every (int): Number of new samples for a key that triggers a refit.
+            default_km_per_ms (float): Slope of the fallback model used before a key
+                has enough data (the fixed 200 km/ms assumed by is_client_within_triangle).
+            default_model (DelayDistanceModel, optional): Fallback model; replaces
+                default_km_per_ms.
+        """
+        self.bin_km = bin_km
+        self.refit_every = refit_every
+        self.lock = threading.Lock()
+        self.minima = {}  # key -> {bin: (distance, min delay)}
+        self.pending = {}  # key -> samples added since the last fit
+        self.models = {DEFAULT_KEY: default_model or DelayDistanceModel(km_per_ms=default_km_per_ms)}
+
+    def add_samples(self, key, distances, delays):
+        """
+        Adds (distance km, one-way delay s) samples for a key and refits if due.
+        """
+        distances = np.atleast_1d(np.asarray(distances, dtype=float))
+        delays = np.atleast_1d(np.asarray(delays, dtype=float))
+        with self.lock:
+            minima = self.minima.setdefault(key, {})
+            bins = np.floor(distances / self.bin_km).astype(np.int64)
+            for b, distance, delay in zip(bins.tolist(), distances.tolist(), delays.tolist()):
+                current = minima.get(b)
+                if current is None or delay < current[1]:
+                    minima[b] = (distance, delay)
+            self.pending[key] = self.pending.get(key, 0) + len(delays)
+            if self.pending[key] >= self.refit_every:
+                self._refit(key)
+
+    def refit(self, key):
+        """
+        Forces a refit of a key's model from the minima collected so far.
+        """
+        with self.lock:
+            self._refit(key)
+
+    def _refit(self, key):
+        points = sorted(self.minima.get(key, {}).values())
+        self.pending[key] = 0
+        try:
+            model = DelayDistanceModel.fit_minima([p[0] for p in points], [p[1] for p in points])
+        except ValueError as e:
+            logger.info(f"Calibration for {key} not refit: {e}")
+            return
+        self.models[key] = model
+        logger.info(f"Calibration for {key}: {model.km_per_ms:.1f} km/ms, intercept {model.intercept * 1000:.3f} ms")
+
+    def model(self, key=DEFAULT_KEY):
+        """
+        Returns the model for a key, falling back to the default model.
+        """
+        return self.models.get(key) or self.models[DEFAULT_KEY]
+
+    def model_for(self, *keys):
+        """
+        Returns the model of the first key that has a fit of its own, falling back to
+        the default model, e.g. model_for(pair_key(i, j), i, j).
+        """
+        for key in keys:
+            model = self.models.get(key)
+            if model is not None:
+                return model
+        return self.models[DEFAULT_KEY]
+
+    def to_dict(self):
+        """
+        Returns the collected minima and the default model, e.g. for a checkpoint;
+        the inverse of from_dict.
+        """
+        with self.lock:
+            return {
+                "bin_km": self.bin_km,
+                "refit_every": self.refit_every,
+                "default": self.models[DEFAULT_KEY].to_dict(),
+                "minima": {key: list(minima.values()) for key, minima in self.minima.items()},
+            }
+
+    @classmethod
+    def from_dict(cls, params):
+        """
+        Rebuilds a registry from to_dict and refits every key from its minima.
+        """
+        registry = cls(params["bin_km"], params["refit_every"],
+                       default_model=DelayDistanceModel.from_dict(params["default"]))
+        for key, points in params["minima"].items():
+            registry.add_samples(key, [p[0] for p in points], [p[1] for p in points])
+            registry.refit(key)
+        return registry
+
+    def add_rtt_log(self, filename, distances_km, key=None):
+        """
+        Adds the samples of an RTT log ("Iteration N, Verifier X: RTT=..." lines), using
+        half of each RTT as the one-way delay.
+
+        Args:
+            filename (str): Path of the log, e.g. tests/rtt_bangalore.txt.
+            distances_km (dict): Distance in km to each verifier named in the log.
+            key (str, optional): Model key; defaults to each line's verifier.
+        """
+        samples = {}
+        for _, verifier, rtt in iter_rtt_log(filename):
+            if verifier in distances_km:
+                samples.setdefault(key or verifier, []).append((distances_km[verifier], rtt / 2))
+        for sample_key, pairs in samples.items():
+            self.add_samples(sample_key, [p[0] for p in pairs], [p[1] for p in pairs])
+            with self.lock:
+                if self.pending.get(sample_key):
+                    self._refit(sample_key)
@@ -0,0 +1,104 @@
+# checkpoint.py
+
+import json
+import os
+import threading
+import time
+import zlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+
+
+def write_snapshot(path, state):
+    """
+    Writes a state dictionary as zlib-compressed JSON, atomically.
+
+    The snapshot is written to a temporary file in the same directory, synced and
+    renamed over the previous one, so a crash leaves either the old or the new
+    snapshot, never a partial one.
+    """
+    data = zlib.compress(json.dumps(dict(state, version=SNAPSHOT_VERSION)).encode())
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp, path)
+    return len(data)
+
+
+def read_snapshot(path):
+    """
+    Reads a snapshot written by write_snapshot.
+
+    Returns:
+        dict or None: The state, or None if there is no usable snapshot.
+    """
+    try:
+        with open(path, "rb") as file:
+            state = json.loads(zlib.decompress(file.read()))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, zlib.error) as e:
+        logger.error(f"Ignoring unreadable snapshot {path}: {e}")
+        return None
+    if state.get("version") != SNAPSHOT_VERSION:
+        logger.warning(f"Ignoring snapshot {path} with version {state.get('version')}")
+        return None
+    return state
+
+
+class Checkpointer:
+    def __init__(self, path, snapshot, interval=30.0):
+        """
+        Periodically saves a snapshot of durable state on a background thread.
+
+        Args:
+            path (str): Snapshot file.
+            snapshot (callable): Returns the JSON-serializable state to save. It should
+                only copy state; serialization and disk I/O happen afterwards, on the
+                checkpoint thread.
+            interval (float): Seconds between checkpoints.
+        """
+        self.path = path
+        self.snapshot = snapshot
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.saved_at = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def save(self):
+        """
+        Takes and writes a snapshot now.
+        """
+        try:
+            size = write_snapshot(self.path, self.snapshot())
+        except (OSError, TypeError, ValueError) as e:
+            logger.error(f"Error writing checkpoint {self.path}: {e}")
+            return False
+        self.saved_at = time.time()
+        logger.debug(f"Wrote checkpoint {self.path} ({size} bytes)")
+        return True
+
+    def stop(self, save=True):
+        """
+        Stops the periodic checkpoints, writing a final one first if `save` is set.
+        """
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        if save:
+            self.save()
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.save()
@@ -3,27 +3,45 @@
 import socket
 import threading
 import time
+import uuid
 from . import cpv_utils
+from .send_queue import DROP, SendQueue
+from .stats import RunningStats
+from .tracing import NULL_TRACER, traced_lock
 import logging
 
 logger = logging.getLogger(__name__)
 
 class Client:
-    def __init__(self, identifier, servers):
+    def __init__(self, identifier, servers, tracer=None, send_queue_bytes=1 << 20,
+                 send_queue_messages=10000, slow_consumer_policy=DROP):
         """
         Initializes the Client object to connect to multiple servers.
 
         Args:
             identifier (str): Unique identifier for this client.
             servers (dict): Mapping of server identifiers to (host, port).
+            tracer (Tracer, optional): Records spans of the forwarding hop. Tracing is
+                disabled when omitted.
+            send_queue_bytes (int, optional): Bound on bytes queued per server connection.
+            send_queue_messages (int, optional): Bound on messages queued per server connection.
+            slow_consumer_policy (str, optional): "drop" or "disconnect" (see cpv.send_queue).
         """
         self.identifier = identifier  # Unique identifier for this client
         self.servers = servers  # Mapping of server identifiers to (host, port)
         self.connections = {}  # Map server identifiers to their socket connections
+        self.send_queues = {}  # Map server identifiers to their outbound SendQueue
+        self.send_queue_bytes = send_queue_bytes
+        self.send_queue_messages = send_queue_messages
+        self.slow_consumer_policy = slow_consumer_policy
         self.running = True
         self.lock = threading.Lock()
+        self.tracer = tracer or NULL_TRACER
         self.session_id = None  # Session ID for the current measurement
         self.forwarded_timestamps = set()  # To prevent redundant forwarding
+        self.verdicts = {}  # Latest verdict received from each server
+        self.forward_dwell = RunningStats()  # Seconds from TIMESTAMP receipt to forward send
+        self.dwell_lock = threading.Lock()
 
     def start(self):
         """
@@ -53,6 +71,10 @@ class Client:
             server_socket.sendall(message.encode())
             with self.lock:
                 self.connections[identifier] = server_socket
+                self.send_queues[identifier] = SendQueue(
+                    server_socket, identifier, self.send_queue_bytes,
+                    self.send_queue_messages, self.slow_consumer_policy
+                )
             threading.Thread(
                 target=self._handle_server, args=(server_socket, identifier), daemon=True
             ).start()
@@ -65,17 +87,17 @@ class Client:
         Handles communication with a server.
         """
         try:
-            while self.running:
-                data = connection.recv(1024).decode()
-                if not data:
-                    continue
+            for data in cpv_utils.receive_messages(connection):
+                received = time.perf_counter()
+                if not self.running:
+                    break
                 message_type, params = cpv_utils.parse_message(data)
                 if message_type == cpv_utils.TIMESTAMP:
                     # Verifier sent timestamp; forward to all verifiers
                     sender_id = params[0]
                     timestamp = params[1]
                     iteration = params[2]
-                    self._forward_timestamp_to_verifiers(sender_id, timestamp, iteration)
+                    self._forward_timestamp_to_verifiers(sender_id, timestamp, iteration, received)
                 elif message_type == cpv_utils.START_MEASUREMENTS:
                     # Start measurements
                     session_id = params[0]
@@ -83,6 +105,20 @@ class Client:
                     self.session_id = session_id
                     logger.info(f"[{self.identifier}] Starting measurements for session {session_id}")
                     # No action needed; verifiers initiate measurements
+                elif message_type == cpv_utils.REJECTED:
+                    logger.warning(f"[{self.identifier}] Session {params[0]} rejected by {identifier}: {params[1]}")
+                elif message_type == cpv_utils.VERDICT:
+                    # Verdict from a server, possibly served from its cache
+                    session_id = params[1]
+                    inside = params[2] == "1"
+                    confidence = float(params[3])
+                    owds = cpv_utils.decode_owds(params[4:])
+                    with self.lock:
+                        self.verdicts[identifier] = {
+                            "session_id": session_id, "inside": inside,
+                            "confidence": confidence, "owds": owds
+                        }
+                    logger.info(f"[{self.identifier}] Verdict from {identifier}: inside={inside}, confidence={confidence:.2f}")
                 else:
                     logger.info(f"[{self.identifier}] Received from {identifier}: {data}")
         except socket.error as e:
@@ -91,29 +127,69 @@ class Client:
             with self.lock:
                 connection.close()
                 self.connections.pop(identifier, None)
+                queue = self.send_queues.pop(identifier, None)
+                if queue is not None:
+                    queue.close()
                 logger.info(f"[{self.identifier}] Disconnected from {identifier}")
 
-    def _forward_timestamp_to_verifiers(self, sender_id, timestamp, iteration):
+    def _forward_timestamp_to_verifiers(self, sender_id, timestamp, iteration, received=None):
         """
         Forwards a timestamp received from one verifier to all verifiers.
+
+        Each forward carries the client's dwell time: the perf_counter seconds from
+        receiving the TIMESTAMP to handing the forward to sendall, so verifiers can
+        separate client-side delay from network delay.
+
+        Args:
+            received (float, optional): perf_counter time the TIMESTAMP was received.
         """
+        received = received if received is not None else time.perf_counter()
         key = (sender_id, timestamp, iteration)
         with self.lock:
             if key in self.forwarded_timestamps:
                 return  # Already forwarded this timestamp
             self.forwarded_timestamps.add(key)
 
-        message = cpv_utils.construct_message(
-            cpv_utils.FORWARD_TIMESTAMP, sender_id, timestamp, iteration
-        )
+        def render():
+            # Called by the send queue's writer right before sendall
+            dwell = time.perf_counter() - received
+            with self.dwell_lock:
+                self.forward_dwell.add(dwell)
+            return cpv_utils.construct_message(
+                cpv_utils.FORWARD_TIMESTAMP, sender_id, timestamp, iteration, f"{dwell:.9f}"
+            ).encode()
+
+        size = len(cpv_utils.construct_message(cpv_utils.FORWARD_TIMESTAMP, sender_id, timestamp, iteration)) + 12
+        with self.tracer.span("client_forward", session=self.session_id, iteration=iteration, peer=sender_id), \
+                traced_lock(self.tracer, self.lock, session=self.session_id, iteration=iteration, peer=sender_id):
+            for identifier, queue in self.send_queues.items():
+                if identifier != sender_id and queue.send(render, size):
+                    logger.info(f"[{self.identifier}] Forwarded timestamp from {sender_id} to {identifier}")
+
+    def start_monitoring(self, session_id=None):
+        """
+        Asks the verifiers to monitor this client continuously; verdicts then arrive
+        periodically for the returned session ID.
+        """
+        session_id = session_id or str(uuid.uuid4())
+        self._send_to_servers(cpv_utils.construct_message(cpv_utils.START_MONITORING, session_id))
+        return session_id
+
+    def stop_monitoring(self):
+        self._send_to_servers(cpv_utils.construct_message(cpv_utils.STOP_MONITORING, self.identifier))
+
+    def _send_to_servers(self, message):
+        data = message.encode()
         with self.lock:
-            for identifier, connection in self.connections.items():
-                if identifier != sender_id:
-                    try:
-                        connection.sendall(message.encode())
-                        logger.info(f"[{self.identifier}] Forwarded timestamp from {sender_id} to {identifier}")
-                    except socket.error as e:
-                        logger.error(f"[{self.identifier}] Error forwarding timestamp to {identifier}: {e}")
+            for queue in self.send_queues.values():
+                queue.send(data)
+
+    def send_queue_metrics(self):
+        """
+        Returns the depth and counters of every server connection's outbound queue.
+        """
+        with self.lock:
+            return [queue.metrics() for queue in self.send_queues.values()]
 
     def list_connections(self):
         """
@@ -131,6 +207,9 @@ class Client:
         logger.info(f"[{self.identifier}] Shutting down...")
         self.running = False
         with self.lock:
+            for queue in self.send_queues.values():
+                queue.close()
+            self.send_queues.clear()
             for identifier, connection in self.connections.items():
                 try:
                     connection.close()
@@ -144,13 +223,15 @@ class Client:
         Provides a command-line interface for the user to interact with the client.
         """
         while self.running:
-            command = input("Enter command (list/connect/close): ").strip().lower()
+            command = input("Enter command (list/connect/monitor/close): ").strip().lower()
             if command == "list":
                 self.list_connections()
             elif command == "connect":
                 self.connect_to_servers()
+            elif command == "monitor":
+                self.start_monitoring()
             elif command == "close":
                 self.shutdown()
                 break
             else:
-                logger.info("Available commands: list, connect, close")
+                logger.info("Available commands: list, connect, monitor, close")
@@ -1,4 +1,5 @@
 import math
+import numpy as np
 
 def calculate_owds_mp(eij):
     """
@@ -67,34 +68,47 @@ def area_of_triangle(a, b, c):
     return math.sqrt(area_squared)
 
 
-def is_client_within_triangle(xi, yi):
+def is_client_within_triangle(xi, yi, area_v=None, scaling_factor=200, delay_to_km=None, tolerance=0.2):
     """
     Determines if the client is within the triangle formed by the verifiers.
 
     :param xi: Dictionary of estimated OWDs from client to verifiers (xi)
     :param yi: Dictionary of OWDs between verifiers (yi)
+    :param area_v: Precomputed area of the verifier triangle (see cpv.topology), computed from yi if None
+    :param scaling_factor: Distance in km covered per ms of delay
+    :param delay_to_km: Calibrated model mapping an array of delays (seconds) to km
+        (e.g. DelayDistanceModel.distance_km from cpv.calibration); replaces scaling_factor
+    :param tolerance: Accepted relative difference between the client and verifier areas
     :return: True if client is within the triangle, False otherwise
     """
-    # Map delays to distances (assuming 1 ms = 200 km for simplicity)
-    # This is to account for the minimal delays on a LAN
-    # Convert delays from seconds to milliseconds
-    xi_ms = {k: v * 1000 for k, v in xi.items()}
-    yi_ms = {k: v * 1000 for k, v in yi.items()}
+    if delay_to_km is not None:
+        # Evaluate the calibrated model on all delays in one vectorized call
+        keys = [("x", k) for k in xi] + [("y", k) for k in yi]
+        km = delay_to_km([xi[k] for k in xi] + [yi[k] for k in yi])
+        scaled = dict(zip(keys, (float(d) for d in km)))
+        xi_scaled = {k: scaled[("x", k)] for k in xi}
+        yi_scaled = {k: scaled[("y", k)] for k in yi}
+    else:
+        # Map delays to distances (assuming 1 ms = 200 km for simplicity)
+        # This is to account for the minimal delays on a LAN
+        # Convert delays from seconds to milliseconds
+        xi_ms = {k: v * 1000 for k, v in xi.items()}
+        yi_ms = {k: v * 1000 for k, v in yi.items()}
 
-    # Apply a scaling factor to represent distances
-    scaling_factor = 200  # km per ms
-    xi_scaled = {k: v * scaling_factor for k, v in xi_ms.items()}
-    yi_scaled = {k: v * scaling_factor for k, v in yi_ms.items()}
+        # Apply a scaling factor to represent distances (km per ms)
+        xi_scaled = {k: v * scaling_factor for k, v in xi_ms.items()}
+        yi_scaled = {k: v * scaling_factor for k, v in yi_ms.items()}
 
     # Calculate areas
     # area_v: Area of the triangle formed by the verifiers
     # area_c: Sum of areas of triangles formed by the client and verifiers
-    sides_v = [
-        yi_scaled.get(1, 0),  # Between verifier 1 and 2
-        yi_scaled.get(2, 0),  # Between verifier 2 and 3
-        yi_scaled.get(3, 0),  # Between verifier 3 and 1
-    ]
-    area_v = area_of_triangle(*sides_v)
+    if area_v is None:
+        sides_v = [
+            yi_scaled.get(1, 0),  # Between verifier 1 and 2
+            yi_scaled.get(2, 0),  # Between verifier 2 and 3
+            yi_scaled.get(3, 0),  # Between verifier 3 and 1
+        ]
+        area_v = area_of_triangle(*sides_v)
 
     sides_c = []
     # Triangles formed by client and pairs of verifiers
@@ -110,8 +124,64 @@ def is_client_within_triangle(xi, yi):
     # Check if the client is within the triangle
     # If the sum of areas equals the area of the verifier triangle, the client is inside
     # Allow for a larger tolerance due to minimal delays on LAN
-    tolerance = 0.2 * area_v  # 20% tolerance
-    if abs(area_c - area_v) <= tolerance:
+    if abs(area_c - area_v) <= tolerance * area_v:  # 20% tolerance by default
         return True
     else:
         return False
+
+
+def calculate_owds_mp_batch(eij):
+    """
+    Vectorized calculate_owds_mp over many rounds.
+
+    :param eij: Array of shape (rounds, 3, 3) with eij[r, i, j] = dic + dcj (0-based, NaN if missing)
+    :return: Array of shape (rounds, 3) with x1, x2, x3 per round
+    """
+    eij = np.where(np.isnan(eij), np.inf, eij)
+    m = np.minimum(eij, eij.transpose(0, 2, 1))
+    m12, m23, m31 = m[:, 0, 1], m[:, 1, 2], m[:, 2, 0]
+    x1 = (m12 + m31 - m23) / 2
+    return np.stack([x1, m12 - x1, m31 - x1], axis=1)
+
+
+def calculate_verifier_owds_batch(dv):
+    """
+    Vectorized calculate_verifier_owds over many rounds.
+
+    :param dv: Array of shape (rounds, 3, 3) with dv[r, i, j] = OWD from verifier i to j (0-based)
+    :return: Array of shape (rounds, 3) with y1 (1-2), y2 (2-3), y3 (3-1) per round
+    """
+    dv = np.where(np.isnan(dv), np.inf, dv)
+    return np.stack([dv[:, 0, 1], dv[:, 1, 2], dv[:, 2, 0]], axis=1)
+
+
+def area_of_triangle_batch(a, b, c):
+    """
+    Vectorized area_of_triangle (Heron's formula); degenerate triangles have area 0.
+    """
+    s = (a + b + c) / 2
+    with np.errstate(invalid="ignore"):
+        area_squared = s * (s - a) * (s - b) * (s - c)
+        return np.where(area_squared > 0, np.sqrt(np.where(area_squared > 0, area_squared, 0)), 0.0)
+
+
+def is_client_within_triangle_batch(xi, yi, scaling_factor=200, tolerance=0.2):
+    """
+    Vectorized is_client_within_triangle over many rounds.
+
+    :param xi: Array of shape (rounds, 3) of client OWDs to verifiers 1..3 (seconds)
+    :param yi: Array of shape (rounds, 3) of verifier OWDs 1-2, 2-3, 3-1 (seconds)
+    :param scaling_factor: Distance in km covered per ms of delay
+    :param tolerance: Accepted relative difference between the client and verifier areas
+    :return: Boolean array of shape (rounds,)
+    """
+    x = xi * 1000 * scaling_factor
+    y = yi * 1000 * scaling_factor
+    area_v = area_of_triangle_batch(y[:, 0], y[:, 1], y[:, 2])
+    area_c = (
+        area_of_triangle_batch(x[:, 0], x[:, 1], y[:, 0])
+        + area_of_triangle_batch(x[:, 1], x[:, 2], y[:, 1])
+        + area_of_triangle_batch(x[:, 2], x[:, 0], y[:, 2])
+    )
+    with np.errstate(invalid="ignore"):
+        return np.abs(area_c - area_v) <= tolerance * area_v
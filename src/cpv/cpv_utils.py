@@ -1,8 +1,5 @@
 # cpv_utils.py
 
-import json
-import time
-import threading
 import logging
 
 # Constants for message types
@@ -12,9 +9,20 @@ FORWARD_TIMESTAMP = "FORWARD_TIMESTAMP"
 RTT_MEASUREMENT_REQUEST = "RTT_MEASUREMENT_REQUEST"
 RTT_MEASUREMENT_RESPONSE = "RTT_MEASUREMENT_RESPONSE"
 START_MEASUREMENTS = "START_MEASUREMENTS"
+VERDICT = "VERDICT"
+ITERATION_RESULT = "ITERATION_RESULT"
+REJECTED = "REJECTED"
+START_MONITORING = "START_MONITORING"
+STOP_MONITORING = "STOP_MONITORING"
+MONITOR_RESULT = "MONITOR_RESULT"
+SESSION_REQUEST = "SESSION_REQUEST"
+
+# Client field of START_MEASUREMENTS and ITERATION_RESULT for sessions no client requested
+NO_CLIENT = "-"
+
+# Every message ends with this delimiter so coalesced TCP segments can be split apart
+MESSAGE_DELIMITER = "\n"
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def parse_message(data):
@@ -43,33 +51,73 @@ def construct_message(message_type, *args):
         *args: Additional arguments to include in the message.
 
     Returns:
-        str: The constructed message string.
+        str: The constructed message string, terminated by MESSAGE_DELIMITER.
+    """
+    return f"{message_type} {' '.join(map(str, args))}{MESSAGE_DELIMITER}"
+
+def split_messages(pending):
+    """
+    Splits buffered stream data into complete messages.
+
+    Args:
+        pending (str): Data received so far, possibly ending in a partial message.
+
+    Returns:
+        tuple: A list of complete, non-empty messages and the remaining partial data.
+    """
+    *messages, pending = pending.split(MESSAGE_DELIMITER)
+    return [message for message in messages if message.strip()], pending
+
+def receive_messages(connection, pending="", bufsize=4096):
+    """
+    Yields complete messages received on a connection until the peer closes it.
+
+    Args:
+        connection (socket.socket): The connection to read from.
+        pending (str, optional): Data already read from the connection.
+        bufsize (int, optional): Maximum number of bytes read per recv call.
+
+    Yields:
+        str: One message, without its delimiter.
+    """
+    while True:
+        messages, pending = split_messages(pending)
+        yield from messages
+        data = connection.recv(bufsize)
+        if not data:
+            if pending.strip():
+                yield pending
+            return
+        pending += data.decode()
+
+def encode_owds(owds, prefix=""):
+    """
+    Encodes a mapping of verifier identifiers to OWDs as message parameters.
+
+    Args:
+        owds (dict): Mapping of verifier identifiers to OWD estimates (seconds).
+        prefix (str, optional): Tag prepended to each parameter, e.g. "e:".
+
+    Returns:
+        list: Parameters of the form "[prefix]verifier=owd".
     """
-    return f"{message_type} {' '.join(map(str, args))}"
+    return [f"{prefix}{verifier_id}={owd:.9f}" for verifier_id, owd in owds.items()]
 
-def log_delays(filename, session_id, iteration, data, lock=None):
+def decode_owds(params, prefix=""):
     """
-    Logs the delay data to the specified JSON file.
+    Decodes parameters produced by encode_owds back into a mapping.
 
     Args:
-        filename (str): The name of the file to log to.
-        session_id (str): The session ID for the measurement.
-        iteration (int): The iteration number.
-        data (dict): The data to log.
-        lock (threading.Lock, optional): A lock to ensure thread safety.
+        params (list): Parameters of the form "[prefix]verifier=owd".
+        prefix (str, optional): Only parameters with this tag are decoded.
+
+    Returns:
+        dict: Mapping of verifier identifiers to OWD estimates (seconds).
     """
-    entry = {
-        "session_id": session_id,
-        "iteration": iteration,
-        "data": data,
-        "timestamp": time.time()
-    }
-    if lock:
-        lock.acquire()
-    try:
-        with open(filename, "a") as file:
-            json.dump(entry, file)
-            file.write("\n")
-    finally:
-        if lock:
-            lock.release()
+    owds = {}
+    for param in params:
+        if not param.startswith(prefix):
+            continue
+        verifier_id, _, owd = param[len(prefix):].partition("=")
+        owds[verifier_id] = float(owd)
+    return owds
@@ -0,0 +1,248 @@
+# loadgen.py
+
+import argparse
+import asyncio
+import random
+import time
+import uuid
+import numpy as np
+from . import cpv_utils
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LoadStats:
+    """
+    Counters and latency samples collected across all virtual clients.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.connected = 0
+        self.failed = 0
+        self.timestamps = 0  # TIMESTAMP messages received
+        self.forwards = 0  # FORWARD_TIMESTAMP messages sent
+        self.ignored = 0  # TIMESTAMP messages received with no session pending
+        self.sessions = 0  # Sessions requested
+        self.verdicts = 0  # Sessions answered with a VERDICT
+        self.forward_latencies = []  # Seconds from TIMESTAMP receipt to last forward sent
+        self.session_latencies = []  # Seconds from START_MEASUREMENTS to the final VERDICT
+
+    def report(self):
+        """
+        Returns a dictionary summarizing throughput and latency percentiles.
+        """
+        elapsed = max(time.time() - self.started, 1e-9)
+        report = {
+            "elapsed": elapsed,
+            "connected": self.connected,
+            "failed": self.failed,
+            "sessions": self.sessions,
+            "verdicts": self.verdicts,
+            "verdicts_per_second": self.verdicts / elapsed,
+            "timestamps_per_second": self.timestamps / elapsed,
+            "forwards_per_second": self.forwards / elapsed,
+            "ignored_timestamps": self.ignored,
+        }
+        for name, samples in (("session", self.session_latencies), ("forward", self.forward_latencies)):
+            if samples:
+                p50, p95, p99, p999 = np.percentile(samples, [50, 95, 99, 99.9])
+                report.update({
+                    f"{name}_p50": p50, f"{name}_p95": p95,
+                    f"{name}_p99": p99, f"{name}_p999": p999, f"{name}_max": max(samples),
+                })
+        return report
+
+
+class VirtualClient:
+    def __init__(self, identifier, servers, stats, forward_delay=0.0, relay_delay=None):
+        """
+        A client speaking the client side of the CPV protocol on an asyncio event loop.
+
+        It sends HELLO to every server and, while one of its sessions is pending,
+        answers each TIMESTAMP with a FORWARD_TIMESTAMP to the other servers, like
+        Client._forward_timestamp_to_verifiers. Timestamps arriving with no session
+        pending belong to no session of this client and are not forwarded.
+
+        Args:
+            identifier (str): Client identifier; must start with "client".
+            servers (dict): Mapping of server identifiers to (host, port).
+            stats (LoadStats): Shared statistics.
+            forward_delay (float): Mean injected delay (seconds) before forwarding,
+                drawn from an exponential distribution.
+            relay_delay (float, optional): Extra fixed delay per forward, emulating a
+                client behind a relay or proxy.
+        """
+        self.identifier = identifier
+        self.servers = servers
+        self.stats = stats
+        self.forward_delay = forward_delay
+        self.relay_delay = relay_delay
+        self.writers = {}
+        self.forwarded = set()
+        self.pending_sessions = {}  # session_id -> start time
+
+    async def connect(self):
+        """
+        Opens a connection to every server and starts reading from each.
+        """
+        for server_id, (host, port) in self.servers.items():
+            reader, writer = await asyncio.open_connection(host, port)
+            writer.write(cpv_utils.construct_message(cpv_utils.HELLO, self.identifier).encode())
+            self.writers[server_id] = writer
+            asyncio.get_running_loop().create_task(self._read(server_id, reader))
+        self.stats.connected += 1
+
+    async def start_session(self, iterations):
+        """
+        Asks the servers to verify this client. The request goes to every server, like
+        the client's other messages; they pass it to their coordinator, which runs the
+        session once.
+        """
+        session_id = str(uuid.uuid4())
+        message = cpv_utils.construct_message(cpv_utils.START_MEASUREMENTS, session_id, iterations).encode()
+        self.pending_sessions[session_id] = time.time()
+        for writer in self.writers.values():
+            writer.write(message)
+        self.stats.sessions += 1
+
+    async def _read(self, server_id, reader):
+        pending = ""
+        while True:
+            data = await reader.read(4096)
+            if not data:
+                return
+            messages, pending = cpv_utils.split_messages(pending + data.decode())
+            for message in messages:
+                message_type, params = cpv_utils.parse_message(message)
+                if message_type == cpv_utils.TIMESTAMP and not self.pending_sessions:
+                    self.stats.ignored += 1
+                elif message_type == cpv_utils.TIMESTAMP:
+                    self.stats.timestamps += 1
+                    asyncio.get_running_loop().create_task(self._forward(params[0], params[1], params[2]))
+                elif message_type == cpv_utils.VERDICT:
+                    # Only a session's final verdict is sent, but every server holding it
+                    # in its cache answers the request, so repeats are not counted
+                    start = self.pending_sessions.pop(params[1], None)
+                    if start is not None:
+                        self.stats.verdicts += 1
+                        self.stats.session_latencies.append(time.time() - start)
+
+    async def _forward(self, sender_id, timestamp, iteration):
+        key = (sender_id, timestamp, iteration)
+        if key in self.forwarded:
+            return
+        self.forwarded.add(key)
+        received = time.time()
+        dwell_start = time.perf_counter()
+        if self.forward_delay:
+            await asyncio.sleep(random.expovariate(1 / self.forward_delay))
+        # A relay's delay happens off the client, so it is not part of the reported dwell
+        dwell = time.perf_counter() - dwell_start
+        if self.relay_delay:
+            await asyncio.sleep(self.relay_delay)
+        message = cpv_utils.construct_message(
+            cpv_utils.FORWARD_TIMESTAMP, sender_id, timestamp, iteration, f"{dwell:.9f}"
+        ).encode()
+        for server_id, writer in self.writers.items():
+            if server_id != sender_id:
+                writer.write(message)
+                self.stats.forwards += 1
+        self.stats.forward_latencies.append(time.time() - received)
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+
+
+async def run_load(servers, clients=1000, rate=100.0, duration=60.0, iterations=1,
+                   forward_delay=0.0, relay_fraction=0.0, relay_delay=0.02, session_interval=None):
+    """
+    Drives virtual clients against a verifier cluster and returns a LoadStats report.
+
+    Args:
+        servers (dict): Mapping of server identifiers to (host, port).
+        clients (int): Number of virtual clients to start.
+        rate (float): Client arrivals per second (Poisson process).
+        duration (float): Seconds to run after the first arrival.
+        iterations (int): Iterations requested per session.
+        forward_delay (float): Mean injected forwarding delay in seconds.
+        relay_fraction (float): Fraction of clients emulating a relay or proxy.
+        relay_delay (float): Extra per-forward delay of relayed clients.
+        session_interval (float, optional): If set, each client requests a new
+            session every this many seconds; otherwise only once on arrival.
+    """
+    stats = LoadStats()
+    population = []
+    tasks = []
+
+    async def arrive(index):
+        relayed = random.random() < relay_fraction
+        client = VirtualClient(
+            f"client-lg-{index}", servers, stats, forward_delay, relay_delay if relayed else None
+        )
+        try:
+            await client.connect()
+        except OSError as e:
+            stats.failed += 1
+            logger.error(f"Virtual client {client.identifier} failed to connect: {e}")
+            return
+        population.append(client)
+        while True:
+            await client.start_session(iterations)
+            if session_interval is None:
+                return
+            await asyncio.sleep(session_interval)
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + duration
+    for index in range(clients):
+        if loop.time() >= deadline:
+            break
+        tasks.append(loop.create_task(arrive(index)))
+        await asyncio.sleep(random.expovariate(rate))
+    await asyncio.sleep(max(deadline - loop.time(), 0))
+    for task in tasks:
+        task.cancel()
+    for client in population:
+        client.close()
+    return stats.report()
+
+
+def parse_servers(spec):
+    """
+    Parses "server1=host:port,server2=host:port" into a servers mapping.
+    """
+    servers = {}
+    for item in spec.split(","):
+        server_id, _, address = item.partition("=")
+        host, _, port = address.rpartition(":")
+        servers[server_id] = (host, int(port))
+    return servers
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Emulate many CPV clients against a verifier cluster.")
+    parser.add_argument("--servers", required=True, help="server1=host:port,server2=host:port,...")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=100.0, help="Client arrivals per second")
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--iterations", type=int, default=1)
+    parser.add_argument("--forward-delay", type=float, default=0.0)
+    parser.add_argument("--relay-fraction", type=float, default=0.0)
+    parser.add_argument("--relay-delay", type=float, default=0.02)
+    parser.add_argument("--session-interval", type=float, default=None)
+    args = parser.parse_args(argv)
+    report = asyncio.run(run_load(
+        parse_servers(args.servers), args.clients, args.rate, args.duration, args.iterations,
+        args.forward_delay, args.relay_fraction, args.relay_delay, args.session_interval
+    ))
+    for key, value in report.items():
+        print(f"{key:>22}: {value:.6f}" if isinstance(value, float) else f"{key:>22}: {value}")
+    if report["sessions"] and not report["verdicts"]:
+        parser.exit(1, "No session produced a verdict\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+# measurement_table.py
+
+import numpy as np
+
+
+class MeasurementTable:
+    def __init__(self, verifier_ids=(), iterations=1):
+        """
+        Per-session measurement storage for the mp and av protocols.
+
+        Verifier identifiers are interned to small integers, and measurements live in
+        NumPy arrays indexed by (iteration - 1, i, j) with NaN for missing entries.
+        Arrays grow on demand when an unseen verifier arrives; iterations outside
+        1..iterations of the current session are rejected, since they come off the wire.
+
+        Args:
+            verifier_ids (iterable): Verifier identifiers known up front.
+            iterations (int): Number of iterations to preallocate.
+        """
+        verifier_ids = list(verifier_ids)
+        self.ids = []
+        self.index = {}
+        self.session_id = None
+        self.iterations = max(iterations, 1)
+        self._allocate(max(len(verifier_ids), 1), max(iterations, 1))
+        for verifier_id in verifier_ids:
+            self.intern(verifier_id)
+
+    def _allocate(self, n, iterations):
+        self.dic_dcj = np.full((iterations, n, n), np.nan)  # dic + dcj, indexed [it, i, j]
+        self.min_sums = np.full((iterations, n, n), np.nan)  # min(dic + dcj, djc + dci)
+        self.av_delays = np.full((iterations, n), np.nan)  # Half-RTT to each verifier
+        self.rtt_send_times = np.full((iterations, n), np.nan)  # Send times of RTT probes
+
+    def start_session(self, session_id, iterations):
+        """
+        Clears the table for a new session of the given number of iterations.
+
+        Samples recorded before the call belong to the previous session and are
+        discarded, so every verifier must start the session before the first probe is
+        sent (the coordinator's common start time ensures this). A repeated call for
+        the same session keeps what was recorded since the first one.
+        """
+        iterations = max(iterations, 1)
+        if session_id == self.session_id and session_id is not None:
+            self._grow(len(self.ids), iterations)
+            self.iterations = max(self.iterations, iterations)
+            return
+        self.session_id = session_id
+        self.iterations = iterations
+        self._allocate(max(len(self.ids), 1), iterations)
+
+    def intern(self, verifier_id):
+        """
+        Returns the small integer index of a verifier identifier, assigning one if needed.
+        """
+        i = self.index.get(verifier_id)
+        if i is None:
+            i = len(self.ids)
+            self.ids.append(verifier_id)
+            self.index[verifier_id] = i
+            self._grow(len(self.ids), self.dic_dcj.shape[0])
+        return i
+
+    def _grow(self, n, iterations):
+        old_iterations, old_n, _ = self.dic_dcj.shape
+        if n <= old_n and iterations <= old_iterations:
+            return
+        new_n = old_n if n <= old_n else max(n, 2 * old_n)
+        new_iterations = old_iterations if iterations <= old_iterations else max(iterations, 2 * old_iterations)
+        for name in ("dic_dcj", "min_sums", "av_delays", "rtt_send_times"):
+            old = getattr(self, name)
+            shape = (new_iterations,) + (new_n,) * (old.ndim - 1)
+            new = np.full(shape, np.nan)
+            new[tuple(slice(0, s) for s in old.shape)] = old
+            setattr(self, name, new)
+
+    def _row(self, iteration):
+        """
+        Returns the array row of an iteration, or None outside 1..iterations.
+        """
+        if not 1 <= iteration <= self.iterations:
+            return None
+        return iteration - 1
+
+    def record_dic_dcj(self, sender_id, receiver_id, iteration, value):
+        """
+        Stores dic + dcj for a timestamp sent by verifier i and received by verifier j.
+
+        Returns:
+            bool: False if the iteration is not part of the session.
+        """
+        row = self._row(iteration)
+        if row is None:
+            return False
+        i, j = self.intern(sender_id), self.intern(receiver_id)
+        self.dic_dcj[row, i, j] = value
+        return True
+
+    def record_rtt_send(self, verifier_id, iteration, send_time):
+        """
+        Stores the send time of an RTT probe to a verifier.
+
+        Returns:
+            bool: False if the iteration is not part of the session.
+        """
+        row = self._row(iteration)
+        if row is None:
+            return False
+        self.rtt_send_times[row, self.intern(verifier_id)] = send_time
+        return True
+
+    def rtt_send_time(self, verifier_id, iteration):
+        """
+        Returns the recorded send time of an RTT probe, or None.
+        """
+        i = self.index.get(verifier_id)
+        row = self._row(iteration)
+        if i is None or row is None:
+            return None
+        send_time = self.rtt_send_times[row, i]
+        return None if np.isnan(send_time) else float(send_time)
+
+    def record_av_delay(self, verifier_id, iteration, delay):
+        """
+        Stores the av protocol delay (half the RTT) to a verifier.
+
+        Returns:
+            bool: False if the iteration is not part of the session.
+        """
+        row = self._row(iteration)
+        if row is None:
+            return False
+        self.av_delays[row, self.intern(verifier_id)] = delay
+        return True
+
+    def compute_min_sums(self, iteration):
+        """
+        Computes min(eij, eji) for every ordered pair of one iteration in a single
+        vectorized step. Pairs missing either direction stay NaN.
+
+        Returns:
+            int: Number of ordered pairs with a value.
+        """
+        row = self._row(iteration)
+        if row is None:
+            return 0
+        e = self.dic_dcj[row]
+        np.minimum(e, e.T, out=self.min_sums[row])
+        return int(np.count_nonzero(~np.isnan(self.min_sums[row])))
+
+    def min_sums_dict(self, iteration):
+        """
+        Returns the present min sums of one iteration as {"i_j": value}.
+        """
+        return self._pairs_dict(self.min_sums, iteration)
+
+    def dic_dcj_pairs(self, iteration):
+        """
+        Returns the present dic + dcj sums of one iteration as {"i_j": value}.
+        """
+        return self._pairs_dict(self.dic_dcj, iteration)
+
+    def dic_dcj_dict(self, iteration):
+        """
+        Returns the present dic + dcj sums of one iteration as {(i, j): value}.
+        """
+        row = self._row(iteration)
+        if row is None:
+            return {}
+        m = self.dic_dcj[row]
+        i, j = np.nonzero(~np.isnan(m))
+        return {(self.ids[a], self.ids[b]): v for a, b, v in zip(i.tolist(), j.tolist(), m[i, j].tolist())}
+
+    def av_delays_dict(self, iteration):
+        """
+        Returns the present av delays of one iteration as {verifier_id: delay}.
+        """
+        row = self._row(iteration)
+        if row is None:
+            return {}
+        delays = self.av_delays[row]
+        (i,) = np.nonzero(~np.isnan(delays))
+        return {self.ids[a]: v for a, v in zip(i.tolist(), delays[i].tolist())}
+
+    def _pairs_dict(self, array, iteration):
+        row = self._row(iteration)
+        if row is None:
+            return {}
+        m = array[row]
+        i, j = np.nonzero(~np.isnan(m))
+        return {f"{self.ids[a]}_{self.ids[b]}": v for a, b, v in zip(i.tolist(), j.tolist(), m[i, j].tolist())}
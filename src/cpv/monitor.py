@@ -0,0 +1,149 @@
+# monitor.py
+
+import threading
+import time
+from collections import deque
+import logging
+
+logger = logging.getLogger(__name__)
+
+MONITOR_PREFIX = "monitor-"  # Session IDs of shared monitoring rounds
+MONITOR_TENANT = "monitor"  # Scheduler tenant the monitoring rounds are accounted to
+
+
+class SlidingWindowMin:
+    """
+    Minimum of the values added within a time window.
+
+    Values are kept in a deque of increasing values (a monotonic queue), so adding
+    and expiring samples costs O(1) amortized and the minimum is read in O(1).
+    """
+    __slots__ = ("items",)
+
+    def __init__(self):
+        self.items = deque()  # (time, value), values strictly increasing
+
+    def add(self, now, value):
+        while self.items and self.items[-1][1] >= value:
+            self.items.pop()
+        self.items.append((now, value))
+
+    def expire(self, cutoff):
+        while self.items and self.items[0][0] < cutoff:
+            self.items.popleft()
+
+    def value(self):
+        return self.items[0][1] if self.items else None
+
+
+class ClientWindow:
+    """
+    Sliding-window state of one monitored client.
+    """
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.e = {}  # (i, j) -> SlidingWindowMin of dic + dcj
+        self.dv = {}  # (i, j) -> SlidingWindowMin of verifier delays
+        self.votes = deque()  # (time, inside) of each round in the window
+        self.inside_votes = 0
+        self.rounds = 0
+        self.inside = None
+
+
+class PresenceMonitor:
+    def __init__(self, aggregator, window=60.0, max_pending_rounds=4):
+        """
+        Continuous presence verdicts for long-lived clients.
+
+        Verifiers probe every monitored client in shared, low-rate rounds. For each
+        client the monitor keeps the windowed minimum of every eij sum and verifier
+        delay (the mp min filter applied over time instead of over a session's
+        iterations) and re-evaluates the triangle test as rounds enter and samples
+        leave the window. The cost per client and round is constant.
+
+        Args:
+            aggregator (VerdictAggregator): Supplies the triangle and the verdict rule.
+            window (float): Seconds of samples a verdict is based on.
+            max_pending_rounds (int): Incomplete rounds kept waiting for late verifiers.
+        """
+        self.aggregator = aggregator
+        self.window = window
+        self.max_pending_rounds = max_pending_rounds
+        self.lock = threading.Lock()
+        self.clients = {}  # client_id -> ClientWindow
+        self.pending = {}  # round_id -> {client_id: round state}
+
+    def add_client(self, client_id, session_id):
+        with self.lock:
+            self.clients[client_id] = ClientWindow(session_id)
+        logger.info(f"Monitoring client {client_id} (session {session_id})")
+
+    def remove_client(self, client_id):
+        with self.lock:
+            removed = self.clients.pop(client_id, None)
+        if removed is not None:
+            logger.info(f"Stopped monitoring client {client_id}")
+        return removed
+
+    def client_ids(self):
+        with self.lock:
+            return list(self.clients)
+
+    def add_result(self, round_id, client_id, sender_id, eij, delays, now=None):
+        """
+        Adds one verifier's measurements of a client for a monitoring round.
+
+        Returns:
+            dict or None: The client's updated verdict once every verifier has reported
+            the round, with the same keys as VerdictAggregator.add_result plus "changed".
+        """
+        if sender_id not in self.aggregator.position:
+            return None
+        now = now if now is not None else time.time()
+        with self.lock:
+            client = self.clients.get(client_id)
+            if client is None:
+                return None
+            if round_id not in self.pending:
+                self.pending[round_id] = {}
+                while len(self.pending) > self.max_pending_rounds:
+                    self.pending.pop(next(iter(self.pending)))
+            rounds = self.pending[round_id]
+            state = rounds.setdefault(client_id, self.aggregator.new_round())
+            if not self.aggregator.merge(state, sender_id, eij, delays):
+                return None
+            del rounds[client_id]
+            return self._update(client_id, client, state, now)
+
+    def _update(self, client_id, client, state, now):
+        cutoff = now - self.window
+        round_inside, _ = self.aggregator.decide(state["e"], state["dv"])
+        for samples, values in ((client.e, state["e"]), (client.dv, state["dv"])):
+            for pair, value in values.items():
+                samples.setdefault(pair, SlidingWindowMin()).add(now, value)
+            for window in samples.values():
+                window.expire(cutoff)
+        client.votes.append((now, round_inside))
+        client.inside_votes += round_inside
+        while client.votes and client.votes[0][0] < cutoff:
+            client.inside_votes -= client.votes.popleft()[1]
+        client.rounds += 1
+
+        e = {pair: w.value() for pair, w in client.e.items() if w.value() is not None}
+        dv = {pair: w.value() for pair, w in client.dv.items() if w.value() is not None}
+        inside, xi = self.aggregator.decide(e, dv)
+        agreeing = client.inside_votes if inside else len(client.votes) - client.inside_votes
+        changed = client.inside is not None and inside != client.inside
+        if changed:
+            logger.warning(f"Client {client_id} verdict changed to inside={inside}")
+        client.inside = inside
+        return {
+            "session_id": client.session_id,
+            "client_id": client_id,
+            "iteration": client.rounds,
+            "inside": inside,
+            "confidence": agreeing / len(client.votes),
+            "owds": {self.aggregator.verifier_ids[i - 1]: x for i, x in xi.items()},
+            "changed": changed,
+        }
@@ -0,0 +1,279 @@
+# pacing.py
+
+import bisect
+import heapq
+import itertools
+import random
+import threading
+import time
+from .monitor import SlidingWindowMin
+import logging
+
+logger = logging.getLogger(__name__)
+
+HOST = "*"  # Link name under which the load estimator aggregates all links
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        """
+        Token bucket that hands out reservations instead of blocking.
+
+        Tokens may go negative: each reservation is queued behind the earlier ones and
+        told how long to wait for its token.
+
+        Args:
+            rate (float): Tokens added per second.
+            burst (float): Bucket capacity.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, max_wait=None):
+        """
+        Takes a token.
+
+        Args:
+            max_wait (float, optional): Longest acceptable wait; if the token would only
+                be available later, none is taken.
+
+        Returns:
+            float or None: Seconds to wait before the token may be used (0 if available
+            now), or None if the wait would exceed max_wait.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+            if max_wait is not None and wait > max_wait:
+                return None
+            self.tokens -= 1
+            return wait
+
+    def refund(self):
+        """
+        Returns a token taken by reserve that will not be used.
+        """
+        with self.lock:
+            self.tokens = min(self.burst, self.tokens + 1)
+
+
+class LoadEstimator:
+    def __init__(self, window=0.05, baseline_window=300.0, threshold=0.0005, min_samples=20, alpha=0.05):
+        """
+        Detects when a verifier's own probing inflates the RTTs it measures.
+
+        Each RTT sample is compared with the link's baseline (its minimum RTT over
+        `baseline_window` seconds) and classified by how many other probes this host
+        sent within `window` seconds of it. If the average excess of loaded samples
+        exceeds that of isolated samples by more than `threshold` seconds, probing is
+        reported as distorting the measurements.
+
+        Args:
+            window (float): Seconds around a probe within which other probes count as load.
+            baseline_window (float): Seconds over which the baseline minimum RTT is taken.
+            threshold (float): Excess RTT (seconds) attributed to load that is flagged.
+            min_samples (int): Samples needed in both classes before flagging.
+            alpha (float): Weight of a new sample in the moving averages.
+        """
+        self.window = window
+        self.baseline_window = baseline_window
+        self.threshold = threshold
+        self.min_samples = min_samples
+        self.alpha = alpha
+        self.lock = threading.Lock()
+        self.sends = []  # Recent probe send times, ascending
+        self.links = {}  # link -> state dictionary
+
+    def on_send(self, send_time=None):
+        """
+        Records that a probe was sent.
+        """
+        send_time = send_time if send_time is not None else time.time()
+        with self.lock:
+            if self.sends and send_time < self.sends[-1]:
+                bisect.insort(self.sends, send_time)
+            else:
+                self.sends.append(send_time)
+            # Keep only what load lookups of in-flight probes may still need
+            cutoff = bisect.bisect_left(self.sends, send_time - 10.0)
+            if cutoff > 1024:
+                del self.sends[:cutoff]
+
+    def record(self, link, rtt, send_time):
+        """
+        Adds an RTT sample for a probe sent at `send_time`.
+        """
+        with self.lock:
+            low = bisect.bisect_left(self.sends, send_time - self.window)
+            high = bisect.bisect_right(self.sends, send_time + self.window)
+            loaded = high - low > 1  # Other probes besides this one
+            flagged = []
+            for name in (link, HOST):
+                state = self.links.get(name)
+                if state is None:
+                    state = self.links[name] = {
+                        "baseline": SlidingWindowMin(), "isolated": None, "loaded": None,
+                        "isolated_samples": 0, "loaded_samples": 0, "distorting": False,
+                    }
+                state["baseline"].add(send_time, rtt)
+                state["baseline"].expire(send_time - self.baseline_window)
+                excess = rtt - state["baseline"].value()
+                kind = "loaded" if loaded else "isolated"
+                state[kind] = excess if state[kind] is None else (1 - self.alpha) * state[kind] + self.alpha * excess
+                state[f"{kind}_samples"] += 1
+                distorting = self._distortion(state) > self.threshold
+                if distorting and not state["distorting"]:
+                    flagged.append(name)
+                state["distorting"] = distorting
+        for name in flagged:
+            logger.warning(f"Probe load is inflating RTTs on {name} by {self.distortion(name) * 1000:.2f} ms")
+
+    def distortion(self, link=HOST):
+        """
+        Returns the extra RTT (seconds) attributed to probe load on a link, or 0.0.
+        """
+        with self.lock:
+            state = self.links.get(link)
+            return self._distortion(state) if state is not None else 0.0
+
+    def _distortion(self, state):
+        if state["isolated_samples"] < self.min_samples or state["loaded_samples"] < self.min_samples:
+            return 0.0
+        return state["loaded"] - state["isolated"]
+
+    def report(self):
+        """
+        Returns per-link baseline, excess RTTs and the distortion flag; "*" covers the host.
+        """
+        with self.lock:
+            return {
+                link: {
+                    "baseline_rtt": state["baseline"].value(),
+                    "isolated_excess": state["isolated"],
+                    "loaded_excess": state["loaded"],
+                    "samples": state["isolated_samples"] + state["loaded_samples"],
+                    "distortion": self._distortion(state),
+                    "distorting": state["distorting"],
+                }
+                for link, state in self.links.items()
+            }
+
+
+class ProbePacer:
+    def __init__(self, host_rate=200.0, host_burst=10, link_rate=50.0, link_burst=4, spread=0.2,
+                 estimator=None, max_wait=0.5):
+        """
+        Paces probes with per-host and per-link token buckets and random spreading.
+
+        Each probe is delayed by a uniform jitter in [0, spread) seconds, so the probes
+        of concurrent sessions do not fire at the same instant, plus whatever wait the
+        host and link buckets impose. A probe is dropped instead of queued when its
+        wait would exceed `max_wait`, which must stay below the protocol barriers (one
+        second), so no probe is sent after the barrier it belongs to. Delayed probes
+        run on a single scheduler thread.
+
+        Args:
+            host_rate (float): Probes per second this verifier sends in total.
+            host_burst (float): Probes the host may send back to back.
+            link_rate (float): Probes per second to any one peer or client.
+            link_burst (float): Probes one link may receive back to back.
+            spread (float): Seconds over which probes are jittered.
+            estimator (LoadEstimator, optional): Load estimator fed by the server;
+                created with defaults when omitted.
+            max_wait (float): Longest delay, jitter included, before a probe is sent.
+        """
+        self.host = TokenBucket(host_rate, host_burst)
+        self.link_rate = link_rate
+        self.link_burst = link_burst
+        self.spread = spread
+        self.max_wait = max_wait
+        self.estimator = estimator or LoadEstimator()
+        self.links = {}
+        self.lock = threading.Lock()
+        self.dropped = 0  # Probes whose wait would have exceeded max_wait
+
+        # Delayed probes, run in due order by the scheduler thread
+        self.condition = threading.Condition()
+        self.queue = []  # Heap of (due, sequence, function, args)
+        self.sequence = itertools.count()
+        self.closed = False
+        self.thread = None
+
+    def reserve(self, link):
+        """
+        Returns the delay (seconds) after which a probe on `link` may be sent, or None
+        if the probe would wait longer than max_wait.
+        """
+        with self.lock:
+            bucket = self.links.get(link)
+            if bucket is None:
+                bucket = self.links[link] = TokenBucket(self.link_rate, self.link_burst)
+        host_wait = self.host.reserve(self.max_wait)
+        if host_wait is None:
+            return None
+        link_wait = bucket.reserve(self.max_wait)
+        if link_wait is None:
+            self.host.refund()
+            return None
+        wait = max(host_wait, link_wait)
+        spread = min(self.spread, self.max_wait - wait)
+        return wait + (random.uniform(0, spread) if spread > 0 else 0.0)
+
+    def call(self, link, function, *args):
+        """
+        Runs function(*args) once the probe on `link` may be sent.
+
+        Returns:
+            bool: False if the probe was dropped because it would wait too long.
+        """
+        delay = self.reserve(link)
+        if delay is None:
+            with self.lock:
+                self.dropped += 1
+            logger.warning(f"Dropped a probe to {link}: it would wait more than {self.max_wait}s")
+            return False
+        if delay <= 0:
+            function(*args)
+            return True
+        with self.condition:
+            if self.closed:
+                return False
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+            heapq.heappush(self.queue, (time.monotonic() + delay, next(self.sequence), function, args))
+            self.condition.notify()
+        return True
+
+    def close(self):
+        """
+        Stops the scheduler thread; probes not yet due are discarded.
+        """
+        with self.condition:
+            self.closed = True
+            self.queue.clear()
+            self.condition.notify()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.closed:
+                    if self.queue:
+                        wait = self.queue[0][0] - time.monotonic()
+                        if wait <= 0:
+                            break
+                        self.condition.wait(wait)
+                    else:
+                        self.condition.wait()
+                if self.closed:
+                    return
+                _, _, function, args = heapq.heappop(self.queue)
+            try:
+                function(*args)
+            except Exception as e:
+                logger.error(f"Error sending a paced probe: {e}")
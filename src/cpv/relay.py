@@ -0,0 +1,247 @@
+# relay.py
+
+import threading
+from collections import OrderedDict
+import numpy as np
+from . import cpv
+from .stats import RunningStats
+import logging
+
+logger = logging.getLogger(__name__)
+
+PAIRS = ((0, 1), (1, 2), (2, 0))  # Verifier pairs (0-based) in cpv's triangle order
+NOISE_FLOOR = 0.001  # Seconds; smaller differences and denominators are LAN jitter and not scored
+
+
+def score_rounds(eij, dv, floor=NOISE_FLOOR):
+    """
+    Vectorized relay features of many measurement rounds.
+
+    Asymmetry is the largest relative difference between the two directions of a
+    verifier pair, |eij - eji| / min(eij, eji). The triangle-inequality violation is
+    the largest amount, relative to the verifier distance yij, by which the estimated
+    client OWDs break xi + xj >= yij, |xi - xj| <= yij or xi >= 0, which a client
+    reached directly cannot do. Differences up to `floor` seconds are jitter and
+    score 0, and denominators are at least `floor` seconds, so hosts on a LAN or
+    loopback are not scored on noise.
+
+    Args:
+        eij (ndarray): dic + dcj per round, shape (rounds, 3, 3), NaN if missing.
+        dv (ndarray): Verifier-to-verifier OWDs per round, shape (rounds, 3, 3), NaN if missing.
+        floor (float): Smallest delay used as a denominator.
+
+    Returns:
+        tuple: (asymmetry, violation), arrays of shape (rounds,); NaN where a round
+        lacks the values needed.
+    """
+    i, j = np.array(PAIRS).T
+    forward, backward = eij[:, i, j], eij[:, j, i]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # fmax skips missing pairs; rounds without any pair stay NaN
+        asymmetry = np.fmax.reduce(
+            np.maximum(np.abs(forward - backward) - floor, 0.0) / np.maximum(np.minimum(forward, backward), floor), axis=1
+        )
+
+        xi = cpv.calculate_owds_mp_batch(eij)
+        yi = cpv.calculate_verifier_owds_batch(np.fmin(dv, dv.transpose(0, 2, 1)))
+        xa, xb = xi[:, i], xi[:, j]
+        excess = np.maximum(np.maximum.reduce([
+            np.zeros_like(yi), yi - (xa + xb), np.abs(xa - xb) - yi, -xa,
+        ]) - floor, 0.0) / np.maximum(yi, floor)
+        valid = np.isfinite(excess).all(axis=1)
+        violation = np.where(valid, np.max(np.where(np.isfinite(excess), excess, 0.0), axis=1), np.nan)
+    return asymmetry, violation
+
+
+def score_sessions(sessions, eij, dv, floor=NOISE_FLOOR):
+    """
+    Vectorized per-session relay scores of rounds ordered by session (see replay.Rounds).
+
+    Returns:
+        dict: "asymmetry" and "violation" (mean over the session's rounds) and
+        "dispersion" (largest standard deviation, in seconds, of any eij across the
+        rounds), each an array of shape (sessions,) in order of first appearance.
+    """
+    starts = np.flatnonzero(np.r_[True, sessions[1:] != sessions[:-1]])
+    counts = np.diff(np.r_[starts, len(sessions)])
+    asymmetry, violation = score_rounds(eij, dv, floor)
+
+    def session_mean(values):
+        present = ~np.isnan(values)
+        totals = np.add.reduceat(np.where(present, values, 0.0), starts, axis=0)
+        n = np.add.reduceat(present, starts, axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(n > 0, totals / n, np.nan)
+
+    mean = session_mean(eij)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        deviation = eij - np.repeat(mean, counts, axis=0)
+        stddev = np.sqrt(session_mean(deviation ** 2))
+    dispersion = np.fmax.reduce(stddev.reshape(len(starts), -1), axis=1)
+    return {"asymmetry": session_mean(asymmetry), "violation": session_mean(violation), "dispersion": dispersion}
+
+
+class ClientRelayState:
+    """
+    Running relay features of one client; the size is bounded by the number of verifiers.
+    """
+    __slots__ = ("samples", "asymmetry", "violation", "suspicious")
+
+    def __init__(self):
+        self.samples = {}  # sender verifier -> RunningStats of dic + dcj
+        self.asymmetry = RunningStats()
+        self.violation = RunningStats()
+        self.suspicious = False
+
+
+class RelayDetector:
+    def __init__(self, asymmetry_threshold=0.5, dispersion_threshold=0.005, violation_threshold=0.2,
+                 min_samples=10, max_clients=100000, floor=NOISE_FLOOR):
+        """
+        Streaming relay/proxy features of every client, updated as measurements arrive.
+
+        A client behind a relay tends to show asymmetric dic + dcj and djc + dci sums,
+        inflated variance of its forwarded timestamps, and OWD estimates that break the
+        triangle inequality with the verifier distances. Each is kept as a running
+        (Welford) statistic per client, and a client is flagged as suspicious as soon
+        as any mean score exceeds its threshold over at least `min_samples` samples.
+
+        Dispersion is the standard deviation of dic + dcj in seconds: the sums include
+        the clock offset between the verifiers, so their mean is not a delay and a
+        coefficient of variation would be meaningless. A client's statistics build up
+        across its sessions and are reset with reset() when its route changes, so a
+        client is judged on all its iterations on that route, however they were split
+        into sessions, once there are at least `min_samples` of them.
+
+        Args:
+            asymmetry_threshold (float): Mean relative asymmetry flagged.
+            dispersion_threshold (float): Standard deviation of dic + dcj (seconds) flagged.
+            violation_threshold (float): Mean relative triangle-inequality violation flagged.
+            min_samples (int): Samples a score needs before it can flag a client.
+            max_clients (int): Clients tracked; the least recently updated is evicted.
+            floor (float): Smallest delay (seconds) used as a denominator of a score.
+        """
+        self.asymmetry_threshold = asymmetry_threshold
+        self.dispersion_threshold = dispersion_threshold
+        self.violation_threshold = violation_threshold
+        self.min_samples = min_samples
+        self.max_clients = max_clients
+        self.floor = floor
+        self.lock = threading.Lock()
+        self.clients = OrderedDict()  # client_id -> ClientRelayState
+        self.on_flag = None  # Called with (client_id, scores) when a client becomes suspicious
+
+    def add_sample(self, client_id, sender_id, dic_dcj):
+        """
+        Adds a dic + dcj sum forwarded by a client (dispersion).
+        """
+        with self.lock:
+            state = self._state(client_id)
+            state.samples.setdefault(sender_id, RunningStats()).add(dic_dcj)
+            flagged = self._check(state)
+        self._flagged(client_id, flagged)
+
+    def add_round(self, client_id, e, dv, offsets=None):
+        """
+        Adds a complete round as assembled by the aggregator, keyed by triangle
+        position 1..3 (asymmetry and triangle-inequality violation).
+
+        eij is measured on verifier j's clock against verifier i's timestamp, so it
+        includes offset_j - offset_i, and eij - eji twice that. With the verifiers'
+        clock offsets (seconds, keyed by position, relative to any one reference
+        clock) the sums are corrected before scoring.
+        """
+        offsets = offsets or {}
+        eij = np.full((1, 3, 3), np.nan)
+        dvs = np.full((1, 3, 3), np.nan)
+        for (i, j), value in e.items():
+            eij[0, i - 1, j - 1] = value - (offsets.get(j, 0.0) - offsets.get(i, 0.0))
+        for (i, j), value in dv.items():
+            dvs[0, i - 1, j - 1] = value
+        asymmetry, violation = score_rounds(eij, dvs, self.floor)
+        with self.lock:
+            state = self._state(client_id)
+            if not np.isnan(asymmetry[0]):
+                state.asymmetry.add(float(asymmetry[0]))
+            if not np.isnan(violation[0]):
+                state.violation.add(float(violation[0]))
+            flagged = self._check(state)
+        self._flagged(client_id, flagged)
+
+    def reset(self, client_id):
+        """
+        Discards a client's statistics and flag.
+        """
+        with self.lock:
+            self.clients.pop(client_id, None)
+
+    def scores(self, client_id):
+        """
+        Returns a client's asymmetry, dispersion and violation scores and whether it
+        is flagged, or None for an unknown client.
+        """
+        with self.lock:
+            state = self.clients.get(client_id)
+            return self._scores(state) if state is not None else None
+
+    def report(self):
+        """
+        Returns the scores of every tracked client.
+        """
+        with self.lock:
+            return {client_id: self._scores(state) for client_id, state in self.clients.items()}
+
+    def suspicious(self):
+        """
+        Returns the identifiers of the clients currently flagged.
+        """
+        with self.lock:
+            return [client_id for client_id, state in self.clients.items() if state.suspicious]
+
+    def _state(self, client_id):
+        state = self.clients.get(client_id)
+        if state is None:
+            state = self.clients[client_id] = ClientRelayState()
+            while len(self.clients) > self.max_clients:
+                self.clients.popitem(last=False)
+        else:
+            self.clients.move_to_end(client_id)
+        return state
+
+    def _dispersion(self, state):
+        stddevs = [stats.stddev for stats in state.samples.values() if stats.count >= self.min_samples]
+        return max(stddevs) if stddevs else None
+
+    def _scores(self, state):
+        return {
+            "asymmetry": state.asymmetry.mean if state.asymmetry.count else None,
+            "dispersion": self._dispersion(state),
+            "violation": state.violation.mean if state.violation.count else None,
+            "samples": sum(stats.count for stats in state.samples.values()),
+            "rounds": max(state.asymmetry.count, state.violation.count),
+            "suspicious": state.suspicious,
+        }
+
+    def _check(self, state):
+        """
+        Updates a client's flag; returns its scores if it has just become suspicious.
+        """
+        dispersion = self._dispersion(state)
+        suspicious = (
+            (state.asymmetry.count >= self.min_samples and state.asymmetry.mean > self.asymmetry_threshold)
+            or (dispersion is not None and dispersion > self.dispersion_threshold)
+            or (state.violation.count >= self.min_samples and state.violation.mean > self.violation_threshold)
+        )
+        flagged = suspicious and not state.suspicious
+        state.suspicious = suspicious
+        return self._scores(state) if flagged else None
+
+    def _flagged(self, client_id, scores):
+        if scores is None:
+            return
+        logger.warning(
+            f"Client {client_id} looks relayed: asymmetry={scores['asymmetry']}, "
+            f"dispersion={scores['dispersion']}, violation={scores['violation']}"
+        )
+        if self.on_flag:
+            self.on_flag(client_id, scores)
@@ -0,0 +1,308 @@
+# replay.py
+
+import argparse
+import heapq
+import itertools
+import json
+import os
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from operator import itemgetter
+import numpy as np
+from . import cpv
+from .analysis import iter_rtt_log
+from .segmented_log import segment_files
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAX_CLOSED_SESSIONS = 65536  # Closed session ids remembered to detect late records
+
+
+class Rounds:
+    """
+    A chunk of measurement rounds as arrays, ordered by session and iteration.
+
+    Attributes:
+        sessions (ndarray): Session index of each round, shape (rounds,).
+        eij (ndarray): dic + dcj per round, shape (rounds, 3, 3), NaN if missing.
+        dv (ndarray): Verifier-to-verifier OWDs per round, shape (rounds, 3, 3), NaN if missing.
+        xi (ndarray, optional): Client OWDs measured directly (RTT logs), shape (rounds, 3).
+        labels (ndarray, optional): Expected verdict per session, shape (sessions,).
+    """
+
+    def __init__(self, sessions, eij=None, dv=None, xi=None, labels=None):
+        self.sessions = sessions
+        self.eij = eij
+        self.dv = dv
+        self.xi = xi
+        self.labels = labels
+
+
+def iter_delay_records(filename):
+    """
+    Streams the entries of a delays_mp.json / delays_av.json log, either a plain file
+    written by a JSONFileSink or the segments of a SegmentedLog with that base path.
+
+    Yields:
+        tuple: (session_id, iteration, data)
+    """
+    for entry in _iter_entries(filename):
+        yield entry["session_id"], entry["iteration"], entry["data"]
+
+
+def _iter_entries(filename):
+    for segment in segment_files(filename):
+        with open(segment) as file:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _stamped_entries(filename, kind, verifier_id):
+    # Entries are appended in time order, so each log is already sorted by timestamp
+    for entry in _iter_entries(filename):
+        yield entry["timestamp"], kind, verifier_id, entry
+
+
+def rounds_from_delay_logs(mp_files, av_files, verifiers, chunk_sessions=10000, session_gap=30.0):
+    """
+    Combines recorded mp and av logs of several verifiers into chunks of Rounds.
+
+    The logs are streamed and merged by timestamp, so memory is bounded by the
+    sessions in progress and the current chunk, not by the size of the logs. A
+    session is complete once the merged logs have moved `session_gap` seconds past
+    its last record; its rounds, sorted by iteration, always end up in the same
+    chunk. Records of a session that was already completed are dropped.
+
+    Args:
+        mp_files (list): delays_mp.json files (one per verifier), holding the dic + dcj
+            sums each verifier received.
+        av_files (list): delays_av.json files, in the same verifier order as `verifiers`.
+        verifiers (list): The three verifier identifiers, in triangle order.
+        chunk_sessions (int): Sessions per yielded chunk.
+        session_gap (float): Seconds without records after which a session is complete.
+
+    Yields:
+        Rounds
+    """
+    index = {verifier_id: i for i, verifier_id in enumerate(verifiers)}
+    streams = [_stamped_entries(filename, "mp", None) for filename in mp_files]
+    streams += [_stamped_entries(filename, "av", verifier_id) for verifier_id, filename in zip(verifiers, av_files)]
+    open_sessions = OrderedDict()  # session_id -> [last timestamp, {iteration: (eij, dv)}], least recently updated first
+    closed = OrderedDict()  # Recently completed session ids
+    chunk = []
+    late = 0
+
+    def close(session_id):
+        chunk.append(open_sessions.pop(session_id)[1])
+        closed[session_id] = True
+        if len(closed) > MAX_CLOSED_SESSIONS:
+            closed.popitem(last=False)
+
+    for timestamp, kind, verifier_id, entry in heapq.merge(*streams, key=itemgetter(0)):
+        while open_sessions:
+            session_id, (last, _) = next(iter(open_sessions.items()))
+            if timestamp - last < session_gap:
+                break
+            close(session_id)
+        if len(chunk) >= chunk_sessions:
+            yield _chunk(chunk)
+            chunk = []
+
+        session_id = entry["session_id"]
+        if session_id in closed:
+            late += 1
+            continue
+        state = open_sessions.get(session_id)
+        if state is None:
+            state = open_sessions[session_id] = [timestamp, {}]
+        else:
+            open_sessions.move_to_end(session_id)
+            state[0] = timestamp
+        rounds = state[1]
+        if entry["iteration"] not in rounds:
+            rounds[entry["iteration"]] = (np.full((3, 3), np.nan), np.full((3, 3), np.nan))
+        eij, dv = rounds[entry["iteration"]]
+        if kind == "mp":
+            for pair, value in entry["data"].get("dic_dcj", {}).items():
+                i, _, j = pair.partition("_")
+                if i in index and j in index:
+                    eij[index[i], index[j]] = value
+        else:
+            for peer, delay in entry["data"].get("delays", {}).items():
+                if peer in index:
+                    dv[index[verifier_id], index[peer]] = delay
+
+    while open_sessions:
+        close(next(iter(open_sessions)))
+        if len(chunk) >= chunk_sessions:
+            yield _chunk(chunk)
+            chunk = []
+    if chunk:
+        yield _chunk(chunk)
+    if late:
+        logger.warning(f"Dropped {late} records that arrived more than {session_gap}s after their session")
+
+
+def _chunk(sessions):
+    keys = [(s, iteration) for s, rounds in enumerate(sessions) for iteration in sorted(rounds)]
+    return Rounds(
+        np.array([s for s, _ in keys], dtype=np.int64),
+        eij=np.stack([sessions[s][iteration][0] for s, iteration in keys]),
+        dv=np.stack([sessions[s][iteration][1] for s, iteration in keys]),
+    )
+
+
+def rounds_from_rtt_log(filename, verifiers, yi, label=None):
+    """
+    Builds Rounds from an RTT log, using half of each RTT as the client OWD.
+
+    Each iteration becomes one round of a single session. Verifiers absent from
+    the log (e.g. the one co-located with the client) get an OWD of 0.
+
+    Args:
+        filename (str): The RTT log.
+        verifiers (list): The three verifier names, in triangle order.
+        yi (sequence): Verifier OWDs 1-2, 2-3, 3-1 in seconds.
+        label (bool, optional): Expected verdict, for accuracy reporting.
+    """
+    index = {verifier_id: i for i, verifier_id in enumerate(verifiers)}
+    per_iteration = {}
+    for iteration, verifier, rtt in iter_rtt_log(filename):
+        if verifier in index:
+            per_iteration.setdefault(iteration, np.zeros(3))[index[verifier]] = rtt / 2
+    iterations = sorted(per_iteration)
+    xi = np.stack([per_iteration[i] for i in iterations]) if iterations else np.zeros((0, 3))
+    dv = np.full((len(iterations), 3, 3), np.nan)
+    dv[:, 0, 1], dv[:, 1, 2], dv[:, 2, 0] = yi
+    return Rounds(
+        np.zeros(len(iterations), dtype=np.int64), dv=dv, xi=xi,
+        labels=None if label is None else np.array([label])
+    )
+
+
+def evaluate(rounds, tolerance=0.2, scaling_factor=200, samples=None):
+    """
+    Computes one verdict per session of a chunk.
+
+    The first `samples` rounds of each session are min-filtered (element-wise
+    minimum, as the mp protocol does across repetitions) before the OWDs are solved
+    and the triangle test is applied.
+
+    Returns:
+        ndarray: Boolean verdict per session, in order of first appearance.
+    """
+    sessions = rounds.sessions
+    starts = np.flatnonzero(np.r_[True, sessions[1:] != sessions[:-1]])
+    rank = np.arange(len(sessions)) - np.repeat(starts, np.diff(np.r_[starts, len(sessions)]))
+    keep = rank < samples if samples else np.ones(len(sessions), dtype=bool)
+
+    def session_min(values):
+        values = np.where(keep.reshape((-1,) + (1,) * (values.ndim - 1)), values, np.nan)
+        values = np.where(np.isnan(values), np.inf, values)
+        reduced = np.minimum.reduceat(values, starts, axis=0)
+        return np.where(np.isinf(reduced), np.nan, reduced)
+
+    if rounds.xi is not None:
+        xi = session_min(rounds.xi)
+    else:
+        xi = cpv.calculate_owds_mp_batch(session_min(rounds.eij))
+    # Use the smaller of the two directions measured between each verifier pair
+    dv = session_min(rounds.dv)
+    yi = cpv.calculate_verifier_owds_batch(np.fmin(dv, dv.transpose(0, 2, 1)))
+    return cpv.is_client_within_triangle_batch(xi, yi, scaling_factor, tolerance)
+
+
+def _evaluate_grid(rounds, grid):
+    results = []
+    for params in grid:
+        verdicts = evaluate(rounds, **params)
+        correct = int(np.sum(verdicts == rounds.labels)) if rounds.labels is not None else None
+        results.append((len(verdicts), int(np.sum(verdicts)), correct))
+    return results
+
+
+def sweep(chunks, tolerances=(0.2,), scaling_factors=(200,), samples=(None,), processes=None):
+    """
+    Evaluates every parameter combination over all chunks, in parallel across processes.
+
+    Each worker receives one chunk and evaluates the whole grid on it, so the
+    arrays are sent to a process once regardless of the grid size. At most two
+    chunks per worker are in flight, so chunks are read from `chunks` only as fast
+    as the workers consume them.
+
+    Args:
+        chunks (iterable): Rounds chunks, e.g. from rounds_from_delay_logs.
+        tolerances, scaling_factors, samples (sequence): Values to sweep.
+        processes (int, optional): Worker processes (defaults to the CPU count).
+
+    Returns:
+        list: One dictionary per combination with sessions, accept rate and accuracy.
+    """
+    grid = [
+        {"tolerance": t, "scaling_factor": f, "samples": n}
+        for t, f, n in itertools.product(tolerances, scaling_factors, samples)
+    ]
+    totals = [[0, 0, 0, False] for _ in grid]
+
+    def add(results):
+        for total, (sessions, inside, correct) in zip(totals, results):
+            total[0] += sessions
+            total[1] += inside
+            if correct is not None:
+                total[2] += correct
+                total[3] = True
+
+    max_in_flight = 2 * (processes or os.cpu_count() or 1)
+    in_flight = set()
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        for chunk in chunks:
+            if len(in_flight) >= max_in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    add(future.result())
+            in_flight.add(executor.submit(_evaluate_grid, chunk, grid))
+        for future in in_flight:
+            add(future.result())
+    report = []
+    for params, (sessions, inside, correct, labelled) in zip(grid, totals):
+        row = dict(params, sessions=sessions, accept_rate=inside / sessions if sessions else float("nan"))
+        if labelled:
+            row["accuracy"] = correct / sessions if sessions else float("nan")
+        report.append(row)
+    return report
+
+
+def _floats(spec):
+    return [float(v) for v in spec.split(",")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded CPV measurements through the verification pipeline.")
+    parser.add_argument("--verifiers", required=True, help="Three verifier ids in triangle order, comma separated")
+    parser.add_argument("--mp", nargs="*", default=[], help="delays_mp.json files")
+    parser.add_argument("--av", nargs="*", default=[], help="delays_av.json files, in --verifiers order")
+    parser.add_argument("--rtt-log", nargs="*", default=[], help="RTT logs (tests/*.txt)")
+    parser.add_argument("--yi", default=None, help="Verifier OWDs 1-2,2-3,3-1 (seconds) for RTT logs")
+    parser.add_argument("--tolerance", default="0.2")
+    parser.add_argument("--scaling-factor", default="200")
+    parser.add_argument("--samples", default="0", help="Rounds per session to use; 0 for all")
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    verifiers = args.verifiers.split(",")
+    chunks = []
+    if args.mp:
+        chunks = rounds_from_delay_logs(args.mp, args.av, verifiers)
+    if args.rtt_log:
+        yi = _floats(args.yi)
+        chunks = itertools.chain(chunks, (rounds_from_rtt_log(f, verifiers, yi) for f in args.rtt_log))
+    samples = [int(n) or None for n in args.samples.split(",")]
+    report = sweep(chunks, _floats(args.tolerance), _floats(args.scaling_factor), samples, args.processes)
+    for row in report:
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
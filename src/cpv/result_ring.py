@@ -0,0 +1,214 @@
+# result_ring.py
+
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+RING_MAGIC = 0x43505652  # "CPVR"
+RING_VERSION = 1
+
+# Record kinds
+MP_SAMPLE = 1  # pair = "i_j", value = dic + dcj received by the verifier
+AV_SAMPLE = 2  # pair = peer verifier, value = one-way delay
+VERDICT = 3  # inside and confidence set, value = NaN
+VERDICT_OWD = 4  # pair = verifier, value = estimated OWD to the client of the preceding VERDICT
+
+HEADER_DTYPE = np.dtype([
+    ("magic", "<u4"), ("version", "<u4"), ("capacity", "<u8"), ("head", "<u8"), ("record_size", "<u8"),
+])
+HEADER_BYTES = 64
+RECORD_DTYPE = np.dtype([
+    ("seq", "<u8"),  # 1-based position in the stream; 0 while the slot is being written
+    ("time", "<f8"),
+    ("value", "<f8"),
+    ("confidence", "<f8"),
+    ("iteration", "<u4"),
+    ("kind", "u1"),
+    ("inside", "i1"),
+    ("session_id", "S36"),
+    ("client_id", "S32"),
+    ("verifier_id", "S32"),
+    ("pair", "S48"),
+])
+
+
+_created = set()  # Blocks created by ResultRings of this process
+
+
+def _attach(name):
+    """
+    Attaches to an existing block without registering it with this process's
+    resource tracker, which would otherwise unlink the writer's block on exit.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13
+        shm = shared_memory.SharedMemory(name=name)
+        if shm._name not in _created:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def _encode(value):
+    return b"" if value is None else str(value).encode()
+
+
+class ResultRing:
+    def __init__(self, capacity=1 << 16, name=None):
+        """
+        Fixed-record ring buffer of results in shared memory, written by one server.
+
+        Each record is a RECORD_DTYPE struct. The header's head counter is the number
+        of records ever written; record n (1-based) lives in slot (n - 1) % capacity and
+        carries seq = n once complete. A slot's seq is zeroed while it is rewritten and
+        the head is advanced only after, so readers never see a partial record below
+        head and can tell from the head how many records they have lost to overrun.
+
+        Implements the result sink interface, so it can be passed as a Server's
+        result_ring (or result_sink).
+
+        Args:
+            capacity (int): Number of record slots.
+            name (str, optional): Name of the shared memory block; generated when omitted.
+        """
+        self.capacity = capacity
+        size = HEADER_BYTES + RECORD_DTYPE.itemsize * capacity
+        self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.name = self.shm.name
+        self.header = np.ndarray((), dtype=HEADER_DTYPE, buffer=self.shm.buf)
+        self.records = np.ndarray((capacity,), dtype=RECORD_DTYPE, buffer=self.shm.buf, offset=HEADER_BYTES)
+        self.seqs = self.records["seq"]
+        self.seqs[:] = 0
+        self.header["capacity"] = capacity
+        self.header["head"] = 0
+        self.header["record_size"] = RECORD_DTYPE.itemsize
+        self.header["version"] = RING_VERSION
+        self.header["magic"] = RING_MAGIC
+        self.lock = threading.Lock()  # Serializes the server's writer threads
+        _created.add(self.shm._name)
+
+    def publish(self, rows):
+        """
+        Appends records.
+
+        Args:
+            rows (iterable): (kind, session_id, client_id, verifier_id, iteration, pair,
+                value, inside, confidence) tuples.
+        """
+        now = time.time()
+        with self.lock:
+            head = int(self.header["head"])
+            for kind, session_id, client_id, verifier_id, iteration, pair, value, inside, confidence in rows:
+                slot = head % self.capacity
+                self.seqs[slot] = 0
+                self.records[slot] = (
+                    0, now, value, confidence, iteration or 0, kind, inside,
+                    _encode(session_id), _encode(client_id), _encode(verifier_id), _encode(pair)
+                )
+                head += 1
+                self.seqs[slot] = head
+                self.header["head"] = head
+
+    # Sink interface
+
+    def log_session(self, session_id, client_id, verifier_id):
+        pass
+
+    def log_mp(self, session_id, iteration, data, client_id=None, verifier_id=None):
+        self.publish(
+            (MP_SAMPLE, session_id, client_id, verifier_id, iteration, pair, value, -1, np.nan)
+            for pair, value in data.get("dic_dcj", {}).items()
+        )
+
+    def log_av(self, session_id, iteration, data, client_id=None, verifier_id=None):
+        self.publish(
+            (AV_SAMPLE, session_id, client_id, verifier_id, iteration, peer, delay, -1, np.nan)
+            for peer, delay in data.get("delays", {}).items()
+        )
+
+    def log_verdict(self, session_id, client_id, inside, confidence, owds):
+        rows = [(VERDICT, session_id, client_id, None, 0, None, np.nan, int(inside), confidence)]
+        rows.extend(
+            (VERDICT_OWD, session_id, client_id, verifier_id, 0, verifier_id, owd, int(inside), confidence)
+            for verifier_id, owd in owds.items()
+        )
+        self.publish(rows)
+
+    def close(self, unlink=True):
+        """
+        Detaches from the ring, removing it unless `unlink` is False.
+        """
+        del self.header, self.records, self.seqs
+        self.shm.close()
+        _created.discard(self.shm._name)
+        if unlink:
+            self.shm.unlink()
+
+
+class ResultRingReader:
+    def __init__(self, name, from_start=False):
+        """
+        Lock-free consumer of a ResultRing, from any process on the same host.
+
+        Args:
+            name (str): Name of the ring's shared memory block (ResultRing.name).
+            from_start (bool): Start with the oldest record still in the ring instead
+                of only the records published after attaching.
+        """
+        self.shm = _attach(name)
+        header = np.ndarray((), dtype=HEADER_DTYPE, buffer=self.shm.buf)
+        if header["magic"] != RING_MAGIC or header["version"] != RING_VERSION:
+            self.shm.close()
+            raise ValueError(f"{name} is not a version {RING_VERSION} result ring")
+        if header["record_size"] != RECORD_DTYPE.itemsize:
+            self.shm.close()
+            raise ValueError(f"Record size mismatch in {name}: {header['record_size']} != {RECORD_DTYPE.itemsize}")
+        self.header = header
+        self.capacity = int(header["capacity"])
+        self.records = np.ndarray((self.capacity,), dtype=RECORD_DTYPE, buffer=self.shm.buf, offset=HEADER_BYTES)
+        head = int(header["head"])
+        self.position = max(head - self.capacity, 0) if from_start else head  # Records consumed so far
+        self.lost = 0
+
+    def poll(self, max_records=None):
+        """
+        Returns the records published since the last poll, without copying.
+
+        The views alias the ring itself: consume them (or copy them) before the writer
+        can wrap around, and use overwritten() to check afterwards when in doubt.
+
+        Returns:
+            tuple: (views, lost), where views is a list of zero, one or two structured
+            arrays (two when the range wraps the end of the ring) and lost is the number
+            of records overwritten before they could be read.
+        """
+        head = int(self.header["head"])
+        lost = 0
+        if head - self.position > self.capacity:
+            lost = head - self.capacity - self.position
+            self.position = head - self.capacity
+            self.lost += lost
+        end = head if max_records is None else min(head, self.position + max_records)
+        views = []
+        start = self.position
+        while start < end:
+            slot = start % self.capacity
+            count = min(end - start, self.capacity - slot)
+            views.append(self.records[slot:slot + count])
+            start += count
+        self.position = end
+        return views, lost
+
+    def overwritten(self, seq):
+        """
+        Returns True if the record with sequence number `seq` has been overwritten.
+        """
+        return int(self.header["head"]) - self.capacity >= seq
+
+    def close(self):
+        del self.header, self.records
+        self.shm.close()
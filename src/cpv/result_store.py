@@ -0,0 +1,289 @@
+# result_store.py
+
+import json
+import queue
+import sqlite3
+import threading
+import time
+from .segmented_log import SegmentedLog
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class JSONFileSink:
+    def __init__(self, delays_mp_file="delays_mp.json", delays_av_file="delays_av.json",
+                 max_segment_bytes=64 << 20, max_segment_seconds=3600, compact_after=7 * 86400,
+                 summary_retention_days=None):
+        """
+        Result sink appending mp and av delays to segmented JSON-lines logs (the original format).
+
+        Restarts append to the existing segments; old segments are compacted into
+        hourly summaries (see SegmentedLog).
+
+        Args:
+            delays_mp_file (str): Base path of the mp delay log.
+            delays_av_file (str): Base path of the av delay log.
+            max_segment_bytes (int): Size at which a segment is sealed.
+            max_segment_seconds (float): Age at which a segment is sealed.
+            compact_after (float): Age in seconds at which sealed segments are compacted.
+            summary_retention_days (float, optional): How long compacted summaries are kept.
+        """
+        self.delays_mp_file = delays_mp_file
+        self.delays_av_file = delays_av_file
+        options = {
+            "max_segment_bytes": max_segment_bytes,
+            "max_segment_seconds": max_segment_seconds,
+            "compact_after": compact_after,
+            "summary_retention_days": summary_retention_days,
+        }
+        self.mp_log = SegmentedLog(delays_mp_file, **options)
+        self.av_log = SegmentedLog(delays_av_file, **options)
+
+    def log_session(self, session_id, client_id, verifier_id):
+        pass
+
+    def log_mp(self, session_id, iteration, data, client_id=None, verifier_id=None):
+        self.mp_log.append(self._entry(session_id, iteration, data))
+
+    def log_av(self, session_id, iteration, data, client_id=None, verifier_id=None):
+        self.av_log.append(self._entry(session_id, iteration, data))
+
+    def log_verdict(self, session_id, client_id, inside, confidence, owds):
+        pass
+
+    def close(self):
+        self.mp_log.close()
+        self.av_log.close()
+
+    @staticmethod
+    def _entry(session_id, iteration, data):
+        return {"session_id": session_id, "iteration": iteration, "data": data, "timestamp": time.time()}
+
+
+class FanoutSink:
+    def __init__(self, sinks):
+        """
+        Result sink forwarding every call to several sinks, in order.
+        """
+        self.sinks = list(sinks)
+
+    def log_session(self, session_id, client_id, verifier_id):
+        for sink in self.sinks:
+            sink.log_session(session_id, client_id, verifier_id)
+
+    def log_mp(self, session_id, iteration, data, client_id=None, verifier_id=None):
+        for sink in self.sinks:
+            sink.log_mp(session_id, iteration, data, client_id, verifier_id)
+
+    def log_av(self, session_id, iteration, data, client_id=None, verifier_id=None):
+        for sink in self.sinks:
+            sink.log_av(session_id, iteration, data, client_id, verifier_id)
+
+    def log_verdict(self, session_id, client_id, inside, confidence, owds):
+        for sink in self.sinks:
+            sink.log_verdict(session_id, client_id, inside, confidence, owds)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    client_id TEXT,
+    verifier_id TEXT,
+    started_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_client ON sessions (client_id, started_at);
+CREATE INDEX IF NOT EXISTS sessions_time ON sessions (started_at);
+
+CREATE TABLE IF NOT EXISTS samples (
+    session_id TEXT,
+    client_id TEXT,
+    verifier_id TEXT,
+    iteration INTEGER,
+    protocol TEXT NOT NULL,
+    pair TEXT NOT NULL,
+    value REAL NOT NULL,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS samples_client ON samples (client_id, recorded_at);
+CREATE INDEX IF NOT EXISTS samples_session ON samples (session_id, iteration);
+CREATE INDEX IF NOT EXISTS samples_time ON samples (recorded_at);
+
+CREATE TABLE IF NOT EXISTS verdicts (
+    session_id TEXT,
+    client_id TEXT,
+    inside INTEGER NOT NULL,
+    confidence REAL,
+    owds TEXT,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS verdicts_client ON verdicts (client_id, recorded_at);
+CREATE INDEX IF NOT EXISTS verdicts_session ON verdicts (session_id);
+CREATE INDEX IF NOT EXISTS verdicts_time ON verdicts (recorded_at);
+"""
+
+
+class SQLiteResultStore:
+    def __init__(self, path="cpv_results.db", batch_size=500, flush_interval=0.5, retention_days=None):
+        """
+        Result sink backed by SQLite in WAL mode, indexed by client, session and time.
+
+        Writes are queued and committed by a background thread in batches of up to
+        `batch_size` rows (or every `flush_interval` seconds), one transaction per
+        batch. Reads use a separate connection, which WAL lets proceed concurrently.
+
+        Args:
+            path (str): Database file.
+            batch_size (int): Maximum rows committed per transaction.
+            flush_interval (float): Longest time a queued row waits before commit.
+            retention_days (float, optional): Rows older than this are deleted
+                periodically; kept forever when None.
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self.queue = queue.Queue()
+        self.read_lock = threading.Lock()
+
+        writer = self._connect()
+        writer.executescript(SCHEMA)
+        writer.commit()
+        self.reader = self._connect()
+        self.writer_thread = threading.Thread(target=self._write_loop, args=(writer,), daemon=True)
+        self.writer_thread.start()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    # Sink interface
+
+    def log_session(self, session_id, client_id, verifier_id):
+        self.queue.put(("sessions", (session_id, client_id, verifier_id, time.time())))
+
+    def log_mp(self, session_id, iteration, data, client_id=None, verifier_id=None):
+        self._log_samples("mp", data.get("dic_dcj", {}), session_id, iteration, client_id, verifier_id)
+
+    def log_av(self, session_id, iteration, data, client_id=None, verifier_id=None):
+        self._log_samples("av", data.get("delays", {}), session_id, iteration, client_id, verifier_id)
+
+    def log_verdict(self, session_id, client_id, inside, confidence, owds):
+        self.queue.put(("verdicts", (session_id, client_id, int(inside), confidence, json.dumps(owds), time.time())))
+
+    def close(self):
+        """
+        Commits everything queued and closes the database.
+        """
+        self.queue.put(None)
+        self.writer_thread.join()
+        with self.read_lock:
+            self.reader.close()
+
+    def _log_samples(self, protocol, values, session_id, iteration, client_id, verifier_id):
+        now = time.time()
+        for pair, value in values.items():
+            self.queue.put(("samples", (session_id, client_id, verifier_id, iteration, protocol, pair, value, now)))
+
+    # Queries
+
+    def client_samples(self, client_id, since=None, limit=1000):
+        """
+        Returns the most recent delay samples of a client as dictionaries, newest first.
+        """
+        return self._query(
+            "SELECT session_id, client_id, verifier_id, iteration, protocol, pair, value, recorded_at "
+            "FROM samples WHERE client_id = ? AND recorded_at >= ? ORDER BY recorded_at DESC LIMIT ?",
+            (client_id, since or 0.0, limit)
+        )
+
+    def session_samples(self, session_id):
+        """
+        Returns all delay samples of a session, ordered by iteration.
+        """
+        return self._query(
+            "SELECT session_id, client_id, verifier_id, iteration, protocol, pair, value, recorded_at "
+            "FROM samples WHERE session_id = ? ORDER BY iteration",
+            (session_id,)
+        )
+
+    def latest_verdict(self, client_id):
+        """
+        Returns the most recent verdict of a client, or None.
+        """
+        rows = self._query(
+            "SELECT session_id, client_id, inside, confidence, owds, recorded_at "
+            "FROM verdicts WHERE client_id = ? ORDER BY recorded_at DESC LIMIT 1",
+            (client_id,)
+        )
+        if not rows:
+            return None
+        row = rows[0]
+        row["inside"] = bool(row["inside"])
+        row["owds"] = json.loads(row["owds"])
+        return row
+
+    def _query(self, sql, params):
+        with self.read_lock:
+            cursor = self.reader.execute(sql, params)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    # Writer
+
+    def _write_loop(self, connection):
+        statements = {
+            "sessions": "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)",
+            "samples": "INSERT INTO samples VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            "verdicts": "INSERT INTO verdicts VALUES (?, ?, ?, ?, ?, ?)",
+        }
+        last_retention = 0.0
+        stopping = False
+        while not stopping:
+            batch = {table: [] for table in statements}
+            count = 0
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = False
+            deadline = time.time() + self.flush_interval
+            while item is not False:
+                if item is None:
+                    stopping = True
+                    break
+                batch[item[0]].append(item[1])
+                count += 1
+                if count >= self.batch_size:
+                    break
+                try:
+                    item = self.queue.get(timeout=max(deadline - time.time(), 0))
+                except queue.Empty:
+                    break
+            if count:
+                try:
+                    with connection:
+                        for table, rows in batch.items():
+                            if rows:
+                                connection.executemany(statements[table], rows)
+                except sqlite3.Error as e:
+                    logger.error(f"Error writing {count} results to {self.path}: {e}")
+            if self.retention_days is not None and time.time() - last_retention > 60:
+                self._apply_retention(connection)
+                last_retention = time.time()
+        connection.close()
+
+    def _apply_retention(self, connection):
+        cutoff = time.time() - self.retention_days * 86400
+        try:
+            with connection:
+                connection.execute("DELETE FROM samples WHERE recorded_at < ?", (cutoff,))
+                connection.execute("DELETE FROM verdicts WHERE recorded_at < ?", (cutoff,))
+                connection.execute("DELETE FROM sessions WHERE started_at < ?", (cutoff,))
+        except sqlite3.Error as e:
+            logger.error(f"Error applying retention to {self.path}: {e}")
@@ -0,0 +1,184 @@
+# scheduler.py
+
+import heapq
+import itertools
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+ROUND_SECONDS = 2.0  # Duration of one mp + av iteration (two one-second barriers)
+MAX_CONCURRENT_SESSIONS = 1  # A verifier keeps the measurement state of one session at a time
+
+
+class Job:
+    """
+    A measurement session waiting to run.
+    """
+    __slots__ = ("session_id", "tenant", "iterations", "deadline", "run", "submitted", "start_tag", "finish_tag")
+
+    def __init__(self, session_id, tenant, iterations, run, deadline=None):
+        """
+        Args:
+            session_id (str): The session to measure.
+            tenant (str): Tenant the session is accounted to for fair queuing.
+            iterations (int): Number of iterations; used as the job's cost.
+            run (callable): Runs the session; called on a scheduler worker thread.
+            deadline (float, optional): Time (epoch seconds) by which the session must finish.
+        """
+        self.session_id = session_id
+        self.tenant = tenant
+        self.iterations = iterations
+        self.run = run
+        self.deadline = deadline
+        self.submitted = time.time()
+        self.start_tag = 0.0
+        self.finish_tag = 0.0
+
+
+class MeasurementScheduler:
+    def __init__(self, max_concurrent=1, max_queue=64, tenant_weights=None, on_reject=None):
+        """
+        Admission control and weighted fair queuing in front of session execution.
+
+        Each tenant's jobs get virtual finish tags (start + iterations / weight), and
+        workers run the job with the smallest tag, breaking ties by deadline. A
+        submission is rejected immediately when the queue is full or when its deadline
+        cannot be met given the work already queued; queued jobs whose deadline passes
+        are rejected instead of run.
+
+        Args:
+            max_concurrent (int): Sessions measured at once.
+            max_queue (int): Maximum number of queued sessions.
+            tenant_weights (dict, optional): Weight per tenant (default 1).
+            on_reject (callable, optional): Called with (job, reason) for every rejection.
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.tenant_weights = tenant_weights or {}
+        self.on_reject = on_reject
+        self.condition = threading.Condition()
+        self.queue = []  # Heap of (finish_tag, deadline, seq, job)
+        self.sequence = itertools.count()
+        self.virtual_time = 0.0
+        self.tenant_finish = {}  # tenant -> finish tag of its last queued job
+        self.running = 0
+        self.workers = 0
+        self.round_seconds = ROUND_SECONDS  # Moving average of measured seconds per iteration
+
+        # Metrics
+        self.accepted = 0
+        self.rejected = 0
+        self.completed = 0
+
+    def set_capacity(self, probes_per_second, probes_per_iteration):
+        """
+        Ties the concurrency cap to the probe rate the verifier can sustain.
+
+        The cap never exceeds MAX_CONCURRENT_SESSIONS: the verifier's session state is
+        shared, so sessions measured at once would overwrite each other's samples.
+
+        Args:
+            probes_per_second (float): Probes the verifier can send without distorting RTTs.
+            probes_per_iteration (int): Probes one session sends per iteration.
+        """
+        per_session = probes_per_iteration / self.round_seconds
+        capacity = max(1, int(probes_per_second / per_session))
+        if capacity > MAX_CONCURRENT_SESSIONS:
+            logger.warning(
+                f"Probe capacity allows {capacity} concurrent sessions; running {MAX_CONCURRENT_SESSIONS} "
+                f"because session state is shared"
+            )
+            capacity = MAX_CONCURRENT_SESSIONS
+        with self.condition:
+            self.max_concurrent = capacity
+            self._spawn_workers()
+            self.condition.notify_all()
+
+    def submit(self, job):
+        """
+        Queues a job, or rejects it right away under overload.
+
+        Returns:
+            bool: True if the job was accepted.
+        """
+        with self.condition:
+            reason = None
+            if len(self.queue) >= self.max_queue:
+                reason = "queue_full"
+            elif job.deadline is not None and time.time() + self._estimated_wait(job) > job.deadline:
+                reason = "deadline"
+            if reason is None:
+                weight = self.tenant_weights.get(job.tenant, 1.0)
+                job.start_tag = max(self.virtual_time, self.tenant_finish.get(job.tenant, 0.0))
+                job.finish_tag = job.start_tag + job.iterations / weight
+                self.tenant_finish[job.tenant] = job.finish_tag
+                deadline = job.deadline if job.deadline is not None else float("inf")
+                heapq.heappush(self.queue, (job.finish_tag, deadline, next(self.sequence), job))
+                self.accepted += 1
+                self._spawn_workers()
+                self.condition.notify()
+                return True
+            self.rejected += 1
+        logger.warning(f"Rejected session {job.session_id} of tenant {job.tenant}: {reason}")
+        if self.on_reject:
+            self.on_reject(job, reason)
+        return False
+
+    def metrics(self):
+        """
+        Returns queue depth, running sessions and admission counters.
+        """
+        with self.condition:
+            return {
+                "queued": len(self.queue),
+                "running": self.running,
+                "max_concurrent": self.max_concurrent,
+                "accepted": self.accepted,
+                "rejected": self.rejected,
+                "completed": self.completed,
+            }
+
+    def _estimated_wait(self, job):
+        queued = sum(entry[3].iterations for entry in self.queue) + job.iterations
+        return queued * self.round_seconds / self.max_concurrent
+
+    def _spawn_workers(self):
+        while self.workers < self.max_concurrent:
+            self.workers += 1
+            threading.Thread(target=self._worker, daemon=True).start()
+
+    def _worker(self):
+        while True:
+            with self.condition:
+                while not self.queue or self.running >= self.max_concurrent:
+                    if self.workers > self.max_concurrent:
+                        self.workers -= 1
+                        return
+                    self.condition.wait()
+                _, _, _, job = heapq.heappop(self.queue)
+                self.virtual_time = max(self.virtual_time, job.start_tag)
+                expired = job.deadline is not None and time.time() + job.iterations * self.round_seconds > job.deadline
+                if expired:
+                    self.rejected += 1
+                else:
+                    self.running += 1
+            if expired:
+                logger.warning(f"Dropped session {job.session_id}: deadline can no longer be met")
+                if self.on_reject:
+                    self.on_reject(job, "deadline")
+                continue
+            started = time.time()
+            try:
+                job.run()
+            except Exception as e:
+                logger.error(f"Session {job.session_id} failed: {e}")
+            finally:
+                elapsed = time.time() - started
+                with self.condition:
+                    self.running -= 1
+                    self.completed += 1
+                    if job.iterations:
+                        self.round_seconds = 0.8 * self.round_seconds + 0.2 * elapsed / job.iterations
+                    self.condition.notify()
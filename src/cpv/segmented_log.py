@@ -0,0 +1,412 @@
+# segmented_log.py
+
+import glob
+import json
+import os
+import re
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+HOUR = 3600
+
+
+def _split_path(path):
+    stem, ext = os.path.splitext(path)
+    return stem, ext or ".json"
+
+
+def _numbered_segments(path):
+    stem, ext = _split_path(path)
+    pattern = re.compile(re.escape(os.path.basename(stem)) + r"\.(\d+)" + re.escape(ext) + "$")
+    segments = sorted(
+        (int(match.group(1)), name)
+        for name in glob.glob(f"{glob.escape(stem)}.*{ext}")
+        if (match := pattern.match(os.path.basename(name)))
+    )
+    return [name for _, name in segments]
+
+
+def segment_files(path):
+    """
+    Returns the segments of a segmented log in write order: the sealed segments, then
+    the base path itself, which holds the active segment (or the whole of a plain file).
+
+    Args:
+        path (str): The log's base path, e.g. delays_mp.json (sealed segments are
+            delays_mp.000001.json, ...).
+    """
+    segments = _numbered_segments(path)
+    if os.path.exists(path):
+        segments.append(path)
+    return segments
+
+
+class SegmentedLog:
+    def __init__(self, path, max_segment_bytes=64 << 20, max_segment_seconds=HOUR, compact_after=7 * 86400,
+                 summary_retention_days=None, compact_interval=600):
+        """
+        Append-only JSON-lines log split into numbered segments.
+
+        Entries are always written to the base path, so readers and tailers (tail -F)
+        of e.g. delays_mp.json keep working. The active segment is sealed once it
+        exceeds `max_segment_bytes` or is older than `max_segment_seconds`: it is
+        renamed to the next numbered segment and a new base file is started. The age
+        is also checked on every compaction pass, so a log that stops receiving
+        entries is still sealed and, in time, compacted. Sealed
+        segments are listed in an index file with their time range and sessions, so a
+        session is read from its segments only. A background thread compacts segments
+        older than `compact_after` seconds into per-pair, per-hour min/median
+        summaries and deletes them, which keeps disk use bounded for long-running
+        verifiers. Summaries are written to a new file that the index names, so a
+        compaction takes effect with the index update or not at all. On restart, the
+        log continues in the base file instead of truncating. Nothing is read or
+        created on disk until the log is first used.
+
+        Args:
+            path (str): Base path, e.g. delays_mp.json. Sealed segments are delays_mp.000001.json,
+                the index delays_mp.index.json and the summaries delays_mp.summary.000001.json.
+            max_segment_bytes (int): Size at which the active segment is sealed.
+            max_segment_seconds (float): Age at which the active segment is sealed.
+            compact_after (float): Age (seconds since a segment's last entry) at which it is compacted.
+            summary_retention_days (float, optional): Summaries older than this are dropped;
+                kept forever when None.
+            compact_interval (float): Seconds between compaction passes.
+        """
+        self.path = path
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_seconds = max_segment_seconds
+        self.compact_after = compact_after
+        self.summary_retention_days = summary_retention_days
+        stem, ext = _split_path(path)
+        self.stem = stem
+        self.ext = ext
+        self.index_path = f"{stem}.index{ext}"
+        self.summary_path = None  # Summaries file named by the index; None before the first compaction
+        self.lock = threading.Lock()
+        self.compaction_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.compact_interval = compact_interval
+        self.file = None
+        self.index = None  # Sealed segments, oldest first; loaded by _open
+        self.sequence = 0
+        self.active = None
+
+    def _open(self):
+        """
+        Loads the index and resumes the last segment on first use. Called with the lock held.
+        """
+        if self.index is not None:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.index, self.summary_path = self._load_index()
+        existing = _numbered_segments(self.path)
+        self.sequence = self._segment_number(existing[-1]) if existing else 0
+        # Segments renamed by a seal whose index update did not happen
+        indexed = {entry["segment"] for entry in self.index}
+        unindexed = [name for name in existing if name not in indexed]
+        for name in unindexed:
+            self.index.append(self._scan(name))
+        if unindexed:
+            self._save_index()
+        self._remove_uncommitted_summaries()
+        if os.path.exists(self.path):
+            self._resume()
+        if self.compact_interval and not self.stop_event.is_set():
+            threading.Thread(target=self._compact_loop, args=(self.compact_interval,), daemon=True).start()
+
+    # Writing
+
+    def append(self, entry):
+        """
+        Appends one JSON-serializable entry; entries with a "session_id" are indexed by session.
+        """
+        line = json.dumps(entry) + "\n"
+        now = entry.get("timestamp", time.time())
+        with self.lock:
+            self._open()
+            if self.active is None or self._should_roll(now):
+                self._roll(now)
+            self.file.write(line)
+            self.file.flush()
+            self.active["bytes"] += len(line)
+            self.active["last"] = now
+            if entry.get("session_id") is not None:
+                self.active["sessions"].add(entry["session_id"])
+
+    def roll(self):
+        """
+        Seals the active segment now.
+        """
+        with self.lock:
+            self._open()
+            if self.active is not None:
+                self._seal()
+
+    def seal_expired(self, now=None):
+        """
+        Seals the active segment if it is older than `max_segment_seconds`.
+
+        Returns:
+            bool: Whether a segment was sealed.
+        """
+        now = now if now is not None else time.time()
+        with self.lock:
+            self._open()
+            if self.active is None or not self.active["bytes"] or now - self.active["first"] < self.max_segment_seconds:
+                return False
+            self._seal()
+            return True
+
+    def close(self):
+        """
+        Stops compaction and closes the active segment (it is resumed on restart).
+        """
+        self.stop_event.set()
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
+
+    def _should_roll(self, now):
+        return (self.active["bytes"] >= self.max_segment_bytes
+                or now - self.active["first"] >= self.max_segment_seconds)
+
+    def _roll(self, now):
+        if self.active is not None:
+            self._seal()
+        self.file = open(self.path, "a")
+        self.active = {"segment": self.path, "first": now, "last": now, "bytes": 0, "sessions": set()}
+
+    def _seal(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+        self.sequence += 1
+        name = f"{self.stem}.{self.sequence:06d}{self.ext}"
+        os.replace(self.path, name)
+        entry = dict(self.active, segment=name, sessions=sorted(self.active["sessions"], key=str))
+        self.active = None
+        self.index.append(entry)
+        self._save_index()
+
+    def _resume(self):
+        entry = self._scan(self.path)
+        self.active = dict(entry, sessions=set(entry["sessions"]))
+        self.file = open(self.path, "a")
+        logger.info(f"Resuming {self.path} ({self.active['bytes']} bytes)")
+
+    def _scan(self, name):
+        """
+        Returns the index entry of a segment, read from its contents.
+        """
+        first = last = None
+        sessions = set()
+        for entry in self._read_segment(name):
+            timestamp = entry.get("timestamp")
+            if timestamp is not None:
+                first = timestamp if first is None else first
+                last = timestamp
+            if entry.get("session_id") is not None:
+                sessions.add(entry["session_id"])
+        now = time.time()
+        return {
+            "segment": name, "first": first or now, "last": last or now,
+            "bytes": os.path.getsize(name), "sessions": sorted(sessions, key=str),
+        }
+
+    # Index
+
+    def _load_index(self):
+        """
+        Returns the sealed segments and the summaries file named by the index.
+        """
+        try:
+            with open(self.index_path) as file:
+                index = json.load(file)
+        except FileNotFoundError:
+            return [], None
+        except (OSError, ValueError) as e:
+            # Sealed segments are scanned again; keep the newest summaries
+            logger.error(f"Error reading segment index {self.index_path}: {e}")
+            summaries = sorted(glob.glob(f"{glob.escape(self.stem)}.summary.*{self.ext}"))
+            return [], summaries[-1] if summaries else None
+        if isinstance(index, list):
+            # Written before the index named its summaries file
+            legacy = f"{self.stem}.summary{self.ext}"
+            index = {"segments": index, "summary": legacy if os.path.exists(legacy) else None}
+        segments = [entry for entry in index["segments"] if entry.get("compacted") or os.path.exists(entry["segment"])]
+        return segments, index.get("summary")
+
+    def _save_index(self):
+        tmp = f"{self.index_path}.tmp"
+        with open(tmp, "w") as file:
+            json.dump({"segments": self.index, "summary": self.summary_path}, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp, self.index_path)
+
+    def _remove_uncommitted_summaries(self):
+        # Summaries written by a compaction that crashed before its index update
+        for name in glob.glob(f"{glob.escape(self.stem)}.summary.*{self.ext}"):
+            if name != self.summary_path:
+                os.remove(name)
+
+    @staticmethod
+    def _segment_number(name):
+        return int(os.path.basename(name).rsplit(".", 2)[-2])
+
+    # Reading
+
+    def segments(self):
+        """
+        Returns the index entries of all segments, sealed and active, oldest first.
+        """
+        with self.lock:
+            self._open()
+            entries = [dict(entry) for entry in self.index]
+            if self.active is not None:
+                entries.append(dict(self.active, sessions=sorted(self.active["sessions"], key=str)))
+        return entries
+
+    def iter_entries(self, since=None, until=None):
+        """
+        Streams the entries of all segments not yet compacted, restricted to segments
+        overlapping the [since, until] time range.
+        """
+        for segment in self.segments():
+            if segment.get("compacted"):
+                continue
+            if since is not None and segment["last"] < since:
+                continue
+            if until is not None and segment["first"] > until:
+                continue
+            yield from self._read_segment(segment["segment"])
+
+    def read_session(self, session_id):
+        """
+        Returns the entries of a session, reading only the segments that contain it.
+        """
+        return [
+            entry
+            for segment in self.segments()
+            if not segment.get("compacted") and session_id in segment["sessions"]
+            for entry in self._read_segment(segment["segment"])
+            if entry.get("session_id") == session_id
+        ]
+
+    def summaries(self):
+        """
+        Returns the compacted per-pair, per-hour summaries, oldest first.
+        """
+        with self.lock:
+            self._open()
+            summary_path = self.summary_path
+        return list(self._read_segment(summary_path)) if summary_path else []
+
+    @staticmethod
+    def _read_segment(name):
+        try:
+            with open(name) as file:
+                for line in file:
+                    if line.strip():
+                        try:
+                            yield json.loads(line)
+                        except ValueError:
+                            # A partially written last line after a crash
+                            logger.warning(f"Skipping malformed line in {name}")
+        except FileNotFoundError:
+            return
+
+    # Compaction
+
+    def compact(self, now=None):
+        """
+        Compacts sealed segments whose last entry is older than `compact_after`.
+
+        The existing summaries and those of the compacted segments are written to a
+        new summaries file, which the index update that marks the segments compacted
+        puts in place; a crash in between leaves the previous state.
+
+        Returns:
+            int: Number of segments compacted.
+        """
+        now = now if now is not None else time.time()
+        with self.compaction_lock:
+            with self.lock:
+                self._open()
+                due = [entry for entry in self.index
+                       if not entry.get("compacted") and now - entry["last"] >= self.compact_after]
+            cutoff = None
+            if self.summary_retention_days is not None:
+                cutoff = now - self.summary_retention_days * 86400
+            if not due and (cutoff is None or self.summary_path is None):
+                return 0
+            values = {}  # (hour, field, pair) -> list of values
+            for segment in due:
+                for entry in self._read_segment(segment["segment"]):
+                    hour = int(entry.get("timestamp", segment["last"]) // HOUR * HOUR)
+                    for field, pairs in entry.get("data", {}).items():
+                        if isinstance(pairs, dict):
+                            for pair, value in pairs.items():
+                                if isinstance(value, (int, float)):
+                                    values.setdefault((hour, field, pair), []).append(value)
+            # Imported here: only compaction needs NumPy, and it runs off the startup path
+            import numpy as np
+
+            summaries = self.summaries()
+            for (hour, field, pair), samples in sorted(values.items()):
+                samples = np.asarray(samples, dtype=float)
+                summaries.append({
+                    "hour": hour, "field": field, "pair": pair, "count": int(len(samples)),
+                    "min": float(samples.min()), "median": float(np.median(samples)),
+                })
+            if cutoff is not None:
+                summaries = [entry for entry in summaries if entry["hour"] >= cutoff]
+            summary_path = self._write_summaries(summaries)
+            with self.lock:
+                previous = self.summary_path
+                for segment in due:
+                    segment["compacted"] = True
+                    segment["sessions"] = []
+                if cutoff is not None:
+                    self.index = [entry for entry in self.index if not entry.get("compacted") or entry["last"] >= cutoff]
+                self.summary_path = summary_path
+                self._save_index()
+            for name in [segment["segment"] for segment in due] + ([previous] if previous else []):
+                try:
+                    os.remove(name)
+                except FileNotFoundError:
+                    pass
+            if due:
+                logger.info(f"Compacted {len(due)} segments of {self.path} into {len(values)} summaries")
+            return len(due)
+
+    def _write_summaries(self, summaries):
+        """
+        Writes summaries to a new file, not yet named by the index, and returns its path.
+        """
+        generation = 1
+        if self.summary_path:
+            number = os.path.basename(self.summary_path).rsplit(".", 2)[-2]
+            generation = int(number) + 1 if number.isdigit() else 1
+        name = f"{self.stem}.summary.{generation:06d}{self.ext}"
+        with open(name, "w") as file:
+            for entry in summaries:
+                json.dump(entry, file)
+                file.write("\n")
+            file.flush()
+            os.fsync(file.fileno())
+        return name
+
+    def _compact_loop(self, interval):
+        while not self.stop_event.wait(interval):
+            try:
+                self.seal_expired()
+                self.compact()
+            except (OSError, ValueError) as e:
+                logger.error(f"Error compacting {self.path}: {e}")
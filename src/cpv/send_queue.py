@@ -0,0 +1,140 @@
+# send_queue.py
+
+import socket
+import threading
+from collections import deque
+import logging
+
+logger = logging.getLogger(__name__)
+
+DROP = "drop"  # Drop new messages while the queue is full
+DISCONNECT = "disconnect"  # Close the connection of a consumer that falls behind
+
+
+class SendQueue:
+    def __init__(self, connection, name, max_bytes=1 << 20, max_messages=10000, policy=DROP, on_close=None):
+        """
+        Bounded outbound queue for one connection, drained by a dedicated writer thread.
+
+        send() only appends to the queue, so fanning a message out to many
+        connections never blocks the caller on a slow peer's TCP window. The writer
+        coalesces everything queued into one sendall call.
+
+        Args:
+            connection (socket.socket): The connection to write to.
+            name (str): Identifier of the remote end, used in logs and metrics.
+            max_bytes (int): Maximum number of queued bytes.
+            max_messages (int): Maximum number of queued messages.
+            policy (str): DROP to discard messages that exceed the bound, DISCONNECT to
+                close the connection of the slow consumer.
+            on_close (callable, optional): Called with this queue once it is closed.
+        """
+        self.connection = connection
+        self.name = name
+        self.max_bytes = max_bytes
+        self.max_messages = max_messages
+        self.policy = policy
+        self.on_close = on_close
+        self.condition = threading.Condition()
+        self.pending = deque()
+        self.pending_bytes = 0
+        self.closed = False
+
+        # Metrics
+        self.sent_messages = 0
+        self.sent_bytes = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+        threading.Thread(target=self._drain, daemon=True).start()
+
+    def send(self, data, size=None):
+        """
+        Queues bytes for sending.
+
+        `data` may also be a callable returning the bytes, rendered by the writer just
+        before the sendall that carries it (e.g. to stamp the time of sending). Its
+        size is then taken from `size` for the byte bound.
+
+        Returns:
+            bool: False if the message was dropped or the queue is closed.
+        """
+        with self.condition:
+            if self.closed:
+                return False
+            size = len(data) if size is None else size
+            if len(self.pending) >= self.max_messages or self.pending_bytes + size > self.max_bytes:
+                self.dropped += 1
+                if self.policy == DISCONNECT:
+                    logger.warning(f"Disconnecting slow consumer {self.name} ({self.pending_bytes} bytes queued)")
+                    self._close_locked()
+                return False
+            self.pending.append(data)
+            self.pending_bytes += size
+            self.max_depth = max(self.max_depth, len(self.pending))
+            self.condition.notify()
+            return True
+
+    def metrics(self):
+        """
+        Returns a snapshot of the queue depth and counters.
+        """
+        with self.condition:
+            return {
+                "name": self.name,
+                "depth": len(self.pending),
+                "bytes": self.pending_bytes,
+                "max_depth": self.max_depth,
+                "sent_messages": self.sent_messages,
+                "sent_bytes": self.sent_bytes,
+                "dropped": self.dropped,
+                "closed": self.closed,
+            }
+
+    def close(self):
+        """
+        Stops the writer; messages still queued are discarded.
+        """
+        with self.condition:
+            self.closed = True
+            self.pending.clear()
+            self.pending_bytes = 0
+            self.condition.notify()
+
+    def _close_locked(self):
+        self.closed = True
+        self.pending.clear()
+        self.pending_bytes = 0
+        self.condition.notify()
+        try:
+            # Wakes the connection's reader, which then runs its usual cleanup
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _drain(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    break
+                items = list(self.pending)
+                self.pending.clear()
+                self.pending_bytes = 0
+            # Rendered outside the lock: a render may take its owner's locks, which are
+            # held by threads that call send()
+            batch = b"".join(item() if callable(item) else item for item in items)
+            count = len(items)
+            try:
+                self.connection.sendall(batch)
+            except (socket.error, OSError) as e:
+                logger.error(f"Error sending to {self.name}: {e}")
+                with self.condition:
+                    self._close_locked()
+                break
+            with self.condition:
+                self.sent_messages += count
+                self.sent_bytes += len(batch)
+        if self.on_close:
+            self.on_close(self)
@@ -4,14 +4,32 @@ import socket
 import threading
 import time
 import uuid
+from collections import OrderedDict
 from . import cpv_utils
+from .checkpoint import Checkpointer, read_snapshot
+from .monitor import MONITOR_PREFIX, MONITOR_TENANT
+from .scheduler import ROUND_SECONDS, Job, MeasurementScheduler
+from .send_queue import DROP, SendQueue
+from .stats import RunningStats
+from .tracing import NULL_TRACER, traced_lock
+from .verdict_cache import Verdict, VerdictCache
 import json
 import logging
 
 logger = logging.getLogger(__name__)
 
+MAX_SCHEDULED_SESSIONS = 4096  # Recent session IDs remembered so a fanned-out session runs once
+START_LEAD = 0.1  # Seconds, beyond the slowest peer RTT, between announcing a session and its start
+ITERATION_PERIOD = ROUND_SECONDS + 0.25  # Seconds between the aligned starts of a session's iterations
+
 class Server:
-    def __init__(self, host, port, peers=None, identifier=None):
+    def __init__(self, host, port, peers=None, identifier=None, verdict_cache=None, reuse_port=False,
+                 tracer=None, aggregator_id=None, topology=None, calibration=None,
+                 send_queue_bytes=1 << 20, send_queue_messages=10000, slow_consumer_policy=DROP,
+                 scheduler=None, result_sink=None, delays_mp_file="delays_mp.json",
+                 delays_av_file="delays_av.json", checkpoint_path=None, checkpoint_interval=30.0,
+                 result_ring=None, compensate_dwell=False, monitor_interval=10.0, monitor_window=60.0,
+                 pacer=None, relay_detector=None, triangle=None, claimed_location=None):
         """
         Initializes a Server object to act as a verifier in the CPV protocol.
 
@@ -20,48 +38,372 @@ class Server:
             port (int): The port number to bind the server.
             peers (dict, optional): A mapping of peer identifiers to (host, port).
             identifier (str, optional): A unique identifier for this server.
+            verdict_cache (VerdictCache, optional): Cache consulted before starting a
+                client-requested session. Defaults to a cache with a 5 minute TTL.
+            reuse_port (bool, optional): Set SO_REUSEPORT so several worker processes
+                can share the listen port (see cpv.supervisor).
+            tracer (Tracer, optional): Records per-phase spans of each round. Tracing is
+                disabled when omitted.
+            aggregator_id (str, optional): Verifier that combines every verifier's
+                per-iteration results into a verdict. It is also the coordinator that
+                admits every session and starts it on all verifiers at the same time.
+                Defaults to the lowest identifier among this server and its peers.
+            topology (TopologyRegistry, optional): Registry of verifier locations. Supplies
+                the peers when none are given, receives the verifier delays the aggregator
+                measures (and precomputes triangle constants from them), and invalidates
+                the verdict cache when verifiers join or leave.
+            calibration (CalibrationRegistry, optional): Per-verifier and per-pair
+                delay -> distance models the aggregator uses instead of the fixed
+                200 km/ms scaling, refit from its measured verifier delays. A single
+                DelayDistanceModel becomes the registry's default model.
+            send_queue_bytes (int, optional): Bound on bytes queued per connection.
+            send_queue_messages (int, optional): Bound on messages queued per connection.
+            slow_consumer_policy (str, optional): "drop" to discard messages beyond the
+                bound, "disconnect" to close connections that fall behind.
+            scheduler (MeasurementScheduler, optional): Admission control and fair
+                queuing for sessions; on the coordinator it decides for the whole mesh.
+                Defaults to one session at a time with a queue of 64, and it must not
+                run sessions concurrently.
+            result_sink (optional): Where sessions, delays and verdicts are recorded, e.g.
+                a SQLiteResultStore. Defaults to a JSONFileSink on the delay files below.
+            delays_mp_file (str, optional): File to log mp delays with the default sink.
+            delays_av_file (str, optional): File to log av delays with the default sink.
+            checkpoint_path (str, optional): Snapshot file for warm restarts. When set, the
+                peer table, peer RTTs, clock offsets, calibration and session progress are
+                restored from it on start (reconnecting the mesh) and saved periodically.
+            checkpoint_interval (float, optional): Seconds between checkpoints.
+            result_ring (ResultRing, optional): Shared-memory ring that finalized samples
+                and verdicts are also published to, for co-located consumers.
+            compensate_dwell (bool, optional): Subtract the dwell time clients report in
+                FORWARD_TIMESTAMP (receipt to forward) from dic + dcj. Dwell statistics
+                are tracked either way.
+            monitor_interval (float, optional): Seconds between the shared probing rounds
+                of continuous monitoring (START_MONITORING).
+            monitor_window (float, optional): Seconds of samples monitoring verdicts use.
+            pacer (ProbePacer, optional): Spreads TIMESTAMP and RTT probes with jitter and
+                per-host/per-link token buckets, drops probes that could not be sent
+                before their barrier, and estimates whether probing itself inflates the
+                measured RTTs (see probe_load_report). Closed on shutdown.
+            relay_detector (RelayDetector, optional): Streaming relay/proxy scores of each
+                client (see relay_scores); created with default thresholds when omitted.
+            triangle (list, optional): The three verifier identifiers, in triangle order,
+                whose results form verdicts. Defaults to the triple the topology selects
+                for claimed_location, else to this server and its peers, which must then
+                be exactly three; otherwise no verdicts are produced.
+            claimed_location (tuple, optional): (lat, lon) the verified clients claim.
+                With a topology and no triangle, the smallest verifier triangle enclosing
+                it (TopologyRegistry.select_triangle) is used, and selected again when
+                verifiers join or leave.
         """
         self.host = host
         self.port = port
         self.identifier = identifier  # Unique identifier for this server (e.g., 'server1')
+        self.topology = topology
+        if peers is None and topology is not None:
+            peers = topology.peers_for(identifier)
         self.peers = peers or {}  # Mapping of peer identifiers to (host, port)
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.reuse_port = reuse_port
+        self.socket = None  # Listening socket, created by listen()
+        self.listening = threading.Event()  # Set once the listening socket accepts connections
         self.connections = {}  # Map identifiers to connections with peers
         self.client_connections = {}  # Map identifiers to connections with clients
+        self.client_addresses = {}  # Map client identifiers to their (host, port)
+        self.send_queues = {}  # Map connections to their outbound SendQueue
+        self.send_queues_lock = threading.Lock()
+        self.send_queue_bytes = send_queue_bytes
+        self.send_queue_messages = send_queue_messages
+        self.slow_consumer_policy = slow_consumer_policy
         self.running = True
         self.lock = threading.Lock()
+        self.tracer = tracer or NULL_TRACER
         self.session_id = None  # Shared session ID for each measurement instance
 
-        # Data structures for protocols
-        self.dic_dcj_sums = {}  # Stores dic + dcj sums for mp protocol
-        self.min_sums = {}  # Stores min(dic + dcj, djc + dci) for mp protocol
-        self.av_delays = {}     # Stores delays from av protocol
+        # Connection routing for sharded deployments: called with
+        # (identifier, connection, address, data) after HELLO; returns True if it took the connection
+        self.connection_router = None
+        self.lane = None  # Worker index announced in HELLO to peers when sharded
+        self.mesh_state = None  # Shared verifier-mesh state published by a supervisor
+        self.peer_rtts = {}  # Latest RTT to each peer verifier
+        self.clock_offsets = {}  # Estimated clock offset of each peer verifier
 
-        self.delays_mp_file = "delays_mp.json"  # File to log mp delays
-        self.delays_av_file = "delays_av.json"  # File to log av delays
+        # Subsystems that need NumPy (measurements, relay scores) are created on first
+        # use, or in the background once the server listens; see _warm_up
+        self.lazy_lock = threading.Lock()
+        self._measurements = None
+        self._relay_detector = relay_detector
 
-        # Clear delay files on startup
-        open(self.delays_mp_file, 'w').close()
-        open(self.delays_av_file, 'w').close()
+        # Sink for sessions, delays and verdicts
+        if result_sink is None:
+            from .result_store import JSONFileSink
+            result_sink = JSONFileSink(delays_mp_file, delays_av_file)
+        self.result_sink = result_sink
+        if result_ring is not None:
+            from .result_store import FanoutSink
+            self.result_sink = FanoutSink([self.result_sink, result_ring])
 
-        # Measurements storage
-        self.verifier_measurements = {}  # For av protocol
         self.forwarded_timestamps = set()  # To prevent redundant forwarding
+        self.compensate_dwell = compensate_dwell
+        self.client_dwell = {}  # Map client identifiers to RunningStats of their forwarding dwell
+
+        # Cluster-wide aggregation of per-iteration results into verdicts
+        if calibration is not None:
+            from .calibration import CalibrationRegistry, DelayDistanceModel
+            if isinstance(calibration, DelayDistanceModel):
+                calibration = CalibrationRegistry(default_model=calibration)
+        self.calibration = calibration
+        self.triangle = list(triangle) if triangle else None
+        self.claimed_location = claimed_location
+        self.configured_aggregator_id = aggregator_id
+        self.monitor_interval = monitor_interval
+        self.monitor_window = monitor_window
+        self.monitor_thread = None
+        self.client_eij = {}  # Map client IDs to the dic + dcj sums they forwarded this iteration
+        self._init_aggregator()
+        self.session_clients = {}  # Map session IDs to the client that requested them
+        self.scheduled_sessions = OrderedDict()  # Recently scheduled session IDs -> requesting client
+        self.session_progress = {}  # Map session IDs in progress to iteration counts and client
+        self.interrupted_sessions = {}  # Sessions in progress when the last checkpoint was taken
+
+        # Sessions run on scheduler workers, never on the connection handler threads.
+        # Measurement state is per server, so the default runs one session at a time.
+        self.scheduler = scheduler or MeasurementScheduler()
+        if self.scheduler.max_concurrent > 1:
+            raise ValueError("Sessions share the server's measurement state; the scheduler must run one at a time")
+        self.scheduler.on_reject = self._reject_session
+
+        # Verdicts from recent sessions, served without re-measuring
+        self.verdict_cache = verdict_cache if verdict_cache is not None else VerdictCache()
+        if self.topology is not None:
+            self.topology.add_listener(self.verdict_cache.invalidate_topology)
+            if self.triangle is None and self.claimed_location is not None:
+                self.topology.add_listener(self._reselect_triangle)
+
+        self.pacer = pacer
+
+        # Durable state for warm restarts
+        self.checkpoint = None
+        if checkpoint_path:
+            self.checkpoint = Checkpointer(checkpoint_path, self.checkpoint_state, checkpoint_interval)
+
+    @property
+    def measurements(self):
+        """
+        Per-session measurements for the mp and av protocols, indexed by interned
+        verifier ids (a MeasurementTable, created on first use).
+        """
+        if self._measurements is None:
+            with self.lazy_lock:
+                if self._measurements is None:
+                    from .measurement_table import MeasurementTable
+                    self._measurements = MeasurementTable([self.identifier] + list(self.peers.keys()))
+        return self._measurements
+
+    @property
+    def relay_detector(self):
+        """
+        The RelayDetector scoring clients, created with default thresholds on first
+        use when none was given.
+        """
+        if self._relay_detector is None:
+            with self.lazy_lock:
+                if self._relay_detector is None:
+                    from .relay import RelayDetector
+                    self._relay_detector = RelayDetector()
+        return self._relay_detector
+
+    def _warm_up(self):
+        """
+        Creates the lazily built subsystems, importing NumPy, off the startup path so
+        the first session does not wait for them.
+        """
+        self.measurements
+        self.relay_detector
+        if self.aggregator is not None:
+            from . import cpv  # noqa: F401
+
+    def _init_aggregator(self):
+        """
+        Picks the aggregator (the configured one, else the lowest identifier of the
+        triangle) and creates the VerdictAggregator if it is this server.
+        """
+        verifier_ids = (
+            self.triangle or self._selected_triangle() or sorted([self.identifier or ""] + list(self.peers.keys()))
+        )
+        self.verifier_ids = verifier_ids
+        self.aggregator_id = self.configured_aggregator_id or min(verifier_ids)
+        self.aggregator = None
+        self.monitor = None
+        if self.aggregator_id == self.identifier:
+            if len(verifier_ids) != 3:
+                logger.warning(
+                    f"[{self.identifier}] {len(verifier_ids)} verifiers and no triangle configured; "
+                    f"no verdicts will be produced"
+                )
+                return
+            from .aggregator import VerdictAggregator
+            from .monitor import PresenceMonitor
+            self.aggregator = VerdictAggregator(verifier_ids, topology=self.topology, calibration=self.calibration)
+            self.monitor = PresenceMonitor(self.aggregator, self.monitor_window)
+            self.aggregator.add_listener(self._score_aggregated_round)
+
+    def _selected_triangle(self):
+        """
+        Returns the verifier triple the topology selects for the claimed location, or
+        None without a topology, a claimed location or an enclosing triangle.
+        """
+        if self.topology is None or self.claimed_location is None:
+            return None
+        triangle = self.topology.select_triangle(*self.claimed_location)
+        if triangle is None:
+            logger.warning(f"[{self.identifier}] No verifier triangle encloses {self.claimed_location}")
+            return None
+        return list(triangle.ids)
+
+    def _reselect_triangle(self):
+        """
+        Topology listener: re-creates the aggregator if verifiers joining or leaving
+        changed the triangle selected for the claimed location.
+        """
+        verifier_ids = self._selected_triangle()
+        if verifier_ids is not None and verifier_ids != self.verifier_ids:
+            logger.info(f"[{self.identifier}] Verifier triangle for {self.claimed_location} is now {verifier_ids}")
+            self._init_aggregator()
 
     def start(self):
         """
         Starts the server by launching threads for listening to connections and handling commands.
+
+        With a checkpoint configured, state is restored first and the mesh is
+        re-established in the background.
         """
+        if self.checkpoint is not None:
+            if self.restore_checkpoint():
+                threading.Thread(target=self._reconnect_mesh, daemon=True).start()
+            self.checkpoint.start()
         threading.Thread(target=self.listen, daemon=True).start()
         threading.Thread(target=self.command_loop, daemon=True).start()
 
+    def checkpoint_state(self):
+        """
+        Returns a copy of the state saved in checkpoints.
+        """
+        with self.lock:
+            return {
+                "identifier": self.identifier,
+                "saved_at": time.time(),
+                "peers": {peer_id: list(address) for peer_id, address in self.peers.items()},
+                "peer_rtts": dict(self.peer_rtts),
+                "clock_offsets": dict(self.clock_offsets),
+                "calibration": self.calibration.to_dict() if self.calibration is not None else None,
+                "sessions": {session_id: dict(progress) for session_id, progress in self.session_progress.items()},
+            }
+
+    def restore_checkpoint(self):
+        """
+        Restores state from the checkpoint file.
+
+        Peers from the snapshot are added to the configured ones; RTTs and clock offsets
+        seed the values until fresh probes replace them: they set the start lead and
+        clock conversion of the first sessions (see peer_state). A calibration passed
+        to the constructor takes precedence over the saved one. Sessions that were in
+        progress for a client are kept in interrupted_sessions and started again from
+        the first iteration when that client reconnects (see _resume_interrupted_sessions);
+        the others are dropped.
+
+        Returns:
+            bool: True if a snapshot was restored.
+        """
+        state = read_snapshot(self.checkpoint.path)
+        if state is None:
+            return False
+        if state.get("identifier") != self.identifier:
+            logger.warning(f"[{self.identifier}] Ignoring checkpoint of {state.get('identifier')}")
+            return False
+        with self.lock:
+            new_peers = {
+                peer_id: tuple(address) for peer_id, address in state.get("peers", {}).items()
+                if peer_id not in self.peers and peer_id != self.identifier
+            }
+            self.peers.update(new_peers)
+            for peer_id in new_peers:
+                self.measurements.intern(peer_id)
+            for peer_id, rtt in state.get("peer_rtts", {}).items():
+                self.peer_rtts.setdefault(peer_id, rtt)
+            for peer_id, offset in state.get("clock_offsets", {}).items():
+                self.clock_offsets.setdefault(peer_id, offset)
+            self.interrupted_sessions = {
+                session_id: progress for session_id, progress in state.get("sessions", {}).items()
+                if progress.get("client_id") is not None
+            }
+            dropped = len(state.get("sessions", {})) - len(self.interrupted_sessions)
+        restored_calibration = self.calibration is None and state.get("calibration") is not None
+        if restored_calibration:
+            from .calibration import CalibrationRegistry
+            self.calibration = CalibrationRegistry.from_dict(state["calibration"])
+        if new_peers or restored_calibration:
+            self._init_aggregator()
+        age = time.time() - state.get("saved_at", time.time())
+        logger.info(
+            f"[{self.identifier}] Restored checkpoint from {age:.0f}s ago: {len(self.peers)} peers, "
+            f"{len(self.interrupted_sessions)} interrupted sessions to resume, {dropped} without a client dropped"
+        )
+        return True
+
+    def _resume_interrupted_sessions(self, client_id):
+        """
+        Starts the sessions a client had in progress when the checkpoint was taken
+        again, from the first iteration; their measurements did not survive the
+        restart. If the coordinator cannot take them, the client gets REJECTED.
+        """
+        with self.lock:
+            sessions = {
+                session_id: progress for session_id, progress in self.interrupted_sessions.items()
+                if progress["client_id"] == client_id
+            }
+            for session_id in sessions:
+                del self.interrupted_sessions[session_id]
+        for session_id, progress in sessions.items():
+            logger.info(f"[{self.identifier}] Resuming interrupted session {session_id} of client {client_id}")
+            self._start_session(session_id, progress["iterations"], client_id)
+
+    def _reconnect_mesh(self, timeout=60.0):
+        """
+        Connects to every known peer, retrying with backoff while peers are still restarting.
+        """
+        delay = 0.5
+        deadline = time.time() + timeout
+        while self.running:
+            with self.lock:
+                missing = [
+                    (peer_id, address) for peer_id, address in self.peers.items()
+                    if not self.connections.get(peer_id, {}).get("outgoing")
+                ]
+            for peer_id, (peer_host, peer_port) in missing:
+                self.connect(peer_id, peer_host, peer_port)
+            if not missing or time.time() >= deadline:
+                break
+            time.sleep(delay)
+            delay = min(delay * 2, 5.0)
+        with self.lock:
+            connected = sum(1 for sockets in self.connections.values() if sockets.get("outgoing"))
+        logger.info(f"[{self.identifier}] Mesh re-established with {connected}/{len(self.peers)} peers")
+
     def listen(self):
         """
         Listens for incoming connections and spawns threads to handle each one.
         """
-        self.socket.bind((self.host, self.port))
-        self.socket.listen(5)
+        listen_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        # Lets a restarted verifier bind while connections of its previous run are in TIME_WAIT
+        listen_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.reuse_port:
+            listen_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        listen_socket.bind((self.host, self.port))
+        listen_socket.listen(5)
+        with self.lock:
+            self.socket = listen_socket
+        self.listening.set()
         logger.info(f"[{self.identifier}] Listening on {self.host}:{self.port}")
+        threading.Thread(target=self._warm_up, daemon=True).start()
         while self.running:
             try:
                 connection, address = self.socket.accept()
@@ -78,70 +420,105 @@ class Server:
         """
         try:
             data = connection.recv(1024).decode()
+            self.adopt_connection(connection, address, data)
+        except socket.error as e:
+            logger.error(f"[{self.identifier}] Error handling incoming connection from {address}: {e}")
+
+    def adopt_connection(self, connection, address, data):
+        """
+        Registers a connection whose HELLO message has already been read.
+
+        Args:
+            connection (socket.socket): The accepted connection.
+            address (tuple): The remote (host, port).
+            data (str): The HELLO message received on the connection.
+        """
+        try:
             if data.startswith(cpv_utils.HELLO):
-                _, identifier = data.strip().split()
+                hello, _, pending = data.partition(cpv_utils.MESSAGE_DELIMITER)
+                identifier = hello.split()[1]
+                if self.connection_router and self.connection_router(identifier, connection, address, data):
+                    return
                 if identifier.startswith("client"):
                     with self.lock:
+                        previous = self.client_addresses.get(identifier)
                         self.client_connections[identifier] = connection
+                        self.client_addresses[identifier] = address
+                    if previous is not None and previous[0] != address[0]:
+                        # A new source address means a new route; its delays are not comparable
+                        self.relay_detector.reset(identifier)
                     logger.info(f"[{self.identifier}] Incoming connection from client {identifier} ({address})")
                     threading.Thread(
-                        target=self._handle_client, args=(connection, identifier), daemon=True
+                        target=self._handle_client, args=(connection, identifier, pending), daemon=True
                     ).start()
+                    if self.interrupted_sessions:
+                        self._resume_interrupted_sessions(identifier)
                 else:
                     with self.lock:
                         if identifier not in self.connections:
                             self.connections[identifier] = {"incoming": connection, "outgoing": None}
+                            self.verdict_cache.invalidate_topology()
                         else:
                             self.connections[identifier]["incoming"] = connection
                     logger.info(f"[{self.identifier}] Incoming connection from {identifier} ({address})")
                     threading.Thread(
-                        target=self._handle_peer, args=(connection, identifier), daemon=True
+                        target=self._handle_peer, args=(connection, identifier, pending), daemon=True
                     ).start()
             else:
                 logger.warning(f"[{self.identifier}] Unexpected data from {address}: {data}")
         except socket.error as e:
             logger.error(f"[{self.identifier}] Error handling incoming connection from {address}: {e}")
 
-    def _handle_client(self, connection, identifier):
+    def _handle_client(self, connection, identifier, pending=""):
         """
         Handles communication with a client.
         """
         try:
-            while self.running:
-                data = connection.recv(1024).decode()
-                if not data:
-                    continue
+            for data in cpv_utils.receive_messages(connection, pending):
+                if not self.running:
+                    break
                 message_type, params = cpv_utils.parse_message(data)
                 if message_type == cpv_utils.FORWARD_TIMESTAMP:
                     # Handle forwarded timestamp from client
                     sender_id = params[0]
                     timestamp = float(params[1])
                     iteration = int(params[2])
-                    self._handle_timestamp_from_client(sender_id, timestamp, iteration)
+                    dwell = float(params[3]) if len(params) > 3 else None
+                    self._handle_timestamp_from_client(sender_id, timestamp, iteration, dwell, identifier)
                 elif message_type == cpv_utils.START_MEASUREMENTS:
                     session_id = params[0]
                     iterations = int(params[1])
-                    self.session_id = session_id
-                    self.measure_delays(iterations)
+                    deadline = float(params[2]) if len(params) > 2 else None
+                    if self._send_cached_verdict(identifier, session_id):
+                        continue
+                    self._start_session(session_id, iterations, identifier, deadline=deadline)
+                elif message_type == cpv_utils.START_MONITORING:
+                    self._start_monitoring(identifier, params[0])
+                elif message_type == cpv_utils.STOP_MONITORING:
+                    if self.monitor is not None:
+                        self.monitor.remove_client(identifier)
                 else:
                     logger.info(f"[{self.identifier}] Received from client {identifier}: {data}")
         except socket.error as e:
             logger.error(f"[{self.identifier}] Connection error with client {identifier}: {e}")
         finally:
+            self._close_send_queue(connection)
+            if self.monitor is not None:
+                self.monitor.remove_client(identifier)
             with self.lock:
                 connection.close()
                 self.client_connections.pop(identifier, None)
+                self.client_addresses.pop(identifier, None)
                 logger.info(f"[{self.identifier}] Disconnected from client {identifier}")
 
-    def _handle_peer(self, connection, identifier):
+    def _handle_peer(self, connection, identifier, pending=""):
         """
         Handles communication with a peer.
         """
         try:
-            while self.running:
-                data = connection.recv(1024).decode()
-                if not data:
-                    continue
+            for data in cpv_utils.receive_messages(connection, pending):
+                if not self.running:
+                    break
                 message_type, params = cpv_utils.parse_message(data)
                 if message_type == cpv_utils.RTT_MEASUREMENT_REQUEST:
                     # Respond to RTT measurement request
@@ -152,7 +529,7 @@ class Server:
                     message = cpv_utils.construct_message(
                         cpv_utils.RTT_MEASUREMENT_RESPONSE, self.identifier, response_time, iteration
                     )
-                    connection.sendall(message.encode())
+                    self._send(connection, message, identifier)
                 elif message_type == cpv_utils.RTT_MEASUREMENT_RESPONSE:
                     # Handle RTT measurement response
                     responder_id = params[0]
@@ -164,27 +541,50 @@ class Server:
                     sender_id = params[0]
                     timestamp = float(params[1])
                     iteration = int(params[2])
-                    self._handle_timestamp_from_client(sender_id, timestamp, iteration)
+                    dwell = float(params[3]) if len(params) > 3 else None
+                    self._handle_timestamp_from_client(sender_id, timestamp, iteration, dwell)
                 elif message_type == cpv_utils.TIMESTAMP:
                     # Handle direct timestamp from peer (if applicable)
                     sender_id = params[0]
                     timestamp = float(params[1])
                     iteration = int(params[2])
                     self._handle_timestamp_from_peer(sender_id, timestamp, iteration)
+                elif message_type == cpv_utils.ITERATION_RESULT:
+                    # Per-iteration results streamed to the aggregator
+                    self._handle_iteration_result(params)
+                elif message_type == cpv_utils.MONITOR_RESULT:
+                    # Per-client results of a monitoring round
+                    self._handle_monitor_result(params)
+                elif message_type == cpv_utils.VERDICT:
+                    # A verdict published by the aggregator, cached here as well
+                    client_id, session_id = params[0], params[1]
+                    self.record_verdict(
+                        client_id, params[2] == "1", cpv_utils.decode_owds(params[4:]), float(params[3]), session_id
+                    )
+                elif message_type == cpv_utils.SESSION_REQUEST:
+                    # A session requested at another verifier, for the coordinator to admit
+                    deadline = float(params[4]) if len(params) > 4 else None
+                    client_id = None if params[2] == cpv_utils.NO_CLIENT else params[2]
+                    self._start_session(params[0], int(params[1]), client_id, params[3], deadline)
                 elif message_type == cpv_utils.START_MEASUREMENTS:
-                    # Start measurements
+                    # The coordinator admitted a session; it starts at params[4] on the coordinator's clock
                     session_id = params[0]
                     iterations = int(params[1])
-                    self.session_id = session_id
-                    self.measure_delays(iterations)
+                    client_id = None if params[2] == cpv_utils.NO_CLIENT else params[2]
+                    _, offset = self.peer_state(identifier)
+                    start_at = float(params[4]) - (offset or 0.0)
+                    if self._claim_session(session_id, client_id):
+                        self._schedule_session(session_id, iterations, client_id, params[3], start_at=start_at)
                 else:
                     logger.info(f"[{self.identifier}] Received from {identifier}: {data}")
         except socket.error as e:
             logger.error(f"[{self.identifier}] Connection error with {identifier}: {e}")
         finally:
+            self._close_send_queue(connection)
             with self.lock:
                 connection.close()
-                self.connections.pop(identifier, None)
+                if self.connections.pop(identifier, None) is not None:
+                    self.verdict_cache.invalidate_topology()
                 logger.info(f"[{self.identifier}] Disconnected from peer {identifier}")
 
     def connect_to_peers(self):
@@ -205,11 +605,13 @@ class Server:
         try:
             outgoing_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             outgoing_socket.connect((peer_host, peer_port))
-            message = cpv_utils.construct_message(cpv_utils.HELLO, self.identifier)
+            lane = [self.lane] if self.lane is not None else []
+            message = cpv_utils.construct_message(cpv_utils.HELLO, self.identifier, *lane)
             outgoing_socket.sendall(message.encode())
             with self.lock:
                 if identifier not in self.connections:
                     self.connections[identifier] = {"incoming": None, "outgoing": outgoing_socket}
+                    self.verdict_cache.invalidate_topology()
                 else:
                     self.connections[identifier]["outgoing"] = outgoing_socket
 
@@ -220,23 +622,184 @@ class Server:
         except socket.error as e:
             logger.error(f"[{self.identifier}] Failed to connect to {identifier}: {e}")
 
-    def measure_delays(self, iterations):
+    def _start_session(self, session_id, iterations, client_id=None, tenant=None, deadline=None):
+        """
+        Starts a session on every verifier.
+
+        Sessions are admitted and queued by the coordinator (the aggregator) alone:
+        other verifiers pass the request on in a SESSION_REQUEST. When the session
+        leaves the coordinator's queue, it sends START_MEASUREMENTS, carrying the
+        requesting client and a common start time, to all peers (see _announce_session),
+        so every verifier's one-second barriers line up.
+
+        Args:
+            session_id (str): The session to measure.
+            iterations (int): Number of iterations.
+            client_id (str, optional): Client that requested the session and receives its
+                verdict; None for sessions started by an operator or the monitor.
+            tenant (str, optional): Tenant the session is accounted to; derived from the
+                client's address when omitted (see _tenant_of).
+            deadline (float, optional): Seconds from now by which the session must finish.
+
+        Returns:
+            bool: False if the session was not admitted or already started.
+        """
+        if tenant is None:
+            tenant = self._tenant_of(client_id)
+        if self.aggregator_id != self.identifier:
+            params = [session_id, iterations, client_id or cpv_utils.NO_CLIENT, tenant]
+            if deadline is not None:
+                params.append(deadline)
+            with self.lock:
+                sockets = self.connections.get(self.aggregator_id, {})
+                connection = sockets.get("outgoing") or sockets.get("incoming")
+            if connection is None or not self._send(
+                connection, cpv_utils.construct_message(cpv_utils.SESSION_REQUEST, *params), self.aggregator_id
+            ):
+                logger.warning(f"[{self.identifier}] Could not pass session {session_id} to {self.aggregator_id}")
+                if client_id is not None:
+                    self._send_rejected(client_id, session_id, "coordinator_unavailable")
+                return False
+            return True
+        if not self._claim_session(session_id, client_id):
+            with self.lock:
+                owner = self.scheduled_sessions.get(session_id)
+            if client_id is not None and owner != client_id:
+                self._send_rejected(client_id, session_id, "duplicate_session")
+            return False
+        return self._schedule_session(session_id, iterations, client_id, tenant, deadline)
+
+    def _tenant_of(self, client_id):
+        """
+        Returns the scheduler tenant of a client: its host address, so fairness does
+        not depend on anything the client claims about itself.
+        """
+        with self.lock:
+            address = self.client_addresses.get(client_id) if client_id is not None else None
+        if address is not None:
+            return address[0]
+        return client_id or self.identifier
+
+    def _announce_session(self, session_id, iterations, client_id, tenant):
+        """
+        Sends every peer the START_MEASUREMENTS of an admitted session.
+
+        Returns:
+            float: The common start time, far enough ahead for the slowest peer to
+            receive the message.
+        """
+        with self.lock:
+            peer_ids = list(self.connections)
+        rtts = [self.peer_state(peer_id)[0] for peer_id in peer_ids]
+        start_at = time.time() + START_LEAD + max((rtt for rtt in rtts if rtt is not None), default=0.0)
+        with self.lock:
+            message = cpv_utils.construct_message(
+                cpv_utils.START_MEASUREMENTS, session_id, iterations, client_id or cpv_utils.NO_CLIENT,
+                tenant, f"{start_at:.6f}"
+            )
+            for verifier_id, sockets in self.connections.items():
+                if sockets.get("outgoing"):
+                    self._send(sockets["outgoing"], message, verifier_id)
+        return start_at
+
+    def _claim_session(self, session_id, client_id):
+        """
+        Records a session as scheduled here, so one requested at several verifiers or
+        fanned out by several runs once.
+
+        Returns:
+            bool: False if the session was already scheduled.
+        """
+        with self.lock:
+            if session_id in self.scheduled_sessions:
+                return False
+            self.scheduled_sessions[session_id] = client_id
+            while len(self.scheduled_sessions) > MAX_SCHEDULED_SESSIONS:
+                self.scheduled_sessions.popitem(last=False)
+            if client_id is not None:
+                self.session_clients[session_id] = client_id
+            return True
+
+    def _schedule_session(self, session_id, iterations, client_id, tenant, deadline=None, start_at=None):
+        """
+        Submits a session to the scheduler.
+
+        Args:
+            session_id (str): The session to measure.
+            iterations (int): Number of iterations.
+            client_id (str): Client that requested the session, or None.
+            tenant (str): Tenant the session is accounted to.
+            deadline (float, optional): Seconds from now by which the session must finish.
+            start_at (float, optional): Start time set by the coordinator, on this
+                server's clock. When omitted this server is the coordinator and announces
+                the session to its peers once the session leaves the queue.
+
+        Returns:
+            bool: True if the session was accepted.
+        """
+        deadline = time.time() + deadline if deadline is not None else None
+
+        def run():
+            begin = start_at
+            if begin is None:
+                begin = self._announce_session(session_id, iterations, client_id, tenant)
+            self.session_id = session_id
+            self.result_sink.log_session(session_id, client_id, self.identifier)
+            self.measure_delays(iterations, begin)
+
+        return self.scheduler.submit(Job(session_id, tenant, iterations, run, deadline))
+
+    def _reject_session(self, job, reason):
+        """
+        Tells the requesting client that its session was not admitted.
+        """
+        with self.lock:
+            client_id = self.session_clients.pop(job.session_id, None)
+        if client_id is not None:
+            self._send_rejected(client_id, job.session_id, reason)
+
+    def _send_rejected(self, client_id, session_id, reason):
+        with self.lock:
+            client_conn = self.client_connections.get(client_id)
+            if client_conn is not None:
+                self._send(client_conn, cpv_utils.construct_message(cpv_utils.REJECTED, session_id, reason), client_id)
+
+    def measure_delays(self, iterations, start_at=None):
         """
         Measures delays using mp and av protocols over a given number of iterations.
+
+        Args:
+            iterations (int): Number of iterations.
+            start_at (float, optional): Time the first iteration starts; iteration k then
+                starts ITERATION_PERIOD * (k - 1) seconds later, or right away if the
+                previous one overran, so the verifiers' barriers stay aligned.
         """
+        session_id = self.session_id
+        with self.lock:
+            self.measurements.start_session(session_id, iterations)
+            client_id = self.session_clients.get(session_id)
+            self.session_progress[session_id] = {"iteration": 0, "iterations": iterations, "client_id": client_id}
         for iteration in range(1, iterations + 1):
+            if start_at is not None:
+                wait = start_at + (iteration - 1) * ITERATION_PERIOD - time.time()
+                if wait > 0:
+                    time.sleep(wait)
             logger.info(f"[{self.identifier}] Starting iteration {iteration}/{iterations}")
             # Run mp protocol
             self.mp_protocol(iteration)
             # Run av protocol
             self.av_protocol(iteration)
+            # Stream this verifier's view of the iteration to the aggregator
+            self._report_iteration_result(iteration)
             logger.info(f"[{self.identifier}] Iteration {iteration}/{iterations} completed.")
-            # Reset data structures for next iteration
-            self.dic_dcj_sums.clear()
-            self.min_sums.clear()
-            self.verifier_measurements.clear()
-            self.av_delays.clear()
+            # Reset forwarding state for next iteration
             self.forwarded_timestamps.clear()
+            with self.lock:
+                self.client_eij.clear()
+                self.session_progress[session_id]["iteration"] = iteration
+        with self.lock:
+            self.session_progress.pop(session_id, None)
+            self.session_clients.pop(session_id, None)
 
     def mp_protocol(self, iteration):
         """
@@ -245,108 +808,221 @@ class Server:
         # Step 1: Send timestamp to client
         self._send_timestamp_to_client(iteration)
         # Wait for timestamps to propagate
-        time.sleep(1)
+        with self.tracer.span("mp_barrier", session=self.session_id, iteration=iteration):
+            time.sleep(1)
         # Step 2: Compute min(dic + dcj, djc + dci)
         self._compute_min_sums(iteration)
         # Store delays
-        self._store_mp_delays(iteration)
+        with self.tracer.span("store", session=self.session_id, iteration=iteration, protocol="mp"):
+            self._store_mp_delays(iteration)
 
-    def _send_timestamp_to_client(self, iteration):
+    def _session_owner(self):
         """
-        Sends the current timestamp to the client.
+        Returns the client whose timestamps the current session measures, or None when
+        any connected client takes part (monitoring rounds, operator sessions).
+        Called with the lock held.
+        """
+        if self.session_id is None or self.session_id.startswith(MONITOR_PREFIX):
+            return None
+        return self.session_clients.get(self.session_id)
+
+    def _probed_clients(self):
+        """
+        Returns the clients the current session sends TIMESTAMP probes to: only the
+        client that requested it, so concurrent clients cannot feed its measurements.
         """
-        current_time = time.time()
-        message = cpv_utils.construct_message(
-            cpv_utils.TIMESTAMP, self.identifier, current_time, iteration
-        )
         with self.lock:
-            for client_id, client_conn in self.client_connections.items():
-                try:
-                    client_conn.sendall(message.encode())
+            owner = self._session_owner()
+            if owner is not None:
+                return [owner] if owner in self.client_connections else []
+            return list(self.client_connections)
+
+    def _send_timestamp_to_client(self, iteration):
+        """
+        Sends the current timestamp to the session's client.
+        """
+        client_ids = self._probed_clients()
+        if self.pacer is not None:
+            for client_id in client_ids:
+                self.pacer.call(client_id, self._send_timestamp, client_id, iteration)
+            return
+        def build(send_time):
+            return cpv_utils.construct_message(cpv_utils.TIMESTAMP, self.identifier, send_time, iteration)
+
+        with self.tracer.span("send_timestamp", session=self.session_id, iteration=iteration), \
+                traced_lock(self.tracer, self.lock, session=self.session_id, iteration=iteration):
+            for client_id in client_ids:
+                client_conn = self.client_connections.get(client_id)
+                if client_conn is not None and self._send_stamped(client_conn, build, client_id):
                     logger.info(f"[{self.identifier}] Sent timestamp to client {client_id}")
-                except socket.error as e:
-                    logger.error(f"[{self.identifier}] Error sending timestamp to {client_id}: {e}")
 
-    def _handle_timestamp_from_client(self, sender_id, timestamp, iteration):
+    def _send_timestamp(self, client_id, iteration):
+        """
+        Sends one client a TIMESTAMP (used when pacing).
+        """
+        def build(send_time):
+            return cpv_utils.construct_message(cpv_utils.TIMESTAMP, self.identifier, send_time, iteration)
+
+        with self.lock:
+            client_conn = self.client_connections.get(client_id)
+            if client_conn is not None and self._send_stamped(client_conn, build, client_id):
+                logger.info(f"[{self.identifier}] Sent timestamp to client {client_id}")
+
+    def _paced(self, link, function, *args):
+        """
+        Calls function(*args) now, or when the pacer allows a probe on `link`.
+        """
+        if self.pacer is None:
+            function(*args)
+        else:
+            self.pacer.call(link, function, *args)
+
+    def probe_load_report(self):
+        """
+        Returns the pacer's estimate of RTT inflation caused by probing, per link.
+        """
+        return self.pacer.estimator.report() if self.pacer is not None else None
+
+    def _handle_timestamp_from_client(self, sender_id, timestamp, iteration, dwell=None, client_id=None):
         """
         Handles a timestamp forwarded by the client from another verifier.
+
+        Args:
+            dwell (float, optional): Seconds the client held the timestamp before forwarding it.
+            client_id (str, optional): The forwarding client. Outside monitoring rounds,
+                forwards from any client but the session's are ignored.
         """
         receive_time = time.time()
         dic_dcj = receive_time - timestamp
-        key = (sender_id, self.identifier, iteration)
+        if dwell is not None and self.compensate_dwell:
+            dic_dcj -= dwell
+        with self.tracer.span("receive_compute", session=self.session_id, iteration=iteration, peer=sender_id), \
+                traced_lock(self.tracer, self.lock, session=self.session_id, iteration=iteration, peer=sender_id):
+            if self.session_id not in self.session_progress:
+                logger.warning(f"[{self.identifier}] Ignoring timestamp from {sender_id}: no session in progress")
+                return
+            owner = self._session_owner()
+            if client_id is not None and owner is not None and client_id != owner:
+                logger.warning(
+                    f"[{self.identifier}] Ignoring timestamp forwarded by {client_id} for session {self.session_id} of {owner}"
+                )
+                return
+            if not self.measurements.record_dic_dcj(sender_id, self.identifier, iteration, dic_dcj):
+                logger.warning(f"[{self.identifier}] Ignoring timestamp from {sender_id} for iteration {iteration}")
+                return
+            if client_id is not None and self.session_id and self.session_id.startswith(MONITOR_PREFIX):
+                self.client_eij.setdefault(client_id, {})[sender_id] = dic_dcj
+            if dwell is not None and client_id is not None:
+                self.client_dwell.setdefault(client_id, RunningStats()).add(dwell)
+        if client_id is not None:
+            self.relay_detector.add_sample(client_id, sender_id, dic_dcj)
+        dwell_note = f", client dwell = {dwell:.6f}" if dwell is not None else ""
+        logger.info(f"[{self.identifier}] Received timestamp from {sender_id}, dic + dcj = {dic_dcj:.6f}{dwell_note}")
+
+    def _score_aggregated_round(self, session_id, client_id, iteration, e, dv, xi):
+        """
+        Feeds a round completed by the aggregator, which holds both directions of every
+        pair, to the relay detector. Rounds of sessions no client requested are skipped.
+
+        Each eij is measured on verifier j's clock against verifier i's timestamp, so
+        the clock offsets of the verifiers (relative to this one) are passed along to
+        keep them out of the asymmetry.
+        """
+        if client_id is not None:
+            with self.lock:
+                offsets = {
+                    position: self.clock_offsets.get(verifier_id, 0.0) if verifier_id != self.identifier else 0.0
+                    for position, verifier_id in enumerate(self.aggregator.verifier_ids, start=1)
+                }
+            self.relay_detector.add_round(client_id, e, dv, offsets)
+
+    def relay_scores(self, client_id=None):
+        """
+        Returns the relay/proxy scores of one client, or of every client when omitted.
+        """
+        if client_id is not None:
+            return self.relay_detector.scores(client_id)
+        return self.relay_detector.report()
+
+    def dwell_stats(self):
+        """
+        Returns the forwarding dwell statistics (seconds) of each client.
+        """
         with self.lock:
-            self.dic_dcj_sums[key] = dic_dcj
-        logger.info(f"[{self.identifier}] Received timestamp from {sender_id}, dic + dcj = {dic_dcj:.6f}")
+            return {client_id: stats.to_dict() for client_id, stats in self.client_dwell.items()}
 
     def _compute_min_sums(self, iteration):
         """
         Computes min(dic + dcj, djc + dci) for all pairs.
         """
         with self.lock:
-            server_ids = set([self.identifier] + list(self.peers.keys()))
-            for i in server_ids:
-                for j in server_ids:
-                    if i != j:
-                        key1 = (i, j, iteration)
-                        key2 = (j, i, iteration)
-                        dic_dcj = self.dic_dcj_sums.get(key1)
-                        djc_dci = self.dic_dcj_sums.get(key2)
-                        if dic_dcj is not None and djc_dci is not None:
-                            min_sum = min(dic_dcj, djc_dci)
-                            self.min_sums[(i, j)] = min_sum
-                            logger.info(f"[{self.identifier}] min(dic + dcj, djc + dci) for ({i}, {j}): {min_sum:.6f}")
+            pairs = self.measurements.compute_min_sums(iteration)
+        logger.info(f"[{self.identifier}] Computed min(dic + dcj, djc + dci) for {pairs} pairs in iteration {iteration}")
 
     def _store_mp_delays(self, iteration):
         """
-        Stores the min(dic + dcj, djc + dci) values calculated from the mp protocol.
+        Stores the dic + dcj sums this verifier received in the mp protocol.
+
+        Only the eij with j == this verifier are measured here, so min(eij, eji)
+        needs the other verifiers' logs; it is computed when they are combined.
         """
-        data = {'min_sums': {f"{k[0]}_{k[1]}": v for k, v in self.min_sums.items()}}
-        cpv_utils.log_delays(
-            self.delays_mp_file, self.session_id, iteration, data, self.lock
-        )
+        with self.lock:
+            data = {'dic_dcj': self.measurements.dic_dcj_pairs(iteration)}
+            client_id = self.session_clients.get(self.session_id)
+        self.result_sink.log_mp(self.session_id, iteration, data, client_id, self.identifier)
 
     def av_protocol(self, iteration):
         """
         Implements the av protocol for delay measurement.
         """
         # Measure RTTs with other verifiers
-        for verifier_id, sockets in self.connections.items():
+        for verifier_id, sockets in list(self.connections.items()):
             if sockets.get("outgoing"):
-                self._measure_rtt_with_verifier(verifier_id, sockets["outgoing"], iteration)
+                self._paced(verifier_id, self._measure_rtt_with_verifier, verifier_id, sockets["outgoing"], iteration)
         # Wait for RTT measurements
-        time.sleep(1)
+        with self.tracer.span("av_barrier", session=self.session_id, iteration=iteration):
+            time.sleep(1)
         # Delays are computed upon receiving responses
-        self._store_av_delays(iteration)
+        with self.tracer.span("store", session=self.session_id, iteration=iteration, protocol="av"):
+            self._store_av_delays(iteration)
 
     def _measure_rtt_with_verifier(self, verifier_id, verifier_conn, iteration):
         """
         Measures RTT with another verifier.
         """
-        try:
-            send_time = time.time()
-            message = cpv_utils.construct_message(
-                cpv_utils.RTT_MEASUREMENT_REQUEST, self.identifier, send_time, iteration
-            )
-            verifier_conn.sendall(message.encode())
+        def build(send_time):
+            return cpv_utils.construct_message(cpv_utils.RTT_MEASUREMENT_REQUEST, self.identifier, send_time, iteration)
+
+        def on_send(send_time):
             # Store send_time
-            key = (verifier_id, iteration)
             with self.lock:
-                self.verifier_measurements[key] = {'send_time': send_time}
-        except socket.error as e:
-            logger.error(f"[{self.identifier}] Error measuring RTT with {verifier_id}: {e}")
+                self.measurements.record_rtt_send(verifier_id, iteration, send_time)
+            if self.pacer is not None:
+                self.pacer.estimator.on_send(send_time)
+
+        if not self._send_stamped(verifier_conn, build, verifier_id, on_send):
+            logger.error(f"[{self.identifier}] Could not queue RTT measurement to {verifier_id}")
 
     def _handle_rtt_response(self, responder_id, response_time, iteration):
         """
         Handles RTT measurement response from another verifier.
         """
         receive_time = time.time()
-        key = (responder_id, iteration)
         with self.lock:
-            send_time = self.verifier_measurements.get(key, {}).get('send_time')
+            send_time = self.measurements.rtt_send_time(responder_id, iteration)
             if send_time:
                 rtt = receive_time - send_time
                 delay = rtt / 2
-                self.av_delays[key] = delay
+                self.measurements.record_av_delay(responder_id, iteration, delay)
+                self.peer_rtts[responder_id] = rtt
+                # Cristian's estimate: the response was stamped half an RTT before it arrived
+                self.clock_offsets[responder_id] = response_time - (send_time + delay)
+                self.tracer.record(
+                    "rtt_probe", send_time, receive_time,
+                    session=self.session_id, iteration=iteration, peer=responder_id
+                )
+                if self.pacer is not None:
+                    self.pacer.estimator.record(responder_id, rtt, send_time)
                 logger.info(f"[{self.identifier}] RTT with {responder_id}: {rtt:.6f}, delay: {delay:.6f}")
             else:
                 logger.warning(f"[{self.identifier}] Missing send_time for RTT with {responder_id}")
@@ -356,11 +1032,263 @@ class Server:
         Stores the delays calculated from the av protocol.
         """
         with self.lock:
-            delays = {k[0]: v for k, v in self.av_delays.items() if k[1] == iteration}
+            delays = self.measurements.av_delays_dict(iteration)
         data = {'delays': delays}
-        cpv_utils.log_delays(
-            self.delays_av_file, self.session_id, iteration, data, self.lock
+        with self.lock:
+            client_id = self.session_clients.get(self.session_id)
+        self.result_sink.log_av(self.session_id, iteration, data, client_id, self.identifier)
+
+    def _report_iteration_result(self, iteration):
+        """
+        Sends the dic + dcj sums received by this verifier and its av delays for one
+        iteration to the aggregator, in a single ITERATION_RESULT message.
+        """
+        if self.session_id.startswith(MONITOR_PREFIX):
+            self._report_monitor_results(iteration)
+            return
+        with self.lock:
+            eij = {i: v for (i, j), v in self.measurements.dic_dcj_dict(iteration).items() if j == self.identifier}
+            delays = self.measurements.av_delays_dict(iteration)
+            client_id = self.session_clients.get(self.session_id) or cpv_utils.NO_CLIENT
+            iterations = self.session_progress.get(self.session_id, {}).get("iterations", iteration)
+        params = [self.identifier, self.session_id, iteration, iterations, client_id]
+        params += cpv_utils.encode_owds(eij, "e:") + cpv_utils.encode_owds(delays, "v:")
+        if self.aggregator is not None:
+            self._handle_iteration_result([str(p) for p in params])
+            return
+        message = cpv_utils.construct_message(cpv_utils.ITERATION_RESULT, *params)
+        with self.lock:
+            sockets = self.connections.get(self.aggregator_id, {})
+            connection = sockets.get("outgoing") or sockets.get("incoming")
+            if connection is None:
+                logger.warning(f"[{self.identifier}] Not connected to aggregator {self.aggregator_id}")
+                return
+            self._send(connection, message, self.aggregator_id)
+
+    def _handle_iteration_result(self, params):
+        """
+        Adds a verifier's ITERATION_RESULT to the aggregator and publishes the verdict
+        once every verifier has reported the session's last iteration. Earlier
+        iterations only update the aggregator, so no partial verdict is sent or cached.
+        """
+        if self.aggregator is None:
+            logger.warning(f"[{self.identifier}] Received iteration result but {self.aggregator_id} is the aggregator")
+            return
+        sender_id, session_id, iteration, iterations = params[0], params[1], int(params[2]), int(params[3])
+        client_id = None if params[4] == cpv_utils.NO_CLIENT else params[4]
+        verdict = self.aggregator.add_result(
+            session_id, iteration, sender_id,
+            cpv_utils.decode_owds(params[5:], "e:"), cpv_utils.decode_owds(params[5:], "v:"), client_id, iterations
+        )
+        if verdict is not None and verdict["final"]:
+            self._publish_verdict(verdict)
+
+    def _start_monitoring(self, client_id, session_id):
+        """
+        Adds a client to continuous monitoring and starts the probing rounds if needed.
+
+        Only the aggregator keeps monitoring state; other verifiers take part in the
+        rounds it starts.
+        """
+        if self.monitor is None:
+            logger.debug(f"[{self.identifier}] Monitoring of {client_id} is handled by {self.aggregator_id}")
+            return
+        with self.lock:
+            self.session_clients[session_id] = client_id
+        self.monitor.add_client(client_id, session_id)
+        with self.lock:
+            if self.monitor_thread is None or not self.monitor_thread.is_alive():
+                self.monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
+                self.monitor_thread.start()
+
+    def _monitor_loop(self):
+        """
+        Starts one shared single-iteration round every monitor_interval seconds while
+        any client is monitored. A round probes every connected client at once, so the
+        probing cost per client is fixed.
+        """
+        while self.running and self.monitor.client_ids():
+            # Fits the 36 bytes result rings keep per session id, like a plain UUID
+            round_id = f"{MONITOR_PREFIX}{uuid.uuid4().hex[:36 - len(MONITOR_PREFIX)]}"
+            self._start_session(round_id, 1, tenant=MONITOR_TENANT)
+            time.sleep(self.monitor_interval)
+
+    def _report_monitor_results(self, iteration):
+        """
+        Sends the aggregator one MONITOR_RESULT per client probed in a monitoring round.
+        """
+        with self.lock:
+            client_eij = {client_id: dict(eij) for client_id, eij in self.client_eij.items()}
+            delays = self.measurements.av_delays_dict(iteration)
+            sockets = self.connections.get(self.aggregator_id, {})
+            connection = sockets.get("outgoing") or sockets.get("incoming")
+        for client_id, eij in client_eij.items():
+            params = [self.identifier, self.session_id, client_id]
+            params += cpv_utils.encode_owds(eij, "e:") + cpv_utils.encode_owds(delays, "v:")
+            if self.monitor is not None:
+                self._handle_monitor_result([str(p) for p in params])
+            elif connection is not None:
+                self._send(connection, cpv_utils.construct_message(cpv_utils.MONITOR_RESULT, *params), self.aggregator_id)
+
+    def _handle_monitor_result(self, params):
+        """
+        Updates a monitored client's sliding window and publishes its new verdict.
+        """
+        if self.monitor is None:
+            return
+        sender_id, round_id, client_id = params[0], params[1], params[2]
+        verdict = self.monitor.add_result(
+            round_id, client_id, sender_id,
+            cpv_utils.decode_owds(params[3:], "e:"), cpv_utils.decode_owds(params[3:], "v:")
+        )
+        if verdict is not None:
+            self._publish_verdict(verdict)
+
+    def _publish_verdict(self, verdict):
+        """
+        Records a verdict and sends it to, and caches it for, the client that requested
+        the session. Verdicts of sessions no client requested are only recorded.
+
+        The verdict is also sent to every peer, so each verifier's cache answers the
+        client's next START_MEASUREMENTS the same way.
+        """
+        session_id = verdict["session_id"]
+        client_id = verdict["client_id"]
+        self.result_sink.log_verdict(session_id, client_id, verdict["inside"], verdict["confidence"], verdict["owds"])
+        if client_id is None:
+            logger.info(f"[{self.identifier}] Session {session_id}: inside={verdict['inside']} (no client to notify)")
+            return
+        self.record_verdict(client_id, verdict["inside"], verdict["owds"], verdict["confidence"], session_id)
+        message = cpv_utils.construct_message(
+            cpv_utils.VERDICT, client_id, session_id, int(verdict["inside"]), verdict["confidence"],
+            *cpv_utils.encode_owds(verdict["owds"])
+        )
+        with self.lock:
+            for verifier_id, sockets in self.connections.items():
+                connection = sockets.get("outgoing") or sockets.get("incoming")
+                if connection is not None:
+                    self._send(connection, message, verifier_id)
+            client_conn = self.client_connections.get(client_id)
+            if client_conn is None:
+                logger.warning(f"[{self.identifier}] Client {client_id} of session {session_id} is not connected")
+                return
+            self._send(client_conn, message, client_id)
+
+    def record_verdict(self, client_id, inside, owds, confidence, session_id=None):
+        """
+        Caches the verdict of a completed session so repeat requests skip measurement.
+
+        Args:
+            client_id (str): Identifier of the verified client.
+            inside (bool): True if the client was found within the verifier triangle.
+            owds (dict): Estimated OWDs from each verifier identifier to the client.
+            confidence (float): Confidence of the verdict in [0, 1].
+            session_id (str, optional): Session that produced the verdict.
+        """
+        with self.lock:
+            address = self.client_addresses.get(client_id)
+        if address is None:
+            logger.warning(f"[{self.identifier}] No address known for client {client_id}; verdict not cached")
+            return None
+        verdict = Verdict(client_id, inside, owds, confidence, session_id or self.session_id)
+        self.verdict_cache.put(client_id, address, verdict)
+        return verdict
+
+    def _send_cached_verdict(self, client_id, session_id):
+        """
+        Answers a client's START_MEASUREMENTS from the verdict cache.
+
+        Returns:
+            bool: True if a cached verdict was sent and no measurement is needed.
+        """
+        with self.lock:
+            address = self.client_addresses.get(client_id)
+            client_conn = self.client_connections.get(client_id)
+        if address is None or client_conn is None:
+            return False
+        verdict = self.verdict_cache.get(client_id, address)
+        if verdict is None:
+            return False
+        message = cpv_utils.construct_message(
+            cpv_utils.VERDICT, client_id, session_id, int(verdict.inside), verdict.confidence,
+            *cpv_utils.encode_owds(verdict.owds)
         )
+        if not self._send(client_conn, message, client_id):
+            logger.error(f"[{self.identifier}] Could not queue cached verdict to {client_id}")
+            return False
+        logger.info(f"[{self.identifier}] Served cached verdict to client {client_id} (session {verdict.session_id})")
+        return True
+
+    def peer_state(self, peer_id):
+        """
+        Returns the latest (rtt, clock_offset) known for a peer verifier.
+
+        Uses the values measured by this server, and, when running as a sharded worker
+        that has not probed the peer yet, the supervisor's shared mesh state. Missing
+        values are None.
+        """
+        with self.lock:
+            state = self.peer_rtts.get(peer_id), self.clock_offsets.get(peer_id)
+        if state[0] is None and self.mesh_state is not None:
+            return self.mesh_state.read(peer_id) or state
+        return state
+
+    def _send(self, connection, message, name=None, size=None):
+        """
+        Queues a message on the connection's bounded outbound queue without blocking.
+
+        `message` may also be a callable returning the encoded message, rendered right
+        before it is sent; `size` then estimates its length (see SendQueue.send).
+
+        Returns:
+            bool: False if the message was dropped by the slow-consumer policy.
+        """
+        with self.send_queues_lock:
+            queue = self.send_queues.get(connection)
+            if queue is None:
+                queue = SendQueue(
+                    connection, name or str(connection.fileno()), self.send_queue_bytes,
+                    self.send_queue_messages, self.slow_consumer_policy
+                )
+                self.send_queues[connection] = queue
+        if callable(message):
+            return queue.send(message, size)
+        return queue.send(message.encode())
+
+    def _send_stamped(self, connection, build, name=None, on_send=None):
+        """
+        Queues a probe whose send time is stamped by the connection's writer right
+        before sendall, as the client stamps its dwell, so time spent waiting in the
+        outbound queue is not measured as network delay.
+
+        Args:
+            build (callable): Returns the message for a given send time.
+            on_send (callable, optional): Called with the send time once it is stamped.
+        """
+        def render():
+            send_time = time.time()
+            if on_send is not None:
+                on_send(send_time)
+            return build(send_time).encode()
+
+        return self._send(connection, render, name, len(build(time.time())))
+
+    def _close_send_queue(self, connection):
+        """
+        Stops and forgets the outbound queue of a closed connection.
+        """
+        with self.send_queues_lock:
+            queue = self.send_queues.pop(connection, None)
+        if queue is not None:
+            queue.close()
+
+    def send_queue_metrics(self):
+        """
+        Returns the depth and counters of every connection's outbound queue.
+        """
+        with self.send_queues_lock:
+            queues = list(self.send_queues.values())
+        return [queue.metrics() for queue in queues]
 
     def list_connections(self):
         """
@@ -379,7 +1307,16 @@ class Server:
         Gracefully shuts down the server, closing all connections and notifying peers.
         """
         logger.info(f"[{self.identifier}] Shutting down...")
+        if self.checkpoint is not None:
+            self.checkpoint.stop()
         self.running = False
+        if self.pacer is not None:
+            self.pacer.close()
+        with self.send_queues_lock:
+            queues = list(self.send_queues.values())
+            self.send_queues.clear()
+        for queue in queues:
+            queue.close()
         with self.lock:
             for identifier, sockets in list(self.connections.items()):
                 for conn_type, conn in sockets.items():
@@ -389,7 +1326,14 @@ class Server:
             for client_id, connection in list(self.client_connections.items()):
                 connection.close()
                 self.client_connections.pop(client_id, None)
-            self.socket.close()
+            if self.socket is not None:
+                try:
+                    # Wakes the listener blocked in accept so the port is released right away
+                    self.socket.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                self.socket.close()
+        self.result_sink.close()
 
     def command_loop(self):
         """
@@ -402,33 +1346,22 @@ class Server:
             elif command == "connect":
                 self.connect_to_peers()
             elif command == "measure_delays":
-                self.session_id = str(uuid.uuid4())  # New session ID
+                session_id = str(uuid.uuid4())  # New session ID
                 iterations = 10  # Number of iterations
-                self._broadcast_start_measurements(iterations)
+                self._broadcast_start_measurements(session_id, iterations)
             elif command == "close":
                 self.shutdown()
                 break
             else:
                 logger.info("Available commands: list, connect, measure_delays, close")
 
-    def _broadcast_start_measurements(self, iterations):
+    def _broadcast_start_measurements(self, session_id, iterations):
         """
-        Sends a message to all connected entities to start measurements.
+        Starts a session on every verifier, this one included, and tells the connected
+        clients about it.
         """
-        message = cpv_utils.construct_message(
-            cpv_utils.START_MEASUREMENTS, self.session_id, iterations
-        )
+        message = cpv_utils.construct_message(cpv_utils.START_MEASUREMENTS, session_id, iterations)
         with self.lock:
-            # Send to other verifiers
-            for verifier_id, sockets in self.connections.items():
-                if sockets.get("outgoing"):
-                    try:
-                        sockets["outgoing"].sendall(message.encode())
-                    except socket.error as e:
-                        logger.error(f"[{self.identifier}] Error sending start message to {verifier_id}: {e}")
-            # Send to clients
             for client_id, client_conn in self.client_connections.items():
-                try:
-                    client_conn.sendall(message.encode())
-                except socket.error as e:
-                    logger.error(f"[{self.identifier}] Error sending start message to client {client_id}: {e}")
+                self._send(client_conn, message, client_id)
+        self._start_session(session_id, iterations)
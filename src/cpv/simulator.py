@@ -0,0 +1,358 @@
+# simulator.py
+
+import argparse
+import heapq
+import itertools
+import json
+import time
+import numpy as np
+from . import cpv
+from .aggregator import VerdictAggregator
+from .analysis import load_rtt_logs
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Measurement messages per iteration and verifier triangle: 3 TIMESTAMP, 6 FORWARD_TIMESTAMP,
+# 6 RTT_MEASUREMENT_REQUEST and 6 RTT_MEASUREMENT_RESPONSE
+PROBES_PER_ITERATION = 21
+
+
+class EmpiricalDelay:
+    """
+    One-way delay distribution of a link, sampled from recorded values.
+    """
+    __slots__ = ("samples",)
+
+    def __init__(self, samples):
+        self.samples = np.sort(np.asarray(samples, dtype=np.float64))
+
+    def sample(self, rng, size=None):
+        return self.samples[rng.integers(0, len(self.samples), size)]
+
+
+class LinkModel:
+    def __init__(self, local_delay=0.0005):
+        """
+        Empirical one-way delays between sites, assumed symmetric (half the RTT).
+
+        Site names are case-insensitive. A site's link to itself (a client co-located
+        with a verifier) has the constant `local_delay`.
+
+        Args:
+            local_delay (float): One-way delay in seconds within a site.
+        """
+        self.local = EmpiricalDelay([local_delay])
+        self.links = {}  # frozenset of lowercase site names -> EmpiricalDelay
+
+    @classmethod
+    def from_rtt_logs(cls, filenames, source_map=None, verifier_map=None, processes=None, **kwargs):
+        """
+        Builds the model from RTT logs (tests/*.txt); each log's source is the site it
+        was recorded at. Logs measuring the same pair of sites are pooled.
+
+        Args:
+            filenames (list): RTT logs.
+            source_map (dict, optional): Site of each log source, e.g. {"BLR-jorhat-blr-mumbai": "Bangalore"}.
+            verifier_map (dict, optional): Site of each verifier, e.g. {"server2": "Delhi"}.
+            processes (int, optional): Parser processes (see analysis.load_rtt_logs).
+        """
+        source_map = source_map or {}
+        model = cls(**kwargs)
+        for (source, verifier), rtts in load_rtt_logs(filenames, processes=processes, verifier_map=verifier_map).items():
+            model.add(source_map.get(source, source), verifier, rtts / 2)
+        return model
+
+    def add(self, a, b, owds):
+        key = frozenset((a.lower(), b.lower()))
+        existing = self.links.get(key)
+        if existing is not None:
+            owds = np.concatenate([existing.samples, owds])
+        self.links[key] = EmpiricalDelay(owds)
+
+    def delay(self, a, b):
+        if a.lower() == b.lower():
+            return self.local
+        try:
+            return self.links[frozenset((a.lower(), b.lower()))]
+        except KeyError:
+            raise KeyError(f"No delay samples between {a} and {b}") from None
+
+    def sites(self):
+        return sorted({site for key in self.links for site in key})
+
+
+class EventLoop:
+    """
+    Virtual clock and event queue; handlers run in timestamp order and may schedule more.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.queue = []
+        self.sequence = itertools.count()  # Keeps simultaneous events in scheduling order
+
+    def schedule(self, delay, handler, *args):
+        heapq.heappush(self.queue, (self.now + delay, next(self.sequence), handler, args))
+
+    def run(self):
+        while self.queue:
+            self.now, _, handler, args = heapq.heappop(self.queue)
+            handler(*args)
+
+
+class Simulator:
+    def __init__(self, links, verifiers, iterations=3, barrier=1.0, forward_dwell=0.0, service_time=0.0, seed=None):
+        """
+        Simulates measurement sessions of a candidate verifier triangle without sockets.
+
+        A session follows the Server/Client message flow: in each iteration every
+        verifier sends a TIMESTAMP to the client, which forwards it to the other two
+        verifiers (mp), then every verifier probes its peers (av); both phases end at
+        a `barrier` like Server.mp_protocol and Server.av_protocol, and samples arriving
+        later are lost. Each verifier then reports to the aggregator (the first
+        verifier), whose per-iteration triangle test and majority verdict are used
+        unchanged.
+
+        Args:
+            links (LinkModel): Delay distributions between sites.
+            verifiers (list): Sites of the three verifiers, in triangle order.
+            iterations (int): Iterations per session.
+            barrier (float): Seconds each of the mp and av phases lasts.
+            forward_dwell (float): Seconds the client holds a timestamp before forwarding it.
+            service_time (float): Verifier CPU seconds per message, to size capacity in
+                run_events; run_bulk assumes unloaded verifiers.
+            seed (int, optional): Random seed.
+        """
+        self.links = links
+        self.verifiers = list(verifiers)
+        self.iterations = iterations
+        self.barrier = barrier
+        self.forward_dwell = forward_dwell
+        self.service_time = service_time
+        self.rng = np.random.default_rng(seed)
+        for a, b in itertools.combinations(self.verifiers, 2):
+            links.delay(a, b)
+
+    def run_events(self, clients, sessions, rate=100.0):
+        """
+        Simulates sessions event by event, with Poisson arrivals and queueing at the verifiers.
+
+        Args:
+            clients (dict): Client site -> expected verdict (True if inside the triangle).
+            sessions (int): Sessions to simulate, spread evenly over the client sites.
+            rate (float): Session arrivals per second of virtual time.
+
+        Returns:
+            dict: Report as described in _report, plus per-verifier utilization.
+        """
+        started = time.perf_counter()
+        loop = EventLoop()
+        # Every session's rounds may be open at once under load
+        aggregator = VerdictAggregator(
+            self.verifiers, max_sessions=max(sessions, 1), max_pending_rounds=max(sessions * self.iterations, 1)
+        )
+        busy = {v: 0.0 for v in self.verifiers}  # Time each verifier's CPU is free again
+        work = {v: 0.0 for v in self.verifiers}
+        outcomes = []
+        probes = [0]
+        sites = list(clients)
+        b = self.barrier
+        owd = self.links.delay
+
+        def on_verifier(verifier, handler, *args):
+            # Messages wait for the verifier's CPU; each one costs service_time
+            start = max(loop.now, busy[verifier])
+            busy[verifier] = start + self.service_time
+            work[verifier] += self.service_time
+            loop.schedule(start + self.service_time - loop.now, handler, *args)
+
+        def send(source, destination, handler, *args):
+            probes[0] += 1
+            loop.schedule(float(owd(source, destination).sample(self.rng)), on_verifier, destination, handler, *args)
+
+        def start_session(s, site, t0):
+            state = {
+                k: {v: ({}, {}) for v in self.verifiers} for k in range(1, self.iterations + 1)
+            }
+            for k in range(1, self.iterations + 1):
+                mp_start = t0 + (k - 1) * 2 * b
+                for i in self.verifiers:
+                    loop.schedule(mp_start - loop.now, on_verifier, i, send_timestamp, s, site, i, k, mp_start, state)
+                    loop.schedule(mp_start + b - loop.now, on_verifier, i, send_rtt_requests, i, k, mp_start, state)
+                    loop.schedule(mp_start + 2 * b - loop.now, send_result, s, site, i, k, t0, state)
+
+        def send_timestamp(s, site, i, k, mp_start, state):
+            probes[0] += 1
+            delay = float(owd(i, site).sample(self.rng))
+            loop.schedule(delay + self.forward_dwell, forward, site, i, loop.now, k, mp_start, state)
+
+        def forward(site, i, timestamp, k, mp_start, state):
+            for j in self.verifiers:
+                if j != i:
+                    send(site, j, record_timestamp, i, j, timestamp, k, mp_start, state)
+
+        def record_timestamp(i, j, timestamp, k, mp_start, state):
+            if loop.now <= mp_start + b:
+                state[k][j][0][i] = loop.now - timestamp
+
+        def send_rtt_requests(i, k, mp_start, state):
+            for j in self.verifiers:
+                if j != i:
+                    send(i, j, respond, i, j, loop.now, k, mp_start, state)
+
+        def respond(i, j, send_time, k, mp_start, state):
+            send(j, i, record_rtt, i, j, send_time, k, mp_start, state)
+
+        def record_rtt(i, j, send_time, k, mp_start, state):
+            if loop.now <= mp_start + 2 * b:
+                state[k][i][1][j] = (loop.now - send_time) / 2
+
+        def send_result(s, site, j, k, t0, state):
+            eij, delays = state[k][j]
+            delay = float(owd(j, self.verifiers[0]).sample(self.rng))
+            loop.schedule(delay, aggregate, s, site, j, k, t0, eij, delays)
+
+        def aggregate(s, site, j, k, t0, eij, delays):
+            result = aggregator.add_result(s, k, j, eij, delays)
+            if result is not None and k == self.iterations:
+                outcomes.append((site, result["inside"], loop.now - t0))
+
+        arrivals = np.cumsum(self.rng.exponential(1.0 / rate, sessions))
+        for s, t0 in enumerate(arrivals):
+            loop.schedule(float(t0), start_session, str(s), sites[s % len(sites)], float(t0))
+        loop.run()
+
+        report = self._report(
+            "events", clients,
+            np.array([site for site, _, _ in outcomes], dtype=object),
+            np.array([inside for _, inside, _ in outcomes], dtype=bool),
+            np.array([duration for _, _, duration in outcomes]),
+            probes[0] / len(outcomes) if outcomes else float("nan"),
+            time.perf_counter() - started,
+        )
+        report["virtual_seconds"] = loop.now
+        report["utilization"] = {v: work[v] / loop.now if loop.now else 0.0 for v in self.verifiers}
+        return report
+
+    def run_bulk(self, clients, sessions, chunk_sessions=100000):
+        """
+        Simulates sessions as arrays, one chunk of sessions per client site at a time.
+
+        Samples the same message delays as run_events and applies the same barriers,
+        per-iteration triangle test (cpv's vectorized variants) and majority vote,
+        without verifier queueing.
+
+        Args:
+            clients (dict): Client site -> expected verdict (True if inside the triangle).
+            sessions (int): Sessions to simulate, spread evenly over the client sites.
+            chunk_sessions (int): Sessions sampled per array operation.
+
+        Returns:
+            dict: Report as described in _report.
+        """
+        started = time.perf_counter()
+        n_iter, b = self.iterations, self.barrier
+        v = self.verifiers
+        peer = np.array([[self.links.delay(a, c) for c in v] for a in v], dtype=object)
+        sites, verdicts, durations = [], [], []
+        per_site = np.diff(np.linspace(0, sessions, len(clients) + 1).astype(int))
+        for site, count in zip(clients, per_site):
+            to_client = [self.links.delay(verifier, site) for verifier in v]
+            for n in np.diff(np.r_[np.arange(0, count, chunk_sessions), count]):
+                shape = (n, n_iter)
+                # dic + dwell + dcj, each forward leg sampled independently
+                dic = np.stack([d.sample(self.rng, shape) for d in to_client], axis=-1)
+                dcj = np.stack([d.sample(self.rng, shape + (3,)) for d in to_client], axis=-1)
+                eij = dic[..., :, None] + self.forward_dwell + dcj
+                # Both legs of each av probe are sampled independently too
+                rtt = np.zeros(shape + (3, 3))
+                for i, j in itertools.permutations(range(3), 2):
+                    rtt[..., i, j] = peer[i, j].sample(self.rng, shape) + peer[j, i].sample(self.rng, shape)
+                dv = rtt / 2
+                diagonal = np.eye(3, dtype=bool)
+                eij = np.where(diagonal | (eij > b), np.nan, eij).reshape(-1, 3, 3)
+                dv = np.where(diagonal | (rtt > b), np.nan, dv).reshape(-1, 3, 3)
+
+                xi = cpv.calculate_owds_mp_batch(eij)
+                yi = cpv.calculate_verifier_owds_batch(np.fmin(dv, dv.transpose(0, 2, 1)))
+                votes = cpv.is_client_within_triangle_batch(xi, yi).reshape(shape).sum(axis=1)
+                verdicts.append(votes * 2 >= n_iter)
+                # The last iteration's results reach the aggregator (the first verifier)
+                result_delay = np.max([peer[k, 0].sample(self.rng, n) for k in range(3)], axis=0)
+                durations.append(2 * b * n_iter + result_delay)
+                sites.append(np.full(n, site, dtype=object))
+
+        return self._report(
+            "bulk", clients, np.concatenate(sites), np.concatenate(verdicts), np.concatenate(durations),
+            float(PROBES_PER_ITERATION * n_iter), time.perf_counter() - started,
+        )
+
+    def _report(self, mode, clients, sites, verdicts, durations, probes_per_verdict, wall_seconds):
+        """
+        Returns:
+            dict: Sessions, accuracy overall and per client site, false accept and reject
+            rates, session duration summary (seconds), probes per verdict and throughput.
+        """
+        expected = np.array([clients[site] for site in sites], dtype=bool)
+        correct = verdicts == expected
+        outside, inside = ~expected, expected
+        return {
+            "mode": mode,
+            "verifiers": self.verifiers,
+            "sessions": int(len(verdicts)),
+            "accuracy": float(correct.mean()) if len(correct) else float("nan"),
+            "false_accept_rate": float(verdicts[outside].mean()) if outside.any() else None,
+            "false_reject_rate": float((~verdicts[inside]).mean()) if inside.any() else None,
+            "per_client": {site: float(correct[sites == site].mean()) for site in clients if (sites == site).any()},
+            "duration": {
+                "mean": float(durations.mean()),
+                "p50": float(np.percentile(durations, 50)),
+                "p95": float(np.percentile(durations, 95)),
+                "max": float(durations.max()),
+            } if len(durations) else None,
+            "probes_per_verdict": probes_per_verdict,
+            "wall_seconds": wall_seconds,
+            "sessions_per_minute": len(verdicts) * 60 / wall_seconds if wall_seconds else float("inf"),
+        }
+
+
+def _mapping(spec):
+    return dict(item.split("=", 1) for item in spec.split(",") if item)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate CPV sessions for a candidate verifier layout.")
+    parser.add_argument("logs", nargs="+", help="RTT logs the link delays are drawn from (tests/*.txt)")
+    parser.add_argument("--verifiers", required=True, help="Three verifier sites in triangle order, comma separated")
+    parser.add_argument("--clients", required=True, help="Client sites and expected verdicts, e.g. Mumbai=1,Delhi=0")
+    parser.add_argument("--source-map", default="", help="Site of each log, e.g. BLR-jorhat-blr-mumbai=Bangalore")
+    parser.add_argument("--map", default="", help="Site of each verifier name in the logs, e.g. server2=Delhi")
+    parser.add_argument("--sessions", type=int, default=1000000)
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--barrier", type=float, default=1.0)
+    parser.add_argument("--forward-dwell", type=float, default=0.0)
+    parser.add_argument("--local-delay", type=float, default=0.0005)
+    parser.add_argument("--events", action="store_true", help="Simulate event by event instead of in bulk")
+    parser.add_argument("--rate", type=float, default=100.0, help="Session arrivals per second (--events)")
+    parser.add_argument("--service-time", type=float, default=0.0, help="Verifier seconds per message (--events)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    links = LinkModel.from_rtt_logs(
+        args.logs, _mapping(args.source_map), _mapping(args.map), local_delay=args.local_delay
+    )
+    clients = {site: value not in ("0", "false", "False") for site, value in _mapping(args.clients).items()}
+    simulator = Simulator(
+        links, args.verifiers.split(","), args.iterations, args.barrier, args.forward_dwell,
+        args.service_time, args.seed
+    )
+    if args.events:
+        report = simulator.run_events(clients, args.sessions, args.rate)
+    else:
+        report = simulator.run_bulk(clients, args.sessions)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# stats.py
+
+import math
+
+
+class RunningStats:
+    """
+    Count, mean, variance, min and max of a stream of values in O(1) memory (Welford).
+    """
+    __slots__ = ("count", "mean", "m2", "min", "max", "last")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.last = None
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.last = value
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stddev(self):
+        return math.sqrt(self.variance)
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean": self.mean if self.count else None,
+            "stddev": self.stddev if self.count else None,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "last": self.last,
+        }
+
+    def merge(self, other):
+        """
+        Folds the statistics of another stream into this one (Chan et al.).
+        """
+        if not other.count:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.last = other.last
+        return self
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile estimates of non-negative values with a bounded relative error.
+
+    Values are counted in logarithmic buckets (as in DDSketch), so memory grows with
+    the range of the values, not their number, and sketches of separately parsed
+    chunks can be merged.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = {}  # bucket index -> count; bucket k holds (gamma^(k-1), gamma^k]
+        self.zeros = 0
+        self.count = 0
+
+    def add(self, value):
+        self.count += 1
+        if value <= 0:
+            self.zeros += 1
+            return
+        key = math.ceil(math.log(value) / self.log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+
+    def add_many(self, values):
+        """
+        Adds an array of values at once.
+        """
+        import numpy as np
+
+        values = np.asarray(values, dtype=np.float64)
+        positive = values[values > 0]
+        self.count += len(values)
+        self.zeros += len(values) - len(positive)
+        keys, counts = np.unique(np.ceil(np.log(positive) / self.log_gamma).astype(np.int64), return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            self.buckets[key] = self.buckets.get(key, 0) + count
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches of different accuracy")
+        self.count += other.count
+        self.zeros += other.zeros
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        return self
+
+    def quantile(self, q):
+        """
+        Estimates the value at rank q (0 to 1), or None for an empty sketch.
+        """
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
@@ -0,0 +1,238 @@
+# supervisor.py
+
+import json
+import multiprocessing
+import os
+import socket
+import struct
+import threading
+import time
+import zlib
+from multiprocessing import shared_memory
+from . import cpv_utils
+from .server_architecture import Server
+import logging
+
+logger = logging.getLogger(__name__)
+
+MESH_HEADER = struct.Struct("Q")  # Sequence counter, odd while a write is in progress
+MESH_RECORD = struct.Struct("ddd")  # rtt, clock offset, updated_at (NaN when unknown)
+MESH_PUBLISHER = 0  # Worker whose peer RTTs and clock offsets are published to the others
+
+
+def shard_for(client_id, workers):
+    """
+    Returns the worker index a client is pinned to.
+
+    Uses CRC32 rather than hash() so every process agrees on the mapping.
+    """
+    return zlib.crc32(client_id.encode()) % workers
+
+
+class MeshState:
+    def __init__(self, peer_ids, name=None, create=False):
+        """
+        Verifier-mesh state (peer RTTs and clock offsets) held in shared memory.
+
+        One process writes, any number of processes read. Writers bump a sequence
+        counter before and after each update (a seqlock), and readers retry until they
+        observe the same even counter on both sides of their read.
+
+        Args:
+            peer_ids (list): Peer identifiers; their order fixes the record layout.
+            name (str, optional): Name of an existing shared memory block to attach to.
+            create (bool): Create a new block instead of attaching to `name`.
+        """
+        self.peer_ids = list(peer_ids)
+        self.index = {peer_id: i for i, peer_id in enumerate(self.peer_ids)}
+        size = MESH_HEADER.size + MESH_RECORD.size * max(len(self.peer_ids), 1)
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+        self.name = self.shm.name
+        if create:
+            MESH_HEADER.pack_into(self.shm.buf, 0, 0)
+            for i in range(len(self.peer_ids)):
+                MESH_RECORD.pack_into(self.shm.buf, self._offset(i), float("nan"), float("nan"), 0.0)
+
+    def publish(self, rtts, offsets):
+        """
+        Writes the latest RTTs and clock offsets for all known peers.
+        """
+        seq = MESH_HEADER.unpack_from(self.shm.buf, 0)[0]
+        seq += seq % 2  # A previous writer died mid-write; start from the next even counter
+        MESH_HEADER.pack_into(self.shm.buf, 0, seq + 1)
+        now = time.time()
+        for peer_id, i in self.index.items():
+            rtt = rtts.get(peer_id)
+            offset = offsets.get(peer_id)
+            MESH_RECORD.pack_into(
+                self.shm.buf, self._offset(i),
+                float("nan") if rtt is None else rtt,
+                float("nan") if offset is None else offset,
+                now
+            )
+        MESH_HEADER.pack_into(self.shm.buf, 0, seq + 2)
+
+    def read(self, peer_id, retries=50, backoff=0.0002):
+        """
+        Returns (rtt, clock_offset) for a peer, or None if it has not been measured.
+
+        A read that keeps overlapping writes is retried up to `retries` times, sleeping
+        `backoff` seconds in between, and then gives up (returns None), so a writer
+        that died mid-write cannot hang its readers.
+        """
+        i = self.index.get(peer_id)
+        if i is None:
+            return None
+        for _ in range(retries):
+            before = MESH_HEADER.unpack_from(self.shm.buf, 0)[0]
+            if not before % 2:
+                rtt, offset, updated_at = MESH_RECORD.unpack_from(self.shm.buf, self._offset(i))
+                if MESH_HEADER.unpack_from(self.shm.buf, 0)[0] == before:
+                    break
+            time.sleep(backoff)
+        else:
+            logger.warning(f"Mesh state of {peer_id} stayed mid-write; reading it skipped")
+            return None
+        if rtt != rtt:  # NaN
+            return None
+        return rtt, (None if offset != offset else offset)
+
+    def close(self, unlink=False):
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+    def _offset(self, i):
+        return MESH_HEADER.size + MESH_RECORD.size * i
+
+
+class Supervisor:
+    def __init__(self, host, port, peers=None, identifier=None, workers=None, publish_interval=1.0):
+        """
+        Runs a verifier as N worker processes sharing one listen port.
+
+        Each worker is a Server bound with SO_REUSEPORT and serves one lane: worker i
+        of every verifier forms its own mesh with worker i of the peers, announcing its
+        lane in HELLO, and measures the sessions of the clients pinned to lane i by
+        shard_for(client_id). Peers must therefore run the same number of workers.
+
+        The kernel spreads accepted connections across workers; after HELLO, a worker
+        hands each connection to its lane's worker (a client's shard, or the lane a
+        peer announced), passing the file descriptor over a Unix datagram socket.
+        Worker MESH_PUBLISHER publishes its peer RTTs and clock offsets through a
+        MeshState block, which the other workers use until they measure their own.
+
+        Args:
+            host (str): The hostname or IP address to bind the workers.
+            port (int): The port number shared by all workers.
+            peers (dict, optional): A mapping of peer identifiers to (host, port).
+            identifier (str, optional): A unique identifier for this verifier.
+            workers (int, optional): Number of worker processes (defaults to the CPU count).
+            publish_interval (float): Seconds between mesh state publications.
+        """
+        self.host = host
+        self.port = port
+        self.peers = peers or {}
+        self.identifier = identifier
+        self.workers = workers or os.cpu_count() or 1
+        self.publish_interval = publish_interval
+        self.running = True
+        self.processes = []
+        # Handoff inbox per worker
+        self.inboxes = {shard: socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM) for shard in range(self.workers)}
+        self.mesh_state = MeshState(sorted(self.peers), create=True)
+
+    def start(self):
+        """
+        Forks the worker processes.
+        """
+        context = multiprocessing.get_context("fork")
+        for index in range(self.workers):
+            process = context.Process(target=self._worker_main, args=(index,), daemon=True)
+            process.start()
+            self.processes.append(process)
+        logger.info(f"[{self.identifier}] Supervisor started {self.workers} workers on {self.host}:{self.port}")
+
+    def shutdown(self):
+        """
+        Stops the workers and releases the shared mesh state.
+        """
+        self.running = False
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join()
+        for recv_end, send_end in self.inboxes.values():
+            recv_end.close()
+            send_end.close()
+        self.mesh_state.close(unlink=True)
+
+    def _worker_main(self, index):
+        """
+        Entry point of a worker process.
+        """
+        server = Server(self.host, self.port, self.peers, self.identifier, reuse_port=True)
+        server.lane = index
+        server.mesh_state = MeshState(self.mesh_state.peer_ids, name=self.mesh_state.name)
+        server.connection_router = lambda identifier, connection, address, data: self._route(
+            index, identifier, connection, address, data
+        )
+        threading.Thread(target=self._receive_handoffs, args=(server, index), daemon=True).start()
+        threading.Thread(target=server.listen, daemon=True).start()
+        server.listening.wait()
+        if index == MESH_PUBLISHER:
+            threading.Thread(target=self._publish_loop, args=(server,), daemon=True).start()
+        # Peers' workers may still be starting; connect with backoff
+        server._reconnect_mesh()
+        while server.running:
+            time.sleep(1)
+
+    def _route(self, index, identifier, connection, address, data):
+        """
+        Hands a freshly accepted connection to the worker of its lane.
+
+        Returns:
+            bool: True if the connection was handed off and closed locally.
+        """
+        if identifier.startswith("client"):
+            target = shard_for(identifier, self.workers)
+        else:
+            hello = data.partition(cpv_utils.MESSAGE_DELIMITER)[0].split()
+            target = int(hello[2]) if len(hello) > 2 else 0
+            if not 0 <= target < self.workers:
+                logger.error(f"[{self.identifier}] {identifier} announced lane {target}; peers need {self.workers} workers")
+                connection.close()
+                return True
+        if target == index:
+            return False
+        payload = json.dumps({"address": list(address), "data": data}).encode()
+        socket.send_fds(self.inboxes[target][1], [payload], [connection.fileno()])
+        connection.close()
+        return True
+
+    def _receive_handoffs(self, server, shard):
+        """
+        Adopts connections handed to this process by other workers.
+        """
+        inbox = self.inboxes[shard][0]
+        while self.running:
+            try:
+                payload, fds, _, _ = socket.recv_fds(inbox, 4096, 1)
+            except OSError:
+                break
+            if not fds:
+                continue
+            message = json.loads(payload.decode())
+            connection = socket.socket(fileno=fds[0])
+            server.adopt_connection(connection, tuple(message["address"]), message["data"])
+
+    def _publish_loop(self, server):
+        """
+        Periodically copies a worker's peer RTTs and clock offsets to shared memory.
+        """
+        while server.running:
+            with server.lock:
+                rtts = dict(server.peer_rtts)
+                offsets = dict(server.clock_offsets)
+            server.mesh_state.publish(rtts, offsets)
+            time.sleep(self.publish_interval)
@@ -0,0 +1,258 @@
+# topology.py
+
+import bisect
+import itertools
+import json
+import math
+import threading
+from . import cpv
+import logging
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_km(a, b):
+    """
+    Great-circle distance in km between two (lat, lon) points given in degrees.
+    """
+    lat1, lon1, lat2, lon2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h))
+
+
+class Triangle:
+    """
+    A verifier triple with the constants is_client_within_triangle needs precomputed.
+    """
+    __slots__ = ("ids", "vertices", "yi", "area_v", "measured", "area_deg", "bbox")
+
+    def __init__(self, ids, vertices, yi, scaling_factor, measured=False):
+        """
+        Args:
+            ids (tuple): The three verifier identifiers, in triangle order 1, 2, 3.
+            vertices (list): (lat, lon) of each verifier.
+            yi (dict): OWDs (seconds) between verifiers 1-2, 2-3 and 3-1, keyed 1..3.
+            scaling_factor (float): Distance in km covered per ms of delay.
+            measured (bool): True if every yi is a measured delay rather than one
+                derived from the verifiers' distance.
+        """
+        self.ids = ids
+        self.vertices = vertices
+        self.yi = yi
+        self.measured = measured
+        sides = [yi[k] * 1000 * scaling_factor for k in (1, 2, 3)]
+        self.area_v = cpv.area_of_triangle(*sides)
+        (a_lat, a_lon), (b_lat, b_lon), (c_lat, c_lon) = vertices
+        self.area_deg = abs((b_lon - a_lon) * (c_lat - a_lat) - (c_lon - a_lon) * (b_lat - a_lat)) / 2
+        lats, lons = [v[0] for v in vertices], [v[1] for v in vertices]
+        self.bbox = (min(lats), min(lons), max(lats), max(lons))
+
+    def contains(self, lat, lon):
+        """
+        Returns True if (lat, lon) lies inside the triangle (planar test in degrees).
+        """
+        (a_lat, a_lon), (b_lat, b_lon), (c_lat, c_lon) = self.vertices
+        d1 = (lon - b_lon) * (a_lat - b_lat) - (a_lon - b_lon) * (lat - b_lat)
+        d2 = (lon - c_lon) * (b_lat - c_lat) - (b_lon - c_lon) * (lat - c_lat)
+        d3 = (lon - a_lon) * (c_lat - a_lat) - (c_lon - a_lon) * (lat - a_lat)
+        negative = d1 < 0 or d2 < 0 or d3 < 0
+        positive = d1 > 0 or d2 > 0 or d3 > 0
+        return not (negative and positive)
+
+    def is_client_within(self, xi, scaling_factor=200):
+        """
+        Runs is_client_within_triangle with this triangle's precomputed area.
+
+        :param xi: Estimated OWDs from client to verifiers, keyed 1..3 in triangle order
+        """
+        return cpv.is_client_within_triangle(xi, self.yi, area_v=self.area_v, scaling_factor=scaling_factor)
+
+
+class TopologyRegistry:
+    def __init__(self, cell_size=1.0, scaling_factor=200):
+        """
+        Registry of verifier locations, inter-verifier delays and distances, and the
+        triangles they form.
+
+        Triangles are indexed in a uniform lat/lon grid: each cell lists the triangles
+        whose bounding box overlaps it, sorted by area, so selecting an enclosing triple
+        for a claimed location scans one cell and stops at the first (smallest) hit.
+        Joining or leaving verifiers update the triangles and grid cells they touch,
+        and measured verifier delays (see set_delay) replace the ones derived from
+        distance.
+
+        Args:
+            cell_size (float): Grid cell size in degrees.
+            scaling_factor (float): Distance in km covered per ms of delay; used to
+                derive delays for verifier pairs that have not been measured.
+        """
+        self.cell_size = cell_size
+        self.scaling_factor = scaling_factor
+        self.lock = threading.Lock()
+        self.verifiers = {}  # identifier -> {"lat": ..., "lon": ..., "host": ..., "port": ...}
+        self.distances = {}  # frozenset({i, j}) -> km
+        self.delays = {}  # frozenset({i, j}) -> measured OWD in seconds
+        self.triangles = {}  # sorted id tuple -> Triangle
+        self.grid = {}  # (row, col) -> list of (area_deg, triangle key), sorted
+        self.listeners = []  # Callables invoked after every topology change
+
+    @classmethod
+    def from_config(cls, filename, **kwargs):
+        """
+        Loads verifiers from a JSON file of the form
+        {"verifiers": {"server1": {"host": ..., "port": ..., "lat": ..., "lon": ...}, ...}}.
+        """
+        with open(filename) as file:
+            config = json.load(file)
+        registry = cls(**kwargs)
+        for identifier, entry in config["verifiers"].items():
+            registry.add_verifier(identifier, entry["lat"], entry["lon"], entry.get("host"), entry.get("port"))
+        return registry
+
+    def peers_for(self, identifier):
+        """
+        Returns the peers mapping (identifier -> (host, port)) a Server should use.
+        """
+        with self.lock:
+            return {
+                peer_id: (entry["host"], entry["port"])
+                for peer_id, entry in self.verifiers.items()
+                if peer_id != identifier and entry.get("host") is not None
+            }
+
+    def add_verifier(self, identifier, lat, lon, host=None, port=None):
+        """
+        Adds (or moves) a verifier and builds the triangles it forms with existing ones.
+        """
+        with self.lock:
+            if identifier in self.verifiers:
+                self._remove(identifier)
+            self.verifiers[identifier] = {"lat": lat, "lon": lon, "host": host, "port": port}
+            for other, entry in self.verifiers.items():
+                if other != identifier:
+                    self.distances[frozenset((identifier, other))] = haversine_km((lat, lon), (entry["lat"], entry["lon"]))
+            others = sorted(v for v in self.verifiers if v != identifier)
+            for pair in itertools.combinations(others, 2):
+                self._add_triangle(tuple(sorted(pair + (identifier,))))
+        self._notify()
+
+    def remove_verifier(self, identifier):
+        """
+        Removes a verifier and every triangle it belongs to.
+        """
+        with self.lock:
+            if identifier not in self.verifiers:
+                return
+            self._remove(identifier)
+        self._notify()
+
+    def set_delay(self, i, j, delay):
+        """
+        Records the measured OWD between two verifiers and refreshes the affected triangles.
+
+        Listeners are not notified: the verifier set is unchanged, so cached verdicts
+        stay valid.
+        """
+        with self.lock:
+            pair = frozenset((i, j))
+            if i not in self.verifiers or j not in self.verifiers or self.delays.get(pair) == delay:
+                return
+            self.delays[pair] = delay
+            for key in [k for k in self.triangles if i in k and j in k]:
+                self._add_triangle(key)
+
+    def delay(self, i, j):
+        """
+        Returns the measured OWD between two verifiers, or one derived from their distance.
+        """
+        pair = frozenset((i, j))
+        if pair in self.delays:
+            return self.delays[pair]
+        return self.distances[pair] / self.scaling_factor / 1000
+
+    def distance(self, i, j):
+        """
+        Returns the great-circle distance in km between two verifiers, or None if
+        either is unknown.
+        """
+        return self.distances.get(frozenset((i, j)))
+
+    def triangle(self, ids):
+        """
+        Returns the Triangle for a verifier triple (in any order), or None.
+        """
+        return self.triangles.get(tuple(sorted(ids)))
+
+    def select_triangle(self, lat, lon):
+        """
+        Picks the verifier triple best suited to verify a client claiming (lat, lon):
+        the smallest triangle enclosing the location.
+
+        Returns:
+            Triangle or None: None if no triangle encloses the location.
+        """
+        with self.lock:
+            for area, key in self.grid.get(self._cell(lat, lon), ()):
+                triangle = self.triangles[key]
+                if area > 0 and triangle.contains(lat, lon):
+                    return triangle
+            return None
+
+    def add_listener(self, callback):
+        """
+        Registers a callable invoked with no arguments after each topology change.
+        """
+        self.listeners.append(callback)
+
+    def _notify(self):
+        for callback in self.listeners:
+            callback()
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.cell_size), math.floor(lon / self.cell_size))
+
+    def _cells(self, bbox):
+        min_row, min_col = self._cell(bbox[0], bbox[1])
+        max_row, max_col = self._cell(bbox[2], bbox[3])
+        for row in range(min_row, max_row + 1):
+            for col in range(min_col, max_col + 1):
+                yield (row, col)
+
+    def _add_triangle(self, key):
+        if key in self.triangles:
+            self._unindex(key)
+        vertices = [(self.verifiers[v]["lat"], self.verifiers[v]["lon"]) for v in key]
+        yi = {
+            1: self.delay(key[0], key[1]),
+            2: self.delay(key[1], key[2]),
+            3: self.delay(key[2], key[0]),
+        }
+        measured = all(frozenset(pair) in self.delays for pair in ((key[0], key[1]), (key[1], key[2]), (key[2], key[0])))
+        triangle = Triangle(key, vertices, yi, self.scaling_factor, measured)
+        self.triangles[key] = triangle
+        for cell in self._cells(triangle.bbox):
+            bisect.insort(self.grid.setdefault(cell, []), (triangle.area_deg, key))
+
+    def _unindex(self, key):
+        triangle = self.triangles[key]
+        entry = (triangle.area_deg, key)
+        for cell in self._cells(triangle.bbox):
+            entries = self.grid.get(cell)
+            if entries is not None:
+                index = bisect.bisect_left(entries, entry)
+                if index < len(entries) and entries[index] == entry:
+                    del entries[index]
+                if not entries:
+                    del self.grid[cell]
+
+    def _remove(self, identifier):
+        for key in [k for k in self.triangles if identifier in k]:
+            self._unindex(key)
+            del self.triangles[key]
+        for pair in [p for p in self.distances if identifier in p]:
+            del self.distances[pair]
+        for pair in [p for p in self.delays if identifier in p]:
+            del self.delays[pair]
+        del self.verifiers[identifier]
@@ -0,0 +1,202 @@
+# tracing.py
+
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _NullSpan:
+    """
+    Span returned by a disabled tracer; entering and leaving it does nothing.
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "tags", "start_ns")
+
+    def __init__(self, tracer, name, tags):
+        self.tracer = tracer
+        self.name = name
+        self.tags = tags
+
+    def __enter__(self):
+        self.start_ns = time.time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.tracer._append(self.name, self.start_ns, time.time_ns(), self.tags)
+        return False
+
+
+class _TracedLock:
+    __slots__ = ("tracer", "lock", "tags")
+
+    def __init__(self, tracer, lock, tags):
+        self.tracer = tracer
+        self.lock = lock
+        self.tags = tags
+
+    def __enter__(self):
+        start_ns = time.time_ns()
+        self.lock.acquire()
+        self.tracer._append("lock_wait", start_ns, time.time_ns(), self.tags)
+        return self.lock
+
+    def __exit__(self, exc_type, exc, tb):
+        self.lock.release()
+        return False
+
+
+def traced_lock(tracer, lock, **tags):
+    """
+    Returns a context manager acquiring `lock` that records the wait as a "lock_wait"
+    span. With a disabled tracer the lock itself is returned.
+    """
+    if not tracer.enabled:
+        return lock
+    return _TracedLock(tracer, lock, tags)
+
+
+class Tracer:
+    def __init__(self, capacity=65536, enabled=True, service_name="cpv"):
+        """
+        Collects timed spans of a verification round in a fixed-size ring buffer.
+
+        Writers claim a slot with next() on an itertools.count, which is atomic under
+        the GIL, so recording a span takes no lock. Once the ring is full the oldest
+        spans are overwritten. A disabled tracer hands out a shared no-op span.
+
+        Args:
+            capacity (int): Number of spans kept in the ring.
+            enabled (bool): Whether spans are recorded.
+            service_name (str): Service name written to exported traces.
+        """
+        self.capacity = capacity
+        self.enabled = enabled
+        self.service_name = service_name
+        self._ring = [None] * capacity
+        self._counter = itertools.count()
+        self._written = 0
+
+    def span(self, name, **tags):
+        """
+        Returns a context manager timing the enclosed block as a span.
+
+        Args:
+            name (str): Phase name, e.g. "send_timestamp" or "client_forward".
+            **tags: Attributes such as session, iteration and peer.
+        """
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, name, tags)
+
+    def record(self, name, start, end, **tags):
+        """
+        Records a span whose start and end (seconds since the epoch) were measured elsewhere.
+        """
+        if self.enabled:
+            self._append(name, int(start * 1e9), int(end * 1e9), tags)
+
+    def _append(self, name, start_ns, end_ns, tags):
+        slot = next(self._counter)
+        self._ring[slot % self.capacity] = (name, start_ns, end_ns, threading.get_ident(), tags)
+        self._written = slot + 1
+
+    def spans(self):
+        """
+        Returns the recorded spans, oldest first, as (name, start_ns, end_ns, thread, tags).
+        """
+        written = self._written
+        if written <= self.capacity:
+            records = self._ring[:written]
+        else:
+            start = written % self.capacity
+            records = self._ring[start:] + self._ring[:start]
+        return [record for record in records if record is not None]
+
+    def clear(self):
+        self._ring = [None] * self.capacity
+        self._counter = itertools.count()
+        self._written = 0
+
+    def export_chrome_trace(self, filename):
+        """
+        Writes the spans as a Chrome trace (chrome://tracing, Perfetto) JSON file.
+        """
+        pid = os.getpid()
+        events = [
+            {
+                "name": name,
+                "ph": "X",
+                "ts": start_ns / 1000,
+                "dur": (end_ns - start_ns) / 1000,
+                "pid": pid,
+                "tid": thread,
+                "args": {k: str(v) for k, v in tags.items()},
+            }
+            for name, start_ns, end_ns, thread, tags in self.spans()
+        ]
+        with open(filename, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+        logger.info(f"Exported {len(events)} spans to {filename}")
+
+    def export_otlp(self, filename):
+        """
+        Writes the spans as an OTLP/JSON trace export file.
+
+        Spans of the same session share a trace id derived from the session id.
+        """
+        spans = []
+        for name, start_ns, end_ns, _, tags in self.spans():
+            session = tags.get("session")
+            spans.append({
+                "traceId": _trace_id(session),
+                "spanId": uuid.uuid4().hex[:16],
+                "name": name,
+                "kind": 1,
+                "startTimeUnixNano": str(start_ns),
+                "endTimeUnixNano": str(end_ns),
+                "attributes": [
+                    {"key": k, "value": {"stringValue": str(v)}} for k, v in tags.items()
+                ],
+            })
+        document = {
+            "resourceSpans": [{
+                "resource": {
+                    "attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]
+                },
+                "scopeSpans": [{"scope": {"name": "cpv.tracing"}, "spans": spans}],
+            }]
+        }
+        with open(filename, "w") as file:
+            json.dump(document, file)
+        logger.info(f"Exported {len(spans)} spans to {filename}")
+
+
+def _trace_id(session):
+    if session is None:
+        return "0" * 32
+    try:
+        return uuid.UUID(str(session)).hex
+    except ValueError:
+        return uuid.uuid5(uuid.NAMESPACE_OID, str(session)).hex
+
+
+# Shared disabled tracer used when none is configured
+NULL_TRACER = Tracer(capacity=1, enabled=False)
@@ -0,0 +1,148 @@
+# verdict_cache.py
+
+import ipaddress
+import threading
+import time
+from collections import OrderedDict
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Verdict:
+    """
+    A verification verdict for one client, as returned from the cache.
+    """
+    __slots__ = ("client_id", "inside", "owds", "confidence", "session_id", "created_at")
+
+    def __init__(self, client_id, inside, owds, confidence, session_id=None, created_at=None):
+        """
+        Args:
+            client_id (str): Identifier of the verified client.
+            inside (bool): True if the client was found within the verifier triangle.
+            owds (dict): Estimated OWDs (seconds) from each verifier identifier to the client.
+            confidence (float): Confidence of the verdict in [0, 1].
+            session_id (str, optional): Session that produced the verdict.
+            created_at (float, optional): Time the verdict was produced (defaults to now).
+        """
+        self.client_id = client_id
+        self.inside = inside
+        self.owds = dict(owds)
+        self.confidence = confidence
+        self.session_id = session_id
+        self.created_at = created_at if created_at is not None else time.time()
+
+
+class VerdictCache:
+    def __init__(self, ttl=300.0, max_entries=4096, prefix_length=24, prefix_fallback=False):
+        """
+        Initializes an LRU cache of verdicts keyed by client identity and network prefix.
+
+        A lookup tries the exact (client_id, prefix) entry. With prefix_fallback it then
+        falls back to any fresh verdict recorded for the same prefix, so a client behind
+        the same /24 as a recently verified one skips measurement as well; this lets one
+        client's verdict vouch for another and is off by default.
+
+        Args:
+            ttl (float): Seconds a verdict stays valid.
+            max_entries (int): Maximum number of cached verdicts; the least recently used
+                entry is evicted when the bound is exceeded.
+            prefix_length (int): IPv4 prefix length used to group clients (IPv6 uses /64).
+            prefix_fallback (bool): Serve a verdict of another client in the same prefix.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.prefix_length = prefix_length
+        self.prefix_fallback = prefix_fallback
+        self.lock = threading.Lock()
+        self.topology_version = 0
+        self._entries = OrderedDict()  # (client_id, prefix) -> (Verdict, topology_version)
+        self._by_prefix = {}  # prefix -> most recent (client_id, prefix) key
+        self.hits = 0
+        self.misses = 0
+
+    def network_prefix(self, address):
+        """
+        Returns the network prefix string for an IP address (or (host, port) tuple).
+        """
+        if isinstance(address, tuple):
+            address = address[0]
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return str(address)
+        length = self.prefix_length if ip.version == 4 else 64
+        return str(ipaddress.ip_network(f"{ip}/{length}", strict=False))
+
+    def get(self, client_id, address):
+        """
+        Returns a fresh cached Verdict for the client, or None on a miss.
+        """
+        prefix = self.network_prefix(address)
+        now = time.time()
+        with self.lock:
+            keys = [(client_id, prefix)]
+            if self.prefix_fallback:
+                keys.append(self._by_prefix.get(prefix))
+            for key in keys:
+                if key is None:
+                    continue
+                verdict = self._lookup(key, now)
+                if verdict is not None:
+                    self.hits += 1
+                    return verdict
+            self.misses += 1
+            return None
+
+    def put(self, client_id, address, verdict):
+        """
+        Stores a verdict for the client under its (client_id, prefix) key.
+        """
+        prefix = self.network_prefix(address)
+        key = (client_id, prefix)
+        with self.lock:
+            self._entries[key] = (verdict, self.topology_version)
+            self._entries.move_to_end(key)
+            self._by_prefix[prefix] = key
+            while len(self._entries) > self.max_entries:
+                old_key, _ = self._entries.popitem(last=False)
+                self._forget_prefix(old_key)
+
+    def invalidate_client(self, client_id):
+        """
+        Drops every cached verdict for a client.
+        """
+        with self.lock:
+            for key in [k for k in self._entries if k[0] == client_id]:
+                del self._entries[key]
+                self._forget_prefix(key)
+
+    def invalidate_topology(self):
+        """
+        Marks all cached verdicts stale after the verifier set changed.
+        """
+        with self.lock:
+            self.topology_version += 1
+            self._entries.clear()
+            self._by_prefix.clear()
+        logger.info(f"Verdict cache invalidated (topology version {self.topology_version})")
+
+    def __len__(self):
+        with self.lock:
+            return len(self._entries)
+
+    def _lookup(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        verdict, version = entry
+        if version != self.topology_version or now - verdict.created_at > self.ttl:
+            del self._entries[key]
+            self._forget_prefix(key)
+            return None
+        self._entries.move_to_end(key)
+        return verdict
+
+    def _forget_prefix(self, key):
+        if self._by_prefix.get(key[1]) == key:
+            del self._by_prefix[key[1]]
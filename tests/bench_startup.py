@@ -0,0 +1,106 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+
+def child(base_port, verifiers):
+    """
+    Starts a verifier mesh in this (fresh) interpreter and prints the time of each
+    startup phase, in seconds since the interpreter began importing cpv.
+    """
+    start = time.perf_counter()
+    sys.path.insert(0, SRC)
+    from cpv.server_architecture import Server
+    imported = time.perf_counter()
+
+    ids = [f"server{i + 1}" for i in range(verifiers)]
+    addresses = {identifier: ('127.0.0.1', base_port + i) for i, identifier in enumerate(ids)}
+    servers = [
+        Server('127.0.0.1', addresses[identifier][1],
+               {peer: address for peer, address in addresses.items() if peer != identifier}, identifier)
+        for identifier in ids
+    ]
+    constructed = time.perf_counter()
+
+    for server in servers:
+        threading.Thread(target=server.listen, daemon=True).start()
+    for server in servers:
+        server.listening.wait()
+    listening = time.perf_counter()
+
+    for server in servers:
+        server.connect_to_peers()
+    while not all(
+        all(server.connections.get(peer, {}).get("incoming") for peer in server.peers) for server in servers
+    ):
+        time.sleep(0.0005)
+    mesh = time.perf_counter()
+
+    # NumPy is imported in the background from listen(); the first probe may wait for it
+    first = servers[0]
+    first.session_id = "bench"
+    first.measurements.start_session("bench", 1)
+    peer = ids[1]
+    first._measure_rtt_with_verifier(peer, first.connections[peer]["outgoing"], 1)
+    while peer not in first.peer_rtts:
+        time.sleep(0.0005)
+    probed = time.perf_counter()
+
+    for server in servers:
+        server.shutdown()
+    print(json.dumps({
+        "import": imported - start,
+        "construct": constructed - imported,
+        "listen_ready": listening - constructed,
+        "mesh_ready": mesh - listening,
+        "first_probe": probed - mesh,
+        "ready": mesh - start,
+        "total": probed - start,
+        "side_effects": sorted(os.listdir(".")),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure verifier cold-start phases in fresh interpreters.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--base-port", type=int, default=19500)
+    parser.add_argument("--verifiers", type=int, default=3)
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="Fail if the median time to a connected mesh (import to mesh_ready) exceeds this")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.base_port, args.verifiers)
+        return
+
+    runs = []
+    for run in range(args.runs):
+        # A fresh working directory shows any files created by import or construction
+        with tempfile.TemporaryDirectory() as workdir:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child",
+                 "--base-port", str(args.base_port + run * args.verifiers), "--verifiers", str(args.verifiers)],
+                cwd=workdir, capture_output=True, text=True, check=True,
+            ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    for phase in ("import", "construct", "listen_ready", "mesh_ready", "first_probe", "ready", "total"):
+        values = [run[phase] * 1000 for run in runs]
+        print(f"{phase:>14}: median {statistics.median(values):8.2f} ms  max {max(values):8.2f} ms")
+    side_effects = sorted({name for run in runs for name in run["side_effects"]})
+    print(f"{'side_effects':>14}: {side_effects or 'none'}")
+    ready = statistics.median(run["ready"] * 1000 for run in runs)
+    if args.budget_ms is not None and ready > args.budget_ms:
+        parser.exit(1, f"Median time to a connected mesh {ready:.2f} ms exceeds the {args.budget_ms:.0f} ms budget\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,9 +4,11 @@ import time
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from src.cpv import configure_logging
 from src.cpv.client_architecture import Client
 
 def main():
+    configure_logging()
     identifier = 'client1'
     servers = {
         'server1': ('127.0.0.1', 9601),
@@ -0,0 +1,63 @@
+import os
+import socket
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from cpv.server_architecture import Server  # noqa: E402
+
+
+def free_ports(count):
+    """
+    Returns ports the OS currently reports as free on the loopback interface.
+    """
+    sockets = [socket.socket(socket.AF_INET, socket.SOCK_STREAM) for _ in range(count)]
+    for s in sockets:
+        s.bind(('127.0.0.1', 0))
+    ports = [s.getsockname()[1] for s in sockets]
+    for s in sockets:
+        s.close()
+    return ports
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def mesh(tmp_path):
+    """
+    Three connected verifiers on loopback; yields (servers, addresses).
+    """
+    ids = ['server1', 'server2', 'server3']
+    addresses = {identifier: ('127.0.0.1', port) for identifier, port in zip(ids, free_ports(len(ids)))}
+    servers = [
+        Server(
+            '127.0.0.1', addresses[identifier][1],
+            {peer: address for peer, address in addresses.items() if peer != identifier}, identifier,
+            delays_mp_file=str(tmp_path / f"{identifier}_mp.json"),
+            delays_av_file=str(tmp_path / f"{identifier}_av.json"),
+        )
+        for identifier in ids
+    ]
+    for server in servers:
+        threading.Thread(target=server.listen, daemon=True).start()
+    for server in servers:
+        server.listening.wait()
+    for server in servers:
+        server.connect_to_peers()
+    assert wait_for(lambda: all(
+        all(server.connections.get(peer, {}).get("incoming") for peer in server.peers) for server in servers
+    ))
+    yield servers, addresses
+    for server in servers:
+        server.shutdown()
@@ -4,9 +4,11 @@ import time
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from src.cpv import configure_logging
 from src.cpv.server_architecture import Server
 
 def main():
+    configure_logging()
     host = '192.168.192.217'
     port = 9603
     identifier = 'server3'
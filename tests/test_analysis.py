@@ -0,0 +1,53 @@
+import math
+import os
+
+import numpy as np
+
+from cpv.analysis import load_rtt_logs, summarize_rtt_logs
+from cpv.stats import QuantileSketch, RunningStats
+
+LOG = os.path.join(os.path.dirname(__file__), 'rtt_bangalore.txt')
+
+
+def test_merged_running_stats_match_one_stream():
+    values = [0.004, 0.012, 0.007, 0.031, 0.002, 0.009]
+    whole, first, second = RunningStats(), RunningStats(), RunningStats()
+    for value in values:
+        whole.add(value)
+    for value in values[:2]:
+        first.add(value)
+    for value in values[2:]:
+        second.add(value)
+    first.merge(second)
+    assert (first.count, first.min, first.max, first.last) == (whole.count, whole.min, whole.max, whole.last)
+    assert math.isclose(first.mean, whole.mean) and math.isclose(first.variance, whole.variance)
+
+
+def test_sketch_quantiles_are_within_their_relative_accuracy():
+    values = np.random.default_rng(1).lognormal(-4, 1, 10000)
+    sketch = QuantileSketch(0.01)
+    sketch.add_many(values[:4000])
+    rest = QuantileSketch(0.01)
+    for value in values[4000:]:
+        rest.add(value)
+    sketch.merge(rest)
+    assert sketch.count == len(values)
+    for q in (0.01, 0.5, 0.9, 0.99):
+        exact = np.quantile(values, q, method='lower')
+        assert abs(sketch.quantile(q) - exact) <= 0.011 * exact
+
+
+def test_streaming_summaries_match_the_parsed_rtts():
+    exact = load_rtt_logs([LOG])
+    # Small chunks so several workers each summarize part of the log
+    summaries = summarize_rtt_logs([LOG], chunk_bytes=4096, processes=2)
+    assert set(summaries) == {f'{source}/{verifier}' for source, verifier in exact}
+    for (source, verifier), values in exact.items():
+        summary = summaries[f'{source}/{verifier}']
+        assert summary['count'] == len(values)
+        assert (summary['min'], summary['max']) == (values.min(), values.max())
+        assert math.isclose(summary['mean'], values.mean())
+        for p in (50, 90, 99):
+            exact_percentile = np.percentile(values, p, method='lower')
+            assert abs(summary[f'p{p}'] - exact_percentile) <= 0.011 * exact_percentile
+        assert summary['cdf'][0] == [values.min(), 0.0] and summary['cdf'][-1] == [values.max(), 1.0]
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from cpv.calibration import DEFAULT_KEY, CalibrationRegistry, DelayDistanceModel, pair_key
+
+
+def envelope_samples(rng, intercept=0.002, km_per_ms=150.0, count=400):
+    distances = rng.uniform(0.0, 2000.0, count)
+    # Queueing only ever adds delay above the propagation envelope
+    delays = intercept + distances / (km_per_ms * 1000) + rng.exponential(0.003, count)
+    return distances, delays
+
+
+def test_fit_recovers_the_lower_envelope():
+    distances, delays = envelope_samples(np.random.default_rng(1))
+    model = DelayDistanceModel.fit(distances, delays)
+    assert model.km_per_ms == pytest.approx(150.0, rel=0.05)
+    assert model.intercept == pytest.approx(0.002, abs=0.0005)
+    # The envelope lies under every sample, so no sample maps beyond its true distance
+    assert np.all(model.intercept + distances / (model.km_per_ms * 1000) <= delays + 1e-12)
+
+
+def test_distance_of_a_delay():
+    model = DelayDistanceModel(intercept=0.001, km_per_ms=200.0, max_delay=0.1)
+    assert model.distance_km(0.006) == pytest.approx(1000.0)
+    assert model.distance_km(0.0005) == 0.0
+    # Beyond the table the envelope is extrapolated
+    np.testing.assert_allclose(model.distance_km([0.006, 0.2]), [1000.0, 39800.0])
+
+
+def test_fit_needs_two_distances_and_a_positive_slope():
+    with pytest.raises(ValueError):
+        DelayDistanceModel.fit_minima([100.0, 100.0], [0.001, 0.002])
+    with pytest.raises(ValueError):
+        DelayDistanceModel.fit_minima([100.0, 500.0], [0.004, 0.002])
+
+
+def test_registry_refits_and_falls_back_to_the_default():
+    registry = CalibrationRegistry(refit_every=10)
+    default = registry.model()
+    key = pair_key('server2', 'server1')
+    assert key == pair_key('server1', 'server2')
+    registry.add_samples(key, [100.0, 900.0], [0.0015, 0.0055])
+    # Not refit until refit_every samples arrived
+    assert registry.model_for(key, 'server1') is default
+    registry.add_samples(key, np.full(8, 500.0), np.full(8, 0.01))
+    assert registry.model_for(key, 'server1').km_per_ms == pytest.approx(200.0)
+    assert registry.model_for('server9') is registry.models[DEFAULT_KEY]
+
+
+def test_registry_round_trips_its_minima():
+    registry = CalibrationRegistry(refit_every=1, default_model=DelayDistanceModel(km_per_ms=180.0))
+    distances, delays = envelope_samples(np.random.default_rng(2))
+    registry.add_samples('server2', distances, delays)
+    restored = CalibrationRegistry.from_dict(registry.to_dict())
+    assert restored.model().km_per_ms == 180.0
+    assert restored.minima == registry.minima
+    assert restored.model('server2').km_per_ms == pytest.approx(registry.model('server2').km_per_ms)
+
+
+def test_rtt_log_samples_use_half_the_rtt(tmp_path):
+    log = tmp_path / 'rtt.txt'
+    log.write_text(
+        "Iteration 1, Verifier server2: RTT=0.004\n"
+        "Iteration 1, Verifier server3: RTT=0.012\n"
+        "garbage\n"
+        "Iteration 1, Verifier server9: RTT=0.5\n"
+    )
+    registry = CalibrationRegistry()
+    registry.add_rtt_log(str(log), {'server2': 200.0, 'server3': 1000.0}, key='region')
+    assert sorted(registry.minima['region'].values()) == [(200.0, 0.002), (1000.0, 0.006)]
+    assert registry.model('region').km_per_ms == pytest.approx(200.0)
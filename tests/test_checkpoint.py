@@ -0,0 +1,63 @@
+import zlib
+
+from cpv.calibration import CalibrationRegistry
+from cpv.checkpoint import read_snapshot, write_snapshot
+from cpv.server_architecture import Server
+
+from .conftest import free_ports
+
+
+def make_server(tmp_path, port, peers=None, calibration=None):
+    return Server(
+        '127.0.0.1', port, peers or {}, 'server1',
+        delays_mp_file=str(tmp_path / 'mp.json'), delays_av_file=str(tmp_path / 'av.json'),
+        checkpoint_path=str(tmp_path / 'server1.ckpt'), calibration=calibration,
+    )
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / 'state.ckpt')
+    state = {'peers': {'server2': ['127.0.0.1', 9000]}, 'sessions': {}}
+    write_snapshot(path, state)
+    assert read_snapshot(path) == dict(state, version=1)
+
+
+def test_unreadable_snapshot_is_ignored(tmp_path):
+    path = tmp_path / 'state.ckpt'
+    assert read_snapshot(str(path)) is None
+    path.write_bytes(b'not a snapshot')
+    assert read_snapshot(str(path)) is None
+    path.write_bytes(zlib.compress(b'{"version": 0}'))
+    assert read_snapshot(str(path)) is None
+
+
+def test_server_state_survives_a_restart(tmp_path):
+    port, peer_port = free_ports(2)
+    calibration = CalibrationRegistry(refit_every=1)
+    calibration.add_samples('server2', [100.0, 1000.0], [0.001, 0.006])
+    server = make_server(tmp_path, port, {'server2': ('127.0.0.1', peer_port)}, calibration)
+    server.peer_rtts['server2'] = 0.004
+    server.clock_offsets['server2'] = -0.25
+    server.session_progress['sess-client'] = {'iteration': 1, 'iterations': 3, 'client_id': 'client1'}
+    server.session_progress['sess-operator'] = {'iteration': 1, 'iterations': 3, 'client_id': None}
+    assert server.checkpoint.save()
+    server.shutdown()
+
+    restarted = make_server(tmp_path, port)
+    assert restarted.restore_checkpoint()
+    assert restarted.peers == {'server2': ('127.0.0.1', peer_port)}
+    assert restarted.peer_rtts == {'server2': 0.004}
+    assert restarted.clock_offsets == {'server2': -0.25}
+    # Only sessions a client is waiting for are kept for resumption
+    assert list(restarted.interrupted_sessions) == ['sess-client']
+    assert restarted.calibration.model('server2').km_per_ms == calibration.model('server2').km_per_ms
+    restarted.shutdown()
+
+
+def test_checkpoint_of_another_server_is_ignored(tmp_path):
+    port, = free_ports(1)
+    write_snapshot(str(tmp_path / 'server1.ckpt'), {'identifier': 'server9', 'peers': {'server2': ['127.0.0.1', 1]}})
+    server = make_server(tmp_path, port)
+    assert not server.restore_checkpoint()
+    assert server.peers == {}
+    server.shutdown()
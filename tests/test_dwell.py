@@ -0,0 +1,68 @@
+import math
+import time
+
+from cpv import cpv_utils
+from cpv.client_architecture import Client
+from cpv.server_architecture import Server
+
+from .conftest import free_ports, wait_for
+
+
+def make_server(tmp_path, compensate_dwell):
+    port, = free_ports(1)
+    server = Server(
+        '127.0.0.1', port, {}, 'server1', compensate_dwell=compensate_dwell,
+        delays_mp_file=str(tmp_path / 'mp.json'), delays_av_file=str(tmp_path / 'av.json'),
+    )
+    # A session of client1 in progress, as measure_delays sets it up
+    server.session_id = 'sess'
+    server.session_clients['sess'] = 'client1'
+    server.measurements.start_session('sess', 1)
+    server.session_progress['sess'] = {'iteration': 0, 'iterations': 1, 'client_id': 'client1'}
+    return server
+
+
+def test_reported_dwell_is_recorded_and_optionally_subtracted(tmp_path):
+    for compensate, expected in ((False, 0.050), (True, 0.030)):
+        server = make_server(tmp_path, compensate)
+        try:
+            server._handle_timestamp_from_client('server2', time.time() - 0.050, 1, 0.020, 'client1')
+            (dic_dcj,) = server.measurements.dic_dcj_dict(1).values()
+            assert math.isclose(dic_dcj, expected, abs_tol=0.005)
+            stats = server.dwell_stats()['client1']
+            assert (stats['count'], stats['mean']) == (1, 0.020)
+        finally:
+            server.shutdown()
+
+
+def test_dwell_of_ignored_forwards_is_not_recorded(tmp_path):
+    server = make_server(tmp_path, True)
+    try:
+        # Another client's forward, and a forward without a dwell field
+        server._handle_timestamp_from_client('server2', time.time() - 0.050, 1, 0.020, 'client2')
+        assert server.measurements.dic_dcj_dict(1) == {}
+        server._handle_timestamp_from_client('server2', time.time() - 0.050, 1, None, 'client1')
+        assert server.measurements.dic_dcj_dict(1)
+        assert server.dwell_stats() == {}
+    finally:
+        server.shutdown()
+
+
+def test_client_reports_the_dwell_of_each_forward(mesh):
+    servers, addresses = mesh
+    client = Client('client1', addresses)
+    client.connect_to_servers()
+    try:
+        assert wait_for(lambda: all('client1' in server.client_connections for server in servers))
+        client.send_queues['server1'].send(
+            cpv_utils.construct_message(cpv_utils.START_MEASUREMENTS, 'sess-dwell', 1).encode()
+        )
+        assert wait_for(lambda: client.verdicts, timeout=15.0)
+        # Every verifier receives two forwards per iteration, one from each of the others
+        assert wait_for(lambda: all(
+            server.dwell_stats().get('client1', {}).get('count') == 2 for server in servers
+        ))
+        assert client.forward_dwell.count == 6
+        assert 0 <= client.forward_dwell.min <= client.forward_dwell.max < 1.0
+    finally:
+        client.shutdown()
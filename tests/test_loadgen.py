@@ -0,0 +1,39 @@
+import asyncio
+
+from cpv import cpv_utils
+from cpv.loadgen import LoadStats, VirtualClient, run_load
+
+
+class RecordingWriter:
+    def __init__(self):
+        self.messages = []
+
+    def write(self, data):
+        self.messages.append(data)
+
+
+def test_run_produces_a_verdict_per_session(mesh):
+    _, addresses = mesh
+    report = asyncio.run(run_load(addresses, clients=2, rate=50.0, duration=10.0, iterations=2))
+    assert report["sessions"] == 2
+    assert report["verdicts"] == report["sessions"]
+
+
+def test_only_clients_with_a_pending_session_forward():
+    async def receive(client):
+        reader = asyncio.StreamReader()
+        reader.feed_data(cpv_utils.construct_message(cpv_utils.TIMESTAMP, 'server1', 1000.0, 1).encode())
+        reader.feed_eof()
+        await client._read('server1', reader)
+        await asyncio.sleep(0.05)
+
+    stats = LoadStats()
+    client = VirtualClient('client-lg-0', {}, stats)
+    client.writers = {'server1': RecordingWriter(), 'server2': RecordingWriter()}
+    asyncio.run(receive(client))
+    assert (stats.ignored, stats.forwards) == (1, 0)
+    client.pending_sessions['sess'] = 0.0
+    asyncio.run(receive(client))
+    assert stats.forwards == 1
+    assert not client.writers['server1'].messages
+    assert client.writers['server2'].messages[0].startswith(cpv_utils.FORWARD_TIMESTAMP.encode())
@@ -0,0 +1,47 @@
+import math
+
+from cpv.measurement_table import MeasurementTable
+
+
+def test_records_within_the_session_are_kept():
+    table = MeasurementTable(['server1', 'server2'], iterations=2)
+    table.start_session('s', 2)
+    assert table.record_dic_dcj('server1', 'server2', 2, 0.004)
+    assert table.record_av_delay('server2', 1, 0.002)
+    assert table.dic_dcj_dict(2) == {('server1', 'server2'): 0.004}
+    assert table.dic_dcj_pairs(2) == {'server1_server2': 0.004}
+    assert table.av_delays_dict(1) == {'server2': 0.002}
+
+
+def test_iterations_outside_the_session_are_rejected():
+    table = MeasurementTable(['server1', 'server2'], iterations=2)
+    table.start_session('s', 2)
+    for iteration in (0, -1, 3, 10 ** 9):
+        assert not table.record_dic_dcj('server1', 'server2', iteration, 0.004)
+        assert not table.record_av_delay('server2', iteration, 0.002)
+        assert not table.record_rtt_send('server2', iteration, 1.0)
+        assert table.dic_dcj_dict(iteration) == {}
+    # Nothing was allocated for the rejected iterations
+    assert table.dic_dcj.shape[0] == 2
+
+
+def test_new_session_clears_and_same_session_keeps():
+    table = MeasurementTable(['server1', 'server2'], iterations=1)
+    table.start_session('s1', 1)
+    table.record_dic_dcj('server1', 'server2', 1, 0.004)
+    table.start_session('s1', 3)
+    assert table.dic_dcj_dict(1) == {('server1', 'server2'): 0.004}
+    assert table.record_dic_dcj('server1', 'server2', 3, 0.005)
+    table.start_session('s2', 1)
+    assert table.dic_dcj_dict(1) == {}
+    assert not table.record_dic_dcj('server1', 'server2', 3, 0.005)
+
+
+def test_unknown_verifiers_grow_the_table():
+    table = MeasurementTable(['server1'], iterations=1)
+    table.start_session('s', 1)
+    assert table.record_dic_dcj('server9', 'server1', 1, 0.003)
+    assert table.compute_min_sums(1) == 0
+    assert table.record_dic_dcj('server1', 'server9', 1, 0.001)
+    assert table.compute_min_sums(1) == 2
+    assert math.isclose(table.min_sums_dict(1)['server9_server1'], 0.001)
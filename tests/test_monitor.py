@@ -0,0 +1,64 @@
+import random
+
+from cpv.aggregator import VerdictAggregator
+from cpv.monitor import PresenceMonitor, SlidingWindowMin
+
+VERIFIERS = ['server1', 'server2', 'server3']
+
+
+def test_sliding_window_min_matches_a_full_scan():
+    rng = random.Random(7)
+    window = SlidingWindowMin()
+    samples = []
+    for step in range(2000):
+        now = step * 0.5
+        value = rng.uniform(0.001, 0.050)
+        samples.append((now, value))
+        window.add(now, value)
+        window.expire(now - 20.0)
+        assert window.value() == min(v for t, v in samples if t >= now - 20.0)
+        # Only the increasing suffix of the window is kept
+        assert len(window.items) <= 41
+    window.expire(float('inf'))
+    assert window.value() is None
+
+
+def feed_round(monitor, round_id, e, now, client_id='client1'):
+    verdict = None
+    for sender in VERIFIERS:
+        others = [i for i in VERIFIERS if i != sender]
+        verdict = monitor.add_result(round_id, client_id, sender, {i: e for i in others}, {i: 0.004 for i in others}, now)
+    return verdict
+
+
+def owds_of(e):
+    monitor = PresenceMonitor(VerdictAggregator(VERIFIERS))
+    monitor.add_client('client1', 'monitor-x')
+    return feed_round(monitor, 'r', e, 0.0)['owds']
+
+
+def test_verdict_uses_the_minimum_within_the_window():
+    monitor = PresenceMonitor(VerdictAggregator(VERIFIERS), window=60.0)
+    monitor.add_client('client1', 'monitor-1')
+    assert feed_round(monitor, 'r1', 0.006, 0.0)['owds'] == owds_of(0.006)
+    # A slower round does not raise the windowed minimum
+    verdict = feed_round(monitor, 'r2', 0.009, 30.0)
+    assert verdict['owds'] == owds_of(0.006)
+    assert (verdict['session_id'], verdict['iteration']) == ('monitor-1', 2)
+    # Once the fast round leaves the window, the slower one is the minimum
+    verdict = feed_round(monitor, 'r3', 0.012, 70.0)
+    assert verdict['owds'] == owds_of(0.009)
+    assert feed_round(monitor, 'r4', 0.012, 100.0)['owds'] == owds_of(0.012)
+
+
+def test_incomplete_rounds_and_unknown_clients_give_no_verdict():
+    monitor = PresenceMonitor(VerdictAggregator(VERIFIERS), max_pending_rounds=2)
+    monitor.add_client('client1', 'monitor-1')
+    assert monitor.add_result('r1', 'client1', 'server1', {'server2': 0.006}, {'server2': 0.004}, 0.0) is None
+    assert monitor.add_result('r1', 'client1', 'server9', {}, {}, 0.0) is None
+    assert feed_round(monitor, 'r1', 0.006, 0.0, client_id='client2') is None
+    for round_id in ('r2', 'r3', 'r4'):
+        monitor.add_result(round_id, 'client1', 'server1', {'server2': 0.006}, {'server2': 0.004}, 0.0)
+    assert list(monitor.pending) == ['r3', 'r4']
+    assert monitor.remove_client('client1') is not None
+    assert monitor.client_ids() == []
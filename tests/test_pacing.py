@@ -0,0 +1,76 @@
+import math
+import time
+
+import pytest
+
+from cpv import pacing
+from cpv.pacing import ProbePacer, TokenBucket
+
+from .conftest import wait_for
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(pacing.time, 'monotonic', clock)
+    return clock
+
+
+def test_bucket_refills_at_its_rate_up_to_the_burst(clock):
+    bucket = TokenBucket(rate=10.0, burst=4)
+    assert [bucket.reserve() for _ in range(4)] == [0.0] * 4
+    # Later reservations queue behind the earlier ones
+    assert [round(bucket.reserve(), 6) for _ in range(2)] == [0.1, 0.2]
+    clock.now += 0.5
+    assert math.isclose(bucket.tokens + 0.5 * bucket.rate, 3.0)
+    assert bucket.reserve() == 0.0
+    # A long idle period refills no more than the burst
+    clock.now += 100.0
+    assert [bucket.reserve() for _ in range(4)] == [0.0] * 4
+    assert math.isclose(bucket.reserve(), 0.1)
+
+
+def test_reservation_beyond_max_wait_takes_no_token(clock):
+    bucket = TokenBucket(rate=10.0, burst=1)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve(max_wait=0.05) is None
+    assert math.isclose(bucket.reserve(max_wait=0.1), 0.1)
+    bucket.refund()
+    clock.now += 0.1
+    assert bucket.reserve() == 0.0
+
+
+def test_pacer_drops_probes_a_link_cannot_take_and_refunds_the_host(clock):
+    pacer = ProbePacer(host_rate=100.0, host_burst=2, link_rate=1.0, link_burst=1, spread=0.0, max_wait=0.5)
+    assert pacer.reserve('server2') == 0.0
+    # The link would need a second: the probe is dropped and the host token returned
+    assert pacer.reserve('server2') is None
+    assert pacer.reserve('server3') == 0.0
+    assert pacer.host.tokens == 0
+    clock.now += 1.0
+    assert pacer.reserve('server2') == 0.0
+
+
+def test_delayed_probes_run_in_due_order():
+    pacer = ProbePacer(host_rate=20.0, host_burst=1, link_rate=100.0, link_burst=10, spread=0.0, max_wait=0.5)
+    sent = []
+    try:
+        for probe in range(4):
+            assert pacer.call('server2', lambda probe=probe: sent.append((probe, time.monotonic())))
+        assert wait_for(lambda: len(sent) >= 4, timeout=2.0)
+        assert [probe for probe, _ in sent[:4]] == [0, 1, 2, 3]
+        # Spaced by the host rate
+        assert all(b - a >= 0.04 for (_, a), (_, b) in zip(sent, sent[1:4]))
+        # Once the host bucket is 0.5s behind, further probes are dropped
+        assert not all(pacer.call('server2', sent.append, None) for _ in range(20))
+        assert pacer.dropped > 0
+    finally:
+        pacer.close()
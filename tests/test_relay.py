@@ -0,0 +1,72 @@
+import random
+
+from cpv.relay import RelayDetector
+from cpv.server_architecture import Server
+
+from .conftest import free_ports
+
+CLIENT_OWDS = {1: 0.010, 2: 0.012, 3: 0.008}  # Client to verifier, by triangle position
+VERIFIER_OWD = 0.015
+CLOCK_OFFSETS = {'server1': 0.0, 'server2': 0.040, 'server3': -0.025}
+
+
+def round_sums(rng, offsets, relay=None, jitter=0.0002):
+    """
+    dic + dcj of one round as verifier j measures them, against verifier i's clock.
+    A relay delays the forwards to verifier 3 only.
+    """
+    e = {}
+    for i in (1, 2, 3):
+        for j in (1, 2, 3):
+            if i != j:
+                extra = relay if relay is not None and j == 3 else 0.0
+                e[(i, j)] = CLIENT_OWDS[i] + CLIENT_OWDS[j] + extra + offsets[j] - offsets[i] + rng.gauss(0, jitter)
+    dv = {(i, j): VERIFIER_OWD for i in (1, 2, 3) for j in (1, 2, 3) if i != j}
+    return e, dv
+
+
+def test_forward_dispersion_flags_a_relayed_client_across_sessions():
+    rng = random.Random(3)
+    detector = RelayDetector()
+    # Ten one-iteration sessions; the scores carry over from one to the next
+    for _ in range(10):
+        for sender in ('server2', 'server3'):
+            detector.add_sample('client-direct', sender, 0.020 + rng.gauss(0, 0.0005))
+            detector.add_sample('client-relayed', sender, 0.020 + rng.expovariate(1 / 0.02))
+    assert detector.suspicious() == ['client-relayed']
+    detector.reset('client-relayed')
+    assert detector.scores('client-relayed') is None
+
+
+def test_server_scores_rounds_net_of_verifier_clock_offsets(tmp_path):
+    ports = free_ports(3)
+    peers = {'server2': ('127.0.0.1', ports[1]), 'server3': ('127.0.0.1', ports[2])}
+    server = Server(
+        '127.0.0.1', ports[0], peers, 'server1',
+        delays_mp_file=str(tmp_path / 'mp.json'), delays_av_file=str(tmp_path / 'av.json'),
+    )
+    try:
+        server.clock_offsets.update({peer: CLOCK_OFFSETS[peer] for peer in peers})
+        offsets = {position: CLOCK_OFFSETS[v] for position, v in enumerate(server.aggregator.verifier_ids, start=1)}
+        rng = random.Random(5)
+        for iteration in range(1, 11):
+            e, dv = round_sums(rng, offsets)
+            server._score_aggregated_round('sess-direct', 'client-direct', iteration, e, dv, {})
+            e, dv = round_sums(rng, offsets, relay=0.030)
+            server._score_aggregated_round('sess-relayed', 'client-relayed', iteration, e, dv, {})
+        assert server.relay_detector.suspicious() == ['client-relayed']
+        assert server.relay_scores('client-direct')['asymmetry'] < 0.1
+    finally:
+        server.shutdown()
+
+
+def test_uncorrected_clock_offsets_look_like_a_relay():
+    rng = random.Random(5)
+    offsets = {1: 0.0, 2: 0.040, 3: -0.025}
+    corrected, uncorrected = RelayDetector(), RelayDetector()
+    for _ in range(10):
+        e, dv = round_sums(rng, offsets)
+        corrected.add_round('client1', e, dv, offsets)
+        uncorrected.add_round('client1', e, dv)
+    assert not corrected.suspicious()
+    assert uncorrected.suspicious() == ['client1']
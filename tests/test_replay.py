@@ -0,0 +1,68 @@
+import json
+
+import numpy as np
+
+from cpv.replay import iter_delay_records, rounds_from_delay_logs
+
+VERIFIERS = ['server1', 'server2', 'server3']
+
+
+def write_log(path, entries):
+    with open(path, 'w') as file:
+        for session_id, iteration, timestamp, data in entries:
+            file.write(json.dumps({
+                'session_id': session_id, 'iteration': iteration, 'timestamp': timestamp, 'data': data,
+            }) + '\n')
+    return str(path)
+
+
+def mp(pair, value):
+    return {'dic_dcj': {pair: value}}
+
+
+def av(peer, value):
+    return {'delays': {peer: value}}
+
+
+def test_logs_of_several_verifiers_are_merged_into_rounds(tmp_path):
+    mp_files = [
+        write_log(tmp_path / 'mp1.json', [('s1', 2, 10.2, mp('server2_server1', 0.005)), ('s2', 1, 12.0, mp('server2_server1', 0.007))]),
+        write_log(tmp_path / 'mp2.json', [('s1', 1, 10.0, mp('server3_server2', 0.004))]),
+        write_log(tmp_path / 'mp3.json', []),
+    ]
+    av_files = [
+        write_log(tmp_path / 'av1.json', [('s1', 1, 10.1, av('server2', 0.002))]),
+        write_log(tmp_path / 'av2.json', []),
+        write_log(tmp_path / 'av3.json', [('s2', 1, 12.1, av('server1', 0.003))]),
+    ]
+    (rounds,) = rounds_from_delay_logs(mp_files, av_files, VERIFIERS)
+    # Sessions in order of completion, rounds sorted by iteration
+    assert rounds.sessions.tolist() == [0, 0, 1]
+    assert rounds.eij[0, 2, 1] == 0.004 and rounds.dv[0, 0, 1] == 0.002
+    assert rounds.eij[1, 1, 0] == 0.005
+    assert np.isnan(rounds.dv[1]).all()
+    assert rounds.eij[2, 1, 0] == 0.007 and rounds.dv[2, 2, 0] == 0.003
+
+
+def test_records_after_the_session_gap_are_dropped(tmp_path):
+    mp_files = [write_log(tmp_path / 'mp1.json', [
+        ('s1', 1, 0.0, mp('server2_server1', 0.005)),
+        ('s2', 1, 50.0, mp('server2_server1', 0.006)),
+        ('s1', 2, 51.0, mp('server2_server1', 0.001)),
+    ])]
+    (rounds,) = rounds_from_delay_logs(mp_files, [], VERIFIERS, session_gap=30.0)
+    assert rounds.sessions.tolist() == [0, 1]
+    assert rounds.eij[0, 1, 0] == 0.005 and rounds.eij[1, 1, 0] == 0.006
+
+
+def test_sessions_are_never_split_across_chunks(tmp_path):
+    entries = [(f's{s}', i, s * 100.0 + i, mp('server2_server1', 0.001 * i)) for s in range(5) for i in (1, 2, 3)]
+    chunks = list(rounds_from_delay_logs([write_log(tmp_path / 'mp1.json', entries)], [], VERIFIERS, chunk_sessions=2))
+    assert [chunk.sessions.tolist() for chunk in chunks] == [[0, 0, 0, 1, 1, 1]] * 2 + [[0, 0, 0]]
+    assert chunks[0].eij[:3, 1, 0].tolist() == [0.001, 0.002, 0.003]
+
+
+def test_segmented_logs_are_read_in_order(tmp_path):
+    write_log(tmp_path / 'delays_mp.000001.json', [('s1', 1, 1.0, mp('server2_server1', 0.005))])
+    path = write_log(tmp_path / 'delays_mp.json', [('s1', 2, 2.0, mp('server2_server1', 0.004))])
+    assert [(session, iteration) for session, iteration, _ in iter_delay_records(path)] == [('s1', 1), ('s1', 2)]
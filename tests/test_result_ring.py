@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from cpv.result_ring import AV_SAMPLE, MP_SAMPLE, VERDICT, VERDICT_OWD, ResultRing, ResultRingReader
+
+
+def publish_samples(ring, iterations):
+    for iteration in iterations:
+        ring.log_av('s1', iteration, {'delays': {'server2': iteration / 1000}}, 'client1', 'server1')
+
+
+def seqs(views):
+    return [int(seq) for view in views for seq in view['seq']]
+
+
+@pytest.fixture
+def ring():
+    ring = ResultRing(capacity=4)
+    yield ring
+    ring.close()
+
+
+def test_reader_sees_records_in_order_across_the_wraparound(ring):
+    reader = ResultRingReader(ring.name)
+    publish_samples(ring, range(1, 4))
+    views, lost = reader.poll()
+    assert (seqs(views), lost) == ([1, 2, 3], 0)
+    # Records 4 to 6 wrap the end of the ring, so they come back as two views
+    publish_samples(ring, range(4, 7))
+    views, lost = reader.poll()
+    assert [len(view) for view in views] == [1, 2]
+    assert (seqs(views), lost) == ([4, 5, 6], 0)
+    assert [float(value) for view in views for value in view['value']] == [0.004, 0.005, 0.006]
+    # The views alias the ring, they are not copies
+    assert all(np.shares_memory(view, reader.records) for view in views)
+    reader.close()
+
+
+def test_overrun_is_reported_and_the_reader_skips_ahead(ring):
+    reader = ResultRingReader(ring.name)
+    publish_samples(ring, range(1, 11))
+    views, lost = reader.poll(max_records=3)
+    assert (seqs(views), lost) == ([7, 8, 9], 6)
+    assert reader.overwritten(6) and not reader.overwritten(7)
+    views, lost = reader.poll()
+    assert (seqs(views), lost) == ([10], 0)
+    assert reader.lost == 6
+    reader.close()
+
+
+def test_from_start_reads_the_oldest_records_still_held(ring):
+    publish_samples(ring, range(1, 7))
+    reader = ResultRingReader(ring.name, from_start=True)
+    assert seqs(reader.poll()[0]) == [3, 4, 5, 6]
+    late = ResultRingReader(ring.name)
+    assert late.poll() == ([], 0)
+    reader.close()
+    late.close()
+
+
+def test_sink_records_carry_their_kind_and_identifiers():
+    ring = ResultRing(capacity=16)
+    reader = ResultRingReader(ring.name)
+    ring.log_mp('s1', 2, {'dic_dcj': {'server2_server1': 0.004}}, 'client1', 'server1')
+    ring.log_verdict('s1', 'client1', True, 0.9, {'server1': 0.001})
+    (view,), _ = reader.poll()
+    assert view['kind'].tolist() == [MP_SAMPLE, VERDICT, VERDICT_OWD]
+    assert view['pair'].tolist() == [b'server2_server1', b'', b'server1']
+    assert view['inside'].tolist() == [-1, 1, 1]
+    assert view[0]['iteration'] == 2 and view[0]['session_id'] == b's1' and view[0]['client_id'] == b'client1'
+    assert AV_SAMPLE not in view['kind']
+    reader.close()
+    ring.close()
+
@@ -0,0 +1,63 @@
+import json
+import sqlite3
+import time
+
+from cpv.result_store import FanoutSink, JSONFileSink, SQLiteResultStore
+
+from .conftest import wait_for
+
+
+def test_sqlite_store_answers_client_session_and_verdict_queries(tmp_path):
+    store = SQLiteResultStore(str(tmp_path / 'results.db'), flush_interval=0.01)
+    store.log_session('s1', 'client1', 'server1')
+    store.log_mp('s1', 1, {'dic_dcj': {'server2_server1': 0.004}}, 'client1', 'server1')
+    store.log_av('s1', 2, {'delays': {'server2': 0.002}}, 'client1', 'server1')
+    store.log_mp('s2', 1, {'dic_dcj': {'server2_server1': 0.005}}, 'client2', 'server1')
+    store.log_verdict('s1', 'client1', False, 0.4, {'1': 0.001})
+    store.log_verdict('s3', 'client1', True, 0.9, {'1': 0.002})
+    assert wait_for(lambda: store.latest_verdict('client1') is not None and len(store.session_samples('s1')) == 2)
+    samples = store.session_samples('s1')
+    assert [(s['protocol'], s['iteration'], s['pair'], s['value']) for s in samples] == [
+        ('mp', 1, 'server2_server1', 0.004), ('av', 2, 'server2', 0.002),
+    ]
+    assert {s['session_id'] for s in store.client_samples('client2')} == {'s2'}
+    assert store.client_samples('client1', since=time.time() + 60) == []
+    verdict = store.latest_verdict('client1')
+    assert (verdict['session_id'], verdict['inside'], verdict['owds']) == ('s3', True, {'1': 0.002})
+    assert store.latest_verdict('client9') is None
+    store.close()
+
+
+def test_close_commits_everything_queued(tmp_path):
+    path = str(tmp_path / 'results.db')
+    store = SQLiteResultStore(path, batch_size=7, flush_interval=10.0)
+    for iteration in range(1, 101):
+        store.log_av('s1', iteration, {'delays': {'server2': 0.002, 'server3': 0.003}}, 'client1', 'server1')
+    store.close()
+    with sqlite3.connect(path) as connection:
+        assert connection.execute("SELECT COUNT(*) FROM samples").fetchone() == (200,)
+
+
+def test_retention_deletes_old_rows(tmp_path):
+    store = SQLiteResultStore(str(tmp_path / 'results.db'), flush_interval=0.01, retention_days=1)
+    with sqlite3.connect(store.path) as connection:
+        connection.execute("INSERT INTO verdicts VALUES ('old', 'client1', 1, 1.0, '{}', ?)", (time.time() - 2 * 86400,))
+    store.log_verdict('new', 'client1', True, 1.0, {})
+    store.close()
+    with sqlite3.connect(store.path) as connection:
+        assert connection.execute("SELECT session_id FROM verdicts").fetchall() == [('new',)]
+
+
+def test_fanout_writes_every_sink(tmp_path):
+    json_sink = JSONFileSink(str(tmp_path / 'mp.json'), str(tmp_path / 'av.json'))
+    store = SQLiteResultStore(str(tmp_path / 'results.db'), flush_interval=0.01)
+    sink = FanoutSink([json_sink, store])
+    sink.log_mp('s1', 1, {'dic_dcj': {'server2_server1': 0.004}}, 'client1', 'server1')
+    sink.log_verdict('s1', 'client1', True, 1.0, {})
+    sink.close()
+    (entry,) = [json.loads(line) for line in (tmp_path / 'mp.json').read_text().splitlines()]
+    assert (entry['session_id'], entry['data']) == ('s1', {'dic_dcj': {'server2_server1': 0.004}})
+    assert not (tmp_path / 'av.json').exists() or not (tmp_path / 'av.json').read_text()
+    with sqlite3.connect(str(tmp_path / 'results.db')) as connection:
+        assert connection.execute("SELECT COUNT(*) FROM samples").fetchone() == (1,)
+        assert connection.execute("SELECT COUNT(*) FROM verdicts").fetchone() == (1,)
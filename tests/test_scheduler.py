@@ -0,0 +1,72 @@
+import threading
+import time
+
+from cpv.scheduler import Job, MeasurementScheduler
+
+from .conftest import wait_for
+
+
+def blocked_scheduler(**kwargs):
+    """
+    A scheduler whose single worker is held by a first job until the returned event is set.
+    """
+    scheduler = MeasurementScheduler(**kwargs)
+    release, started = threading.Event(), threading.Event()
+    scheduler.submit(Job('hold', 'ops', 1, lambda: (started.set(), release.wait(5))))
+    assert started.wait(5)
+    return scheduler, release
+
+
+def test_tenants_share_by_weight():
+    scheduler, release = blocked_scheduler(tenant_weights={'heavy': 2.0})
+    order = []
+    for i in range(4):
+        for tenant in ('light', 'heavy'):
+            scheduler.submit(Job(f'{tenant}{i}', tenant, 2, lambda tenant=tenant: order.append(tenant)))
+    release.set()
+    assert wait_for(lambda: len(order) == 8)
+    # Twice the weight, twice the sessions while both tenants have work queued
+    assert order[:6].count('heavy') == 4
+    assert scheduler.metrics()['completed'] == 9
+
+
+def test_sessions_run_one_at_a_time():
+    scheduler = MeasurementScheduler()
+    running, overlap = [0], []
+
+    def run():
+        running[0] += 1
+        overlap.append(running[0])
+        time.sleep(0.01)
+        running[0] -= 1
+
+    for i in range(5):
+        scheduler.submit(Job(f's{i}', 'ops', 1, run))
+    assert wait_for(lambda: scheduler.metrics()['completed'] == 5)
+    assert max(overlap) == 1
+    scheduler.set_capacity(probes_per_second=10000, probes_per_iteration=9)
+    assert scheduler.max_concurrent == 1
+
+
+def test_overload_is_rejected_at_submission():
+    rejected = []
+    scheduler, release = blocked_scheduler(max_queue=2, on_reject=lambda job, reason: rejected.append((job.session_id, reason)))
+    assert scheduler.submit(Job('a', 'ops', 1, lambda: None))
+    assert scheduler.submit(Job('b', 'ops', 1, lambda: None))
+    assert not scheduler.submit(Job('c', 'ops', 1, lambda: None))
+    release.set()
+    assert wait_for(lambda: scheduler.metrics()['queued'] == 0)
+    # Ten iterations cannot finish within a second
+    assert not scheduler.submit(Job('d', 'ops', 10, lambda: None, deadline=time.time() + 1))
+    assert rejected == [('c', 'queue_full'), ('d', 'deadline')]
+
+
+def test_queued_job_past_its_deadline_is_dropped():
+    rejected, ran = [], []
+    scheduler, release = blocked_scheduler(on_reject=lambda job, reason: rejected.append((job.session_id, reason)))
+    scheduler.round_seconds = 0.01
+    scheduler.submit(Job('late', 'ops', 1, lambda: ran.append('late'), deadline=time.time() + 0.2))
+    time.sleep(0.3)
+    release.set()
+    assert wait_for(lambda: rejected)
+    assert rejected == [('late', 'deadline')] and not ran
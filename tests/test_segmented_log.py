@@ -0,0 +1,117 @@
+import json
+import os
+import time
+
+from cpv.segmented_log import SegmentedLog, segment_files
+
+from .conftest import wait_for
+
+
+def entry(session_id, timestamp, value=0.001):
+    return {"session_id": session_id, "iteration": 1, "timestamp": timestamp, "data": {"dic_dcj": {"a_b": value}}}
+
+
+def open_log(path, **kwargs):
+    return SegmentedLog(str(path), max_segment_bytes=200, compact_after=100, compact_interval=0, **kwargs)
+
+
+def lines(path):
+    with open(path) as file:
+        return [json.loads(line) for line in file]
+
+
+def test_roll_keeps_writing_the_base_path(tmp_path):
+    path = tmp_path / "delays_mp.json"
+    log = open_log(path)
+    for i in range(10):
+        log.append(entry(f"s{i}", 1000.0 + i))
+    log.close()
+    files = segment_files(str(path))
+    assert files[-1] == str(path)
+    assert len(files) > 2
+    # The newest entry is in the base file, and every entry appears once, in order
+    assert lines(path)[-1]["session_id"] == "s9"
+    assert [e["session_id"] for name in files for e in lines(name)] == [f"s{i}" for i in range(10)]
+
+
+def test_restart_resumes_the_base_file(tmp_path):
+    path = tmp_path / "delays_mp.json"
+    log = open_log(path)
+    log.append(entry("s0", 1000.0))
+    log.close()
+    log = open_log(path)
+    log.append(entry("s1", 1001.0))
+    assert [e["session_id"] for e in lines(path)] == ["s0", "s1"]
+    assert [e["session_id"] for e in log.read_session("s0")] == ["s0"]
+    log.close()
+
+
+def test_segments_sealed_without_an_index_update_are_indexed(tmp_path):
+    path = tmp_path / "delays_mp.json"
+    log = open_log(path)
+    log.append(entry("s0", 1000.0))
+    log.close()
+    # A crash between renaming the active segment and saving the index
+    os.replace(path, tmp_path / "delays_mp.000001.json")
+    log = open_log(path)
+    assert [segment["segment"] for segment in log.segments()] == [str(tmp_path / "delays_mp.000001.json")]
+    assert len(log.read_session("s0")) == 1
+    log.close()
+
+
+def test_compact_replaces_old_segments_with_summaries(tmp_path):
+    path = tmp_path / "delays_mp.json"
+    log = open_log(path)
+    for i in range(10):
+        log.append(entry(f"s{i}", 1000.0 + i, 0.001 * (i + 1)))
+    sealed = [segment["segment"] for segment in log.segments()[:-1]]
+    assert log.compact(now=2000.0) == len(sealed)
+    assert not any(os.path.exists(name) for name in sealed)
+    summaries = log.summaries()
+    assert len(summaries) == 1
+    assert summaries[0]["field"] == "dic_dcj" and summaries[0]["pair"] == "a_b"
+    assert summaries[0]["min"] == 0.001
+    # The active segment is not compacted
+    assert os.path.exists(path)
+    assert log.compact(now=2000.0) == 0
+    log.close()
+
+
+def test_uncommitted_summaries_are_discarded(tmp_path):
+    path = tmp_path / "delays_mp.json"
+    log = open_log(path)
+    for i in range(10):
+        log.append(entry(f"s{i}", 1000.0 + i))
+    log.compact(now=2000.0)
+    log.close()
+    # Summaries of a compaction that crashed before its index update
+    orphan = tmp_path / "delays_mp.summary.000002.json"
+    orphan.write_text(json.dumps({"hour": 0, "field": "dic_dcj", "pair": "a_b", "count": 1}) + "\n")
+    log = open_log(path)
+    assert len(log.summaries()) == 1
+    assert not orphan.exists()
+    log.close()
+
+
+def test_idle_active_segment_is_sealed_and_compacted(tmp_path):
+    path = tmp_path / "delays_mp.json"
+    log = open_log(path, max_segment_seconds=60)
+    log.append(entry("s0", 1000.0))
+    assert not log.seal_expired(now=1030.0)
+    # No further entries arrive, but the segment still ages out
+    assert log.seal_expired(now=1060.0)
+    assert not path.exists()
+    assert [segment["sessions"] for segment in log.segments()] == [["s0"]]
+    assert log.compact(now=1200.0) == 1
+    assert log.summaries()[0]["count"] == 1
+    assert not log.seal_expired(now=5000.0)
+    log.close()
+
+
+def test_compaction_pass_seals_an_idle_log(tmp_path):
+    path = tmp_path / "delays_mp.json"
+    log = SegmentedLog(str(path), max_segment_seconds=0.05, compact_after=0.05, compact_interval=0.02)
+    log.append(entry("s0", time.time()))
+    assert wait_for(lambda: log.summaries(), timeout=5.0)
+    assert not path.exists()
+    log.close()
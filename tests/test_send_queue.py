@@ -0,0 +1,101 @@
+import socket
+import threading
+
+from cpv.send_queue import DISCONNECT, SendQueue
+
+from .conftest import wait_for
+
+
+class BlockingConnection:
+    """
+    A connection whose sendall blocks until released, like a peer with a full TCP window.
+    """
+
+    def __init__(self):
+        self.released = threading.Event()
+        self.writing = threading.Event()
+        self.sent = []
+        self.shut_down = False
+
+    def sendall(self, data):
+        self.writing.set()
+        self.released.wait(5)
+        self.sent.append(data)
+
+    def shutdown(self, how):
+        self.shut_down = True
+        self.released.set()
+
+
+def test_messages_arrive_in_order_with_rendered_ones_in_place():
+    left, right = socket.socketpair()
+    queue = SendQueue(left, 'peer')
+    try:
+        expected = b""
+        for i in range(200):
+            message = f"M{i}\n".encode()
+            queue.send((lambda message=message: message) if i % 3 == 0 else message, len(message))
+            expected += message
+        received = b""
+        right.settimeout(5)
+        while len(received) < len(expected):
+            received += right.recv(65536)
+        assert received == expected
+        assert wait_for(lambda: queue.metrics()["sent_messages"] == 200)
+        assert queue.metrics()["sent_bytes"] == len(expected)
+    finally:
+        queue.close()
+        left.close()
+        right.close()
+
+
+def test_full_queue_drops_new_messages_and_keeps_the_rest():
+    connection = BlockingConnection()
+    queue = SendQueue(connection, 'slow', max_messages=3)
+    queue.send(b"a")
+    assert connection.writing.wait(5)
+    # The writer is stuck on "a"; three more fit, the fourth is dropped
+    assert all(queue.send(data) for data in (b"b", b"c", b"d"))
+    assert not queue.send(b"e")
+    assert queue.metrics()["dropped"] == 1 and queue.metrics()["depth"] == 3
+    connection.released.set()
+    assert wait_for(lambda: b"".join(connection.sent) == b"abcd")
+    queue.close()
+
+
+def test_byte_bound_counts_queued_bytes():
+    connection = BlockingConnection()
+    queue = SendQueue(connection, 'slow', max_bytes=10)
+    queue.send(b"first")
+    assert connection.writing.wait(5)
+    assert queue.send(b"x" * 6)
+    assert not queue.send(b"y" * 5)
+    assert queue.send(b"z" * 4)
+    connection.released.set()
+    queue.close()
+
+
+def test_slow_consumer_is_disconnected():
+    connection = BlockingConnection()
+    closed = []
+    queue = SendQueue(connection, 'slow', max_messages=1, policy=DISCONNECT, on_close=closed.append)
+    queue.send(b"a")
+    assert connection.writing.wait(5)
+    assert queue.send(b"b")
+    assert not queue.send(b"c")
+    assert connection.shut_down
+    assert queue.metrics()["closed"] and not queue.send(b"d")
+    assert wait_for(lambda: closed == [queue])
+    # The message queued behind the stuck write is discarded
+    assert connection.sent == [b"a"]
+
+
+def test_send_error_closes_the_queue():
+    left, right = socket.socketpair()
+    right.close()
+    left.close()
+    closed = []
+    queue = SendQueue(left, 'gone', on_close=closed.append)
+    queue.send(b"a")
+    assert wait_for(lambda: closed == [queue])
+    assert not queue.send(b"b")
@@ -0,0 +1,133 @@
+import time
+
+import pytest
+
+from cpv import cpv_utils
+from cpv.aggregator import VerdictAggregator
+from cpv.client_architecture import Client
+
+from .conftest import wait_for
+
+
+def test_aggregator_needs_three_verifiers():
+    with pytest.raises(ValueError):
+        VerdictAggregator(['server1', 'server2'])
+
+
+def test_round_completes_with_the_client_of_any_result():
+    aggregator = VerdictAggregator(['server1', 'server2', 'server3'])
+    rounds = []
+    aggregator.add_listener(lambda *args: rounds.append(args))
+    ids = ['server1', 'server2', 'server3']
+    verdict = None
+    for sender in ids:
+        others = [i for i in ids if i != sender]
+        # Only the verifier the client asked carries its identifier
+        client_id = 'client1' if sender == 'server2' else None
+        verdict = aggregator.add_result(
+            'sess', 1, sender, {i: 0.002 for i in others}, {i: 0.001 for i in others}, client_id
+        )
+    assert verdict is not None
+    assert verdict['client_id'] == 'client1'
+    assert verdict['session_id'] == 'sess'
+    assert set(verdict['owds']) == set(ids)
+    assert rounds[0][:3] == ('sess', 'client1', 1)
+    assert not aggregator.pending
+
+
+def test_incomplete_rounds_are_bounded():
+    aggregator = VerdictAggregator(['server1', 'server2', 'server3'], max_pending_rounds=4)
+    for iteration in range(1, 11):
+        aggregator.add_result('sess', iteration, 'server1', {}, {})
+    assert list(aggregator.pending) == [('sess', iteration) for iteration in range(7, 11)]
+
+
+def test_client_started_session_reaches_only_its_client(mesh):
+    servers, addresses = mesh
+    owner = Client('client-owner', addresses)
+    other = Client('client-other', addresses)
+    owner.connect_to_servers()
+    other.connect_to_servers()
+    try:
+        assert wait_for(lambda: all(
+            {'client-owner', 'client-other'} <= set(server.client_connections) for server in servers
+        ))
+        # Ask a verifier that is not the aggregator; it passes the session on
+        owner.send_queues['server2'].send(
+            cpv_utils.construct_message(cpv_utils.START_MEASUREMENTS, 'sess-owned', 1).encode()
+        )
+        assert wait_for(lambda: owner.verdicts, timeout=15.0)
+        assert {verdict['session_id'] for verdict in owner.verdicts.values()} == {'sess-owned'}
+        # Every verifier caches the verdict for the owner
+        assert wait_for(lambda: all(
+            server.verdict_cache.get('client-owner', server.client_addresses['client-owner']) for server in servers
+        ))
+        assert not other.verdicts
+    finally:
+        owner.shutdown()
+        other.shutdown()
+
+
+def test_concurrent_clients_only_measure_their_own_sessions(mesh):
+    servers, addresses = mesh
+    samples = []
+    for server in servers:
+        add_sample = server.relay_detector.add_sample
+
+        def spy(client_id, sender_id, value, server=server, add_sample=add_sample):
+            samples.append((server.session_id, client_id))
+            add_sample(client_id, sender_id, value)
+
+        server.relay_detector.add_sample = spy
+    clients = {name: Client(name, addresses) for name in ('client-a', 'client-b', 'client-rogue')}
+    for client in clients.values():
+        client.connect_to_servers()
+    try:
+        assert wait_for(lambda: all(set(clients) <= set(server.client_connections) for server in servers))
+        for name, session_id in (('client-a', 'sess-a'), ('client-b', 'sess-b')):
+            clients[name].send_queues['server1'].send(
+                cpv_utils.construct_message(cpv_utils.START_MEASUREMENTS, session_id, 1).encode()
+            )
+
+        def forward_rogue_timestamps():
+            # A client forwarding timestamps of sessions it does not own
+            for server_id, queue in list(clients['client-rogue'].send_queues.items()):
+                queue.send(cpv_utils.construct_message(
+                    cpv_utils.FORWARD_TIMESTAMP, 'server1' if server_id != 'server1' else 'server2',
+                    time.time() - 0.001, 1, '0.000000'
+                ).encode())
+            return all(clients[name].verdicts for name in ('client-a', 'client-b'))
+
+        assert wait_for(forward_rogue_timestamps, timeout=20.0)
+        assert {v['session_id'] for v in clients['client-a'].verdicts.values()} == {'sess-a'}
+        assert {v['session_id'] for v in clients['client-b'].verdicts.values()} == {'sess-b'}
+        assert {session for session, _ in samples} == {'sess-a', 'sess-b'}
+        assert {client for session, client in samples if session == 'sess-a'} == {'client-a'}
+        assert {client for session, client in samples if session == 'sess-b'} == {'client-b'}
+    finally:
+        for client in clients.values():
+            client.shutdown()
+
+
+def test_only_the_final_verdict_is_published(mesh):
+    servers, addresses = mesh
+    published = []
+    for server in servers:
+        publish = server._publish_verdict
+
+        def spy(verdict, publish=publish):
+            published.append(verdict)
+            publish(verdict)
+
+        server._publish_verdict = spy
+    client = Client('client1', addresses)
+    client.connect_to_servers()
+    try:
+        assert wait_for(lambda: all('client1' in server.client_connections for server in servers))
+        client.send_queues['server1'].send(
+            cpv_utils.construct_message(cpv_utils.START_MEASUREMENTS, 'sess-two', 2).encode()
+        )
+        assert wait_for(lambda: client.verdicts, timeout=20.0)
+        assert [(v['session_id'], v['iteration']) for v in published] == [('sess-two', 2)]
+    finally:
+        client.shutdown()
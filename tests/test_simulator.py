@@ -0,0 +1,39 @@
+import numpy as np
+
+from cpv.simulator import LinkModel, Simulator
+
+VERIFIERS = ['Bangalore', 'Mumbai', 'Jorhat']
+CLIENTS = {'Mumbai': True, 'Delhi': False}
+WALL_CLOCK = ('wall_seconds', 'sessions_per_minute')
+
+
+def links():
+    rng = np.random.default_rng(0)
+    model = LinkModel()
+    for a, b, owd in (
+        ('Bangalore', 'Mumbai', 0.011), ('Bangalore', 'Jorhat', 0.045), ('Mumbai', 'Jorhat', 0.040),
+        ('Delhi', 'Bangalore', 0.020), ('Delhi', 'Mumbai', 0.013), ('Delhi', 'Jorhat', 0.025),
+    ):
+        model.add(a, b, owd + rng.exponential(0.003, 200))
+    return model
+
+
+def run(mode, seed, **kwargs):
+    simulator = Simulator(links(), VERIFIERS, iterations=3, seed=seed, service_time=0.0001)
+    report = getattr(simulator, mode)(CLIENTS, 200, **kwargs)
+    return {key: value for key, value in report.items() if key not in WALL_CLOCK}
+
+
+def test_fixed_seed_reproduces_the_bulk_report():
+    report = run('run_bulk', seed=42)
+    assert report == run('run_bulk', seed=42)
+    assert report['duration'] != run('run_bulk', seed=43)['duration']
+    assert report['sessions'] == 200 and set(report['per_client']) == set(CLIENTS)
+
+
+def test_fixed_seed_reproduces_the_event_report():
+    report = run('run_events', seed=42, rate=50.0)
+    assert report == run('run_events', seed=42, rate=50.0)
+    assert report['duration'] != run('run_events', seed=43, rate=50.0)['duration']
+    assert report['sessions'] == 200
+    assert all(0 < utilization < 1 for utilization in report['utilization'].values())
@@ -0,0 +1,42 @@
+import json
+import os
+import subprocess
+import sys
+
+from .conftest import free_ports
+
+BENCH = os.path.join(os.path.dirname(__file__), 'bench_startup.py')
+READY_BUDGET = 0.1  # Seconds from importing cpv to a connected three-verifier mesh
+
+CONSTRUCT = """
+import sys, time
+start = time.perf_counter()
+from cpv.server_architecture import Server
+server = Server('127.0.0.1', {port}, {{'server2': ('127.0.0.1', 1), 'server3': ('127.0.0.1', 2)}}, 'server1')
+print(time.perf_counter() - start, 'numpy' in sys.modules)
+"""
+
+
+def run_python(args, cwd, **kwargs):
+    env = dict(os.environ, PYTHONPATH=os.path.join(os.path.dirname(__file__), '..', 'src'))
+    return subprocess.run([sys.executable] + args, cwd=cwd, env=env, capture_output=True, text=True, check=True,
+                          **kwargs).stdout
+
+
+def test_construction_does_not_import_numpy(tmp_path):
+    port, = free_ports(1)
+    elapsed, numpy_loaded = run_python(['-c', CONSTRUCT.format(port=port)], tmp_path).split()
+    assert numpy_loaded == 'False'
+    assert float(elapsed) < READY_BUDGET
+    # Nothing is written until the server logs a result
+    assert not os.listdir(tmp_path)
+
+
+def test_mesh_is_ready_within_budget(tmp_path):
+    base_port = free_ports(1)[0]
+    runs = []
+    for _ in range(3):
+        output = run_python([BENCH, '--child', '--base-port', str(base_port)], tmp_path, timeout=30)
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+        base_port = free_ports(1)[0]
+    assert min(run['ready'] for run in runs) < READY_BUDGET
@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+import uuid
+
+from cpv.supervisor import MESH_HEADER, MeshState, shard_for
+
+CLIENTS = [f"client{i}" for i in range(200)]
+
+
+def test_published_state_is_read_by_an_attached_reader():
+    writer = MeshState(['server2', 'server3', 'server4'], create=True)
+    reader = MeshState(['server2', 'server3', 'server4'], name=writer.name)
+    try:
+        assert reader.read('server2') is None
+        writer.publish({'server2': 0.004, 'server3': 0.006}, {'server2': -0.25})
+        assert reader.read('server2') == (0.004, -0.25)
+        assert reader.read('server3') == (0.006, None)
+        # Not measured, and not part of the layout
+        assert reader.read('server4') is None
+        assert reader.read('server9') is None
+    finally:
+        reader.close()
+        writer.close(unlink=True)
+
+
+def test_read_gives_up_on_a_writer_that_died_mid_write():
+    writer = MeshState(['server2'], create=True)
+    reader = MeshState(['server2'], name=writer.name)
+    try:
+        writer.publish({'server2': 0.004}, {'server2': 0.1})
+        # A writer killed between its two counter updates leaves the counter odd
+        seq = MESH_HEADER.unpack_from(writer.shm.buf, 0)[0]
+        MESH_HEADER.pack_into(writer.shm.buf, 0, seq + 1)
+        assert reader.read('server2', retries=3, backoff=0.0) is None
+        # The next publish leaves an even counter again
+        writer.publish({'server2': 0.005}, {'server2': 0.1})
+        assert MESH_HEADER.unpack_from(writer.shm.buf, 0)[0] % 2 == 0
+        assert reader.read('server2', retries=3, backoff=0.0) == (0.005, 0.1)
+    finally:
+        reader.close()
+        writer.close(unlink=True)
+
+
+def test_shard_is_stable_across_processes():
+    shards = [shard_for(client_id, 4) for client_id in CLIENTS]
+    assert set(shards) == {0, 1, 2, 3}
+    assert shard_for('client1', 4) == shard_for('client1', 4) == 0
+    # Another interpreter, with another string hash seed, agrees on every shard
+    script = "from cpv.supervisor import shard_for; print([shard_for(f'client{i}', 4) for i in range(200)])"
+    env = dict(
+        os.environ, PYTHONHASHSEED=str(uuid.uuid4().int % 4294967295),
+        PYTHONPATH=os.path.join(os.path.dirname(__file__), '..', 'src'),
+    )
+    output = subprocess.run([sys.executable, '-c', script], env=env, capture_output=True, text=True, check=True).stdout
+    assert output.strip() == str(shards)
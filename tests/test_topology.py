@@ -0,0 +1,60 @@
+import random
+
+from cpv.server_architecture import Server
+from cpv.topology import TopologyRegistry
+
+from .conftest import free_ports
+
+
+def brute_force(registry, lat, lon):
+    enclosing = [
+        (triangle.area_deg, key) for key, triangle in registry.triangles.items()
+        if triangle.area_deg > 0 and triangle.contains(lat, lon)
+    ]
+    return registry.triangles[min(enclosing)[1]] if enclosing else None
+
+
+def random_registry(rng, count):
+    registry = TopologyRegistry(cell_size=2.0)
+    for index in range(count):
+        registry.add_verifier(f"server{index}", rng.uniform(8.0, 30.0), rng.uniform(70.0, 90.0))
+    return registry
+
+
+def test_selection_matches_a_brute_force_search():
+    rng = random.Random(7)
+    registry = random_registry(rng, 12)
+    for _ in range(500):
+        lat, lon = rng.uniform(5.0, 33.0), rng.uniform(67.0, 93.0)
+        assert registry.select_triangle(lat, lon) is brute_force(registry, lat, lon)
+
+
+def test_selection_follows_verifiers_joining_and_leaving():
+    rng = random.Random(11)
+    registry = random_registry(rng, 8)
+    points = [(rng.uniform(8.0, 30.0), rng.uniform(70.0, 90.0)) for _ in range(200)]
+    registry.remove_verifier("server3")
+    registry.add_verifier("server1", 19.0, 73.0)
+    registry.set_delay("server0", "server2", 0.004)
+    assert not any("server3" in key for _, entries in registry.grid.items() for _, key in entries)
+    for lat, lon in points:
+        assert registry.select_triangle(lat, lon) is brute_force(registry, lat, lon)
+
+
+def test_server_verifies_with_the_selected_triangle():
+    sites = [(12.97, 77.59), (19.08, 72.88), (28.61, 77.21), (22.57, 88.36), (17.38, 78.49)]
+    ports = free_ports(len(sites))
+    registry = TopologyRegistry()
+    for index, (lat, lon) in enumerate(sites):
+        registry.add_verifier(f"server{index + 1}", lat, lon, '127.0.0.1', ports[index])
+    server = Server('127.0.0.1', ports[0], identifier='server1', topology=registry, claimed_location=(20.0, 78.0))
+    try:
+        assert server.verifier_ids == list(registry.select_triangle(20.0, 78.0).ids)
+        assert server.verifier_ids == ['server1', 'server3', 'server5']
+        assert server.aggregator.verifier_ids == server.verifier_ids
+        # Losing a vertex selects another enclosing triangle
+        registry.remove_verifier('server5')
+        assert server.verifier_ids == list(registry.select_triangle(20.0, 78.0).ids) == ['server1', 'server2', 'server4']
+        assert server.aggregator.verifier_ids == server.verifier_ids
+    finally:
+        server.shutdown()
@@ -0,0 +1,55 @@
+import json
+import threading
+import uuid
+
+from cpv.tracing import NULL_SPAN, Tracer, traced_lock
+
+
+def test_spans_keep_the_newest_in_order():
+    tracer = Tracer(capacity=4)
+    for iteration in range(6):
+        with tracer.span("store", iteration=iteration):
+            pass
+    spans = tracer.spans()
+    assert [tags["iteration"] for _, _, _, _, tags in spans] == [2, 3, 4, 5]
+    assert all(start <= end for _, start, end, _, _ in spans)
+    tracer.clear()
+    assert tracer.spans() == []
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = Tracer(enabled=False)
+    lock = threading.Lock()
+    assert tracer.span("store") is NULL_SPAN
+    assert traced_lock(tracer, lock) is lock
+    tracer.record("rtt_probe", 1.0, 2.0)
+    assert tracer.spans() == []
+
+
+def test_lock_waits_are_recorded():
+    tracer = Tracer()
+    with traced_lock(tracer, threading.Lock(), session="s", peer="server2") as lock:
+        assert lock.locked()
+    (name, _, _, thread, tags), = tracer.spans()
+    assert name == "lock_wait"
+    assert thread == threading.get_ident()
+    assert tags == {"session": "s", "peer": "server2"}
+
+
+def test_exports_group_spans_by_session(tmp_path):
+    tracer = Tracer(service_name="verifier")
+    session = str(uuid.uuid4())
+    tracer.record("rtt_probe", 10.0, 10.002, session=session, peer="server2")
+    tracer.record("rtt_probe", 10.0, 10.003, session="monitor-1")
+    tracer.export_chrome_trace(str(tmp_path / "trace.json"))
+    events = json.loads((tmp_path / "trace.json").read_text())["traceEvents"]
+    assert [event["dur"] for event in events] == [2000, 3000]
+    assert events[0]["args"] == {"session": session, "peer": "server2"}
+
+    tracer.export_otlp(str(tmp_path / "otlp.json"))
+    document = json.loads((tmp_path / "otlp.json").read_text())["resourceSpans"][0]
+    assert document["resource"]["attributes"][0]["value"]["stringValue"] == "verifier"
+    spans = document["scopeSpans"][0]["spans"]
+    assert spans[0]["traceId"] == uuid.UUID(session).hex
+    assert spans[0]["endTimeUnixNano"] == str(10_002_000_000)
+    assert len(spans[1]["traceId"]) == 32 and spans[1]["traceId"] != spans[0]["traceId"]
@@ -0,0 +1,59 @@
+import time
+
+from cpv.aggregator import VerdictAggregator
+from cpv.verdict_cache import Verdict, VerdictCache
+
+
+def verdict(client_id, created_at=None):
+    return Verdict(client_id, True, {'server1': 0.001}, 0.9, session_id='sess', created_at=created_at)
+
+
+def test_hit_and_miss():
+    cache = VerdictCache()
+    assert cache.get('client1', '10.0.0.5') is None
+    cache.put('client1', '10.0.0.5', verdict('client1'))
+    assert cache.get('client1', ('10.0.0.5', 4000)).session_id == 'sess'
+    assert cache.get('client2', '10.0.0.5') is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_expired_verdicts_are_dropped():
+    cache = VerdictCache(ttl=60.0)
+    cache.put('client1', '10.0.0.5', verdict('client1', created_at=time.time() - 61.0))
+    assert cache.get('client1', '10.0.0.5') is None
+    assert len(cache) == 0
+
+
+def test_verdicts_are_keyed_by_client_and_prefix():
+    cache = VerdictCache()
+    cache.put('client1', '10.0.0.5', verdict('client1'))
+    assert cache.network_prefix('10.0.0.77') == '10.0.0.0/24'
+    # A client moving within its /24 keeps its verdict, one leaving it does not
+    assert cache.get('client1', '10.0.0.77') is not None
+    assert cache.get('client1', '10.0.1.5') is None
+    # Another client of the same /24 only gets it with the prefix fallback
+    assert cache.get('client2', '10.0.0.77') is None
+    fallback = VerdictCache(prefix_fallback=True)
+    fallback.put('client1', '10.0.0.5', verdict('client1'))
+    assert fallback.get('client2', '10.0.0.77').client_id == 'client1'
+
+
+def test_topology_change_invalidates():
+    cache = VerdictCache()
+    cache.put('client1', '10.0.0.5', verdict('client1'))
+    cache.invalidate_topology()
+    assert cache.get('client1', '10.0.0.5') is None
+
+
+def test_only_the_last_iteration_is_final():
+    aggregator = VerdictAggregator(['server1', 'server2', 'server3'])
+    ids = ['server1', 'server2', 'server3']
+    verdicts = []
+    for iteration in (1, 2):
+        for sender in ids:
+            others = [i for i in ids if i != sender]
+            verdicts.append(aggregator.add_result(
+                'sess', iteration, sender, {i: 0.002 for i in others}, {i: 0.001 for i in others}, 'client1', 2
+            ))
+    finished = [v for v in verdicts if v is not None]
+    assert [(v['iteration'], v['final']) for v in finished] == [(1, False), (2, True)]